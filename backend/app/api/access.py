@@ -8,6 +8,7 @@ from sqlalchemy import select, func, and_, delete
 from sqlalchemy.orm import selectinload
 
 from app.api.deps import get_db
+from app.core.page_cache import invalidate_on_commit
 from app.models import ApplicationSystem, Access, EmployeeAccess
 from app.schemas.access import (
     ApplicationSystem as ApplicationSystemSchema,
@@ -53,6 +54,7 @@ async def create_application_system(
     db.add(db_system)
     await db.flush()
     await db.refresh(db_system)
+    invalidate_on_commit(db)
     return db_system
 
 
@@ -91,6 +93,7 @@ async def update_application_system(
     
     await db.flush()
     await db.refresh(system)
+    invalidate_on_commit(db)
     return system
 
 
@@ -150,6 +153,7 @@ async def create_access(
     db.add(db_access)
     await db.flush()
     await db.refresh(db_access, ["system"])
+    invalidate_on_commit(db)
     return db_access
 
 
@@ -190,6 +194,7 @@ async def update_access(
     
     await db.flush()
     await db.refresh(access, ["system"])
+    invalidate_on_commit(db)
     return access
 
 
@@ -207,6 +212,7 @@ async def delete_access(
         raise HTTPException(status_code=404, detail="Доступ не найден")
     
     await db.delete(access)
+    invalidate_on_commit(db)
     return {"message": "Доступ удален"}
 
 
@@ -0,0 +1,113 @@
+"""
+Административные API роуты: диагностика производительности
+"""
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+
+from app.core.config import settings
+from app.core.profiler import ProfilerBusyError, profile_for_seconds, profile_requests
+from app.core.slow_queries import slow_query_log
+from app.schemas.admin import AICacheStats, SlowQuery, SlowQueryList
+from app.services.ai_cache import ai_response_cache
+
+router = APIRouter()
+
+
+# ===== SLOW QUERIES =====
+
+@router.get("/slow-queries", response_model=SlowQueryList)
+async def get_slow_queries(
+    route: Optional[str] = Query(None, description="Маршрут-источник, например /api/v1/employees/"),
+    min_duration_ms: float = Query(0, ge=0, description="Минимальное время выполнения, мс"),
+    limit: int = Query(50, ge=1, le=1000, description="Количество записей"),
+):
+    """Журнал медленных SQL-запросов (от новых к старым)"""
+    entries = slow_query_log.list(route=route, min_duration_ms=min_duration_ms)
+    return SlowQueryList(
+        enabled=settings.SLOW_QUERY_LOG_ENABLED,
+        threshold_ms=settings.SLOW_QUERY_THRESHOLD_MS,
+        capacity=slow_query_log.capacity,
+        total=len(entries),
+        items=[SlowQuery.model_validate(entry) for entry in entries[:limit]],
+    )
+
+
+@router.get("/slow-queries/{query_id}", response_model=SlowQuery)
+async def get_slow_query(query_id: int):
+    """Медленный запрос с планом выполнения"""
+    entry = slow_query_log.get(query_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Запрос не найден в журнале")
+    return SlowQuery.model_validate(entry)
+
+
+@router.delete("/slow-queries")
+async def clear_slow_queries():
+    """Очистить журнал медленных запросов"""
+    return {"cleared": slow_query_log.clear()}
+
+
+# ===== PROFILER =====
+
+@router.post("/profiler", response_class=PlainTextResponse)
+async def run_profiler(
+    seconds: Optional[float] = Query(None, gt=0, description="Профилировать процесс заданное число секунд"),
+    route: Optional[str] = Query(None, description="Шаблон маршрута, например /role-models/{role_model_id}"),
+    requests: int = Query(10, ge=1, le=1000, description="Число запросов к маршруту"),
+    timeout: float = Query(120, gt=0, description="Максимальное ожидание запросов к маршруту, сек"),
+    interval_ms: float = Query(5, ge=1, le=100, description="Интервал сэмплирования, мс"),
+    include_idle: bool = Query(False, description="Включать стеки простаивающих потоков"),
+):
+    """
+    Сэмплирующий профилировщик: collapsed stacks для flamegraph
+
+    Либо seconds, либо route + requests. Ответ приходит после окончания замера.
+    """
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=403, detail="Профилировщик выключен (PROFILER_ENABLED)")
+    if (seconds is None) == (route is None):
+        raise HTTPException(status_code=400, detail="Укажите либо seconds, либо route")
+
+    limit = settings.PROFILER_MAX_SECONDS
+    interval = interval_ms / 1000
+    try:
+        if seconds is not None:
+            session = await profile_for_seconds(min(seconds, limit), interval, include_idle)
+        else:
+            session = await profile_requests(route, requests, min(timeout, limit), interval, include_idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    profiler = session.profiler
+    started = datetime.fromtimestamp(session.started_at).strftime("%Y%m%d-%H%M%S")
+    headers = {
+        "Content-Disposition": f'attachment; filename="profile-{started}.collapsed"',
+        "X-Profile-Samples": str(profiler.ticks),
+        "X-Profile-Duration": f"{profiler.duration:.3f}",
+    }
+    if session.route is not None:
+        headers["X-Profile-Requests"] = str(session.completed)
+    return PlainTextResponse(profiler.collapsed(), headers=headers)
+
+
+# ===== AI RESPONSE CACHE =====
+
+@router.get("/ai-cache", response_model=AICacheStats)
+async def get_ai_cache_stats():
+    """Состояние кэша ответов LLM для ИИ-инструментов"""
+    return AICacheStats(
+        enabled=settings.AI_CACHE_ENABLED,
+        max_entries=settings.AI_CACHE_MAX_ENTRIES,
+        max_bytes=settings.AI_CACHE_MAX_BYTES,
+        **await ai_response_cache.stats(),
+    )
+
+
+@router.delete("/ai-cache")
+async def clear_ai_cache(
+    role_model_id: Optional[int] = Query(None, description="Только ответы по этой ролевой модели"),
+):
+    """Очистить кэш ответов LLM"""
+    return {"cleared": await ai_response_cache.invalidate(role_model_id)}
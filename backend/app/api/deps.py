@@ -1,8 +1,11 @@
 """
 Зависимости для API
 """
-from typing import AsyncGenerator
+import secrets
+from typing import AsyncGenerator, Optional
+from fastapi import Header, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import settings
 from app.core.database import get_session
 
 
@@ -10,3 +13,18 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Dependency для получения сессии БД"""
     async for session in get_session():
         yield session
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """
+    Dependency для административных роутов: проверка ADMIN_TOKEN
+
+    Без токена административные роуты закрыты, открытый доступ включается
+    только явно (ADMIN_OPEN_ACCESS, для локальной разработки).
+    """
+    if not settings.ADMIN_TOKEN:
+        if settings.ADMIN_OPEN_ACCESS:
+            return
+        raise HTTPException(status_code=403, detail="Административный доступ отключен: не задан ADMIN_TOKEN")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, settings.ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Требуется административный доступ")
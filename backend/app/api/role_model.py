@@ -8,7 +8,8 @@ from sqlalchemy import select, func, and_, or_
 from sqlalchemy.orm import selectinload
 
 from app.api.deps import get_db
-from app.models import RoleModel, RoleProfile, ProfileAccess, Employee, EmployeeProfile, Position, OrganizationalUnit, EmployeeType
+from app.core.page_cache import invalidate_on_commit
+from app.models import RoleModel, RoleProfile, ProfileAccess
 from app.schemas.role_model import (
     RoleModel as RoleModelSchema,
     RoleModelCreate, RoleModelUpdate, RoleModelList,
@@ -16,6 +17,7 @@ from app.schemas.role_model import (
     RoleProfileCreate, RoleProfileUpdate, RoleProfileList,
     RoleProfileWithEmployees, RoleModelStats
 )
+from app.services.profile_matching import count_matching_employees, get_matching_employees
 
 router = APIRouter()
 
@@ -92,6 +94,7 @@ async def create_role_model(
     db.add(db_role_model)
     await db.flush()
     await db.refresh(db_role_model)
+    invalidate_on_commit(db, db_role_model.id)
     return db_role_model
 
 
@@ -144,6 +147,7 @@ async def update_role_model(
     
     await db.flush()
     await db.refresh(role_model)
+    invalidate_on_commit(db, role_model_id)
     return role_model
 
 
@@ -161,6 +165,7 @@ async def delete_role_model(
         raise HTTPException(status_code=404, detail="Ролевая модель не найдена")
     
     await db.delete(role_model)
+    invalidate_on_commit(db, role_model_id)
     return {"message": "Ролевая модель удалена"}
 
 
@@ -235,9 +240,11 @@ async def get_role_model_stats(
     if not role_model:
         raise HTTPException(status_code=404, detail="Ролевая модель не найдена")
     
-    # Получаем профили модели
+    # Получаем профили модели (доступы - сразу, ленивая загрузка в async-сессии невозможна)
     profiles_result = await db.execute(
-        select(RoleProfile).where(RoleProfile.role_model_id == role_model_id)
+        select(RoleProfile)
+        .options(selectinload(RoleProfile.profile_accesses))
+        .where(RoleProfile.role_model_id == role_model_id)
     )
     profiles = profiles_result.scalars().all()
     
@@ -255,7 +262,7 @@ async def get_role_model_stats(
         total_accesses_assigned += accesses_count
         
         # Подсчитываем сотрудников по критериям профиля
-        employees_count = await _count_matching_employees(profile.criteria, db)
+        employees_count = await count_matching_employees(profile.criteria, db)
         total_employees_covered += employees_count
         
         # Добавляем в сводку
@@ -301,7 +308,7 @@ async def get_role_profile(
         raise HTTPException(status_code=404, detail="Профиль роли не найден")
     
     # Подсчитываем количество подходящих сотрудников
-    employees_count = await _count_matching_employees(profile.criteria, db)
+    employees_count = await count_matching_employees(profile.criteria, db)
     
     return RoleProfileSchema(
         id=profile.id,
@@ -333,10 +340,10 @@ async def get_profile_matching_employees(
         raise HTTPException(status_code=404, detail="Профиль роли не найден")
     
     # Получаем сотрудников по критериям
-    employees = await _get_matching_employees(profile.criteria, db, page, size)
+    employees = await get_matching_employees(profile.criteria, db, page, size)
     
     # Подсчитываем общее количество
-    total_count = await _count_matching_employees(profile.criteria, db)
+    total_count = await count_matching_employees(profile.criteria, db)
     
     return RoleProfileWithEmployees(
         id=profile.id,
@@ -367,133 +374,6 @@ async def get_profile_employees_count(
         raise HTTPException(status_code=404, detail="Профиль роли не найден")
     
     # Подсчитываем сотрудников по критериям
-    count = await _count_matching_employees(profile.criteria, db)
+    count = await count_matching_employees(profile.criteria, db)
     
     return {"profile_id": profile_id, "employees_count": count}
-
-
-# ===== ВСПОМОГАТЕЛЬНЫЕ ФУНКЦИИ =====
-
-async def _count_matching_employees(criteria: dict, db: AsyncSession) -> int:
-    """Подсчитать количество сотрудников, подходящих под критерии"""
-    query = select(func.count(Employee.id))
-    
-    conditions = []
-    
-    # Критерии из JSON поля criteria
-    if "employee_profiles" in criteria:
-        # Поиск по названиям профилей сотрудников
-        profile_names = criteria["employee_profiles"]
-        if profile_names:
-            conditions.append(
-                Employee.profile.has(EmployeeProfile.name.in_(profile_names))
-            )
-    
-    if "positions" in criteria:
-        # Поиск по названиям должностей
-        position_names = criteria["positions"]
-        if position_names:
-            conditions.append(
-                Employee.position.has(Position.title.in_(position_names))
-            )
-    
-    if "org_units_type" in criteria:
-        # Поиск по типам подразделений
-        org_types = criteria["org_units_type"]
-        if org_types:
-            conditions.append(
-                Employee.org_unit.has(OrganizationalUnit.type.in_(org_types))
-            )
-    
-    if "employee_types" in criteria:
-        # Поиск по типам сотрудников
-        employee_type_names = criteria["employee_types"]
-        if employee_type_names:
-            conditions.append(
-                Employee.employee_type.has(EmployeeType.name.in_(employee_type_names))
-            )
-    
-    if "all_employees" in criteria and criteria["all_employees"]:
-        # Если критерий "все сотрудники", то не добавляем дополнительных условий
-        pass
-    elif conditions:
-        query = query.where(and_(*conditions))
-    else:
-        # Если нет критериев, возвращаем 0
-        return 0
-    
-    result = await db.execute(query)
-    return result.scalar() or 0
-
-
-async def _get_matching_employees(criteria: dict, db: AsyncSession, page: int = 1, size: int = 50) -> List[dict]:
-    """Получить список сотрудников, подходящих под критерии"""
-    query = select(Employee).options(
-        selectinload(Employee.profile),
-        selectinload(Employee.position),
-        selectinload(Employee.org_unit),
-        selectinload(Employee.employee_type)
-    )
-    
-    conditions = []
-    
-    # Критерии из JSON поля criteria
-    if "employee_profiles" in criteria:
-        profile_names = criteria["employee_profiles"]
-        if profile_names:
-            conditions.append(
-                Employee.profile.has(EmployeeProfile.name.in_(profile_names))
-            )
-    
-    if "positions" in criteria:
-        position_names = criteria["positions"]
-        if position_names:
-            conditions.append(
-                Employee.position.has(Position.title.in_(position_names))
-            )
-    
-    if "org_units_type" in criteria:
-        org_types = criteria["org_units_type"]
-        if org_types:
-            conditions.append(
-                Employee.org_unit.has(OrganizationalUnit.type.in_(org_types))
-            )
-    
-    if "employee_types" in criteria:
-        employee_type_names = criteria["employee_types"]
-        if employee_type_names:
-            conditions.append(
-                Employee.employee_type.has(EmployeeType.name.in_(employee_type_names))
-            )
-    
-    if "all_employees" in criteria and criteria["all_employees"]:
-        # Если критерий "все сотрудники", то не добавляем дополнительных условий
-        pass
-    elif conditions:
-        query = query.where(and_(*conditions))
-    else:
-        # Если нет критериев, возвращаем пустой список
-        return []
-    
-    # Пагинация и сортировка
-    query = query.offset((page - 1) * size).limit(size)
-    query = query.order_by(Employee.full_name)
-    
-    result = await db.execute(query)
-    employees = result.scalars().all()
-    
-    # Преобразование в словари
-    employee_list = []
-    for emp in employees:
-        employee_list.append({
-            "id": emp.id,
-            "full_name": emp.full_name,
-            "employee_number": emp.employee_number,
-            "profile_name": emp.profile.name if emp.profile else None,
-            "position_title": emp.position.title if emp.position else None,
-            "org_unit_name": emp.org_unit.name if emp.org_unit else None,
-            "employee_type_name": emp.employee_type.name if emp.employee_type else None,
-            "status": emp.status
-        })
-    
-    return employee_list
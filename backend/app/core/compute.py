@@ -0,0 +1,174 @@
+"""
+Пул процессов для CPU-емких вычислений (кластеризация, ассоциативные
+правила, матрицы сходства)
+
+Чистые вычисления на NumPy/scikit-learn в процессе FastAPI держат GIL и
+останавливают event loop, поэтому они выполняются в ProcessPoolExecutor:
+- размер пула - COMPUTE_PROCESSES, по умолчанию ядра минус одно (оно
+  остается серверу), поделенные на число процессов сервера (у каждого
+  воркера uvicorn свой пул); воркеры работают с пониженным приоритетом
+  (COMPUTE_NICE), чтобы большой анализ не поднимал задержку остальных
+  эндпоинтов;
+- процессы запускаются через spawn (fork процесса с потоками aiosqlite и
+  event loop небезопасен) и прогреваются при старте приложения: модули
+  PRELOAD_MODULES импортируются сразу, а не в первом запросе;
+- NumPy-массивы аргументов от COMPUTE_SHARED_MIN_BYTES передаются через
+  multiprocessing.shared_memory: в воркер уходит только имя блока, форма и
+  тип, а функция получает массив поверх той же памяти без копирования.
+
+Функция для run должна быть объявлена на уровне модуля (она передается
+воркеру по имени). Разделяемые массивы в ней доступны только на чтение, и
+результат не должен на них ссылаться (возвращайте копии или итоги).
+"""
+import asyncio
+import functools
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+from importlib import import_module
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.utils.logger import logger
+
+# Импортируются в каждом воркере при запуске; отсутствующие пропускаются
+PRELOAD_MODULES = (
+    "numpy",
+    "scipy.sparse",
+    "sklearn.cluster",
+    "sklearn.mixture",
+    "sklearn.metrics",
+    "sklearn.decomposition",
+    "sklearn.tree",
+    "umap",
+)
+
+
+@dataclass(frozen=True)
+class SharedArray:
+    """Ссылка на массив в разделяемой памяти (передается воркеру вместо данных)"""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+def _warm_worker(nice: int):
+    """Инициализатор воркера: пониженный приоритет и предзагрузка модулей"""
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+    for module in PRELOAD_MODULES:
+        try:
+            import_module(module)
+        except ImportError:
+            pass
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _attach(value: Any, opened: List[shared_memory.SharedMemory]) -> Any:
+    if not isinstance(value, SharedArray):
+        return value
+    block = shared_memory.SharedMemory(name=value.name)
+    opened.append(block)
+    array = np.ndarray(value.shape, dtype=np.dtype(value.dtype), buffer=block.buf)
+    array.flags.writeable = False
+    return array
+
+
+def _call(fn: Callable[..., Any], args: Tuple[Any, ...], kwargs: Dict[str, Any]) -> Any:
+    """Выполняется в воркере: массивы из разделяемой памяти и вызов функции"""
+    opened: List[shared_memory.SharedMemory] = []
+    try:
+        args = tuple(_attach(value, opened) for value in args)
+        kwargs = {key: _attach(value, opened) for key, value in kwargs.items()}
+        result = fn(*args, **kwargs)
+        # Представления разделяемой памяти не должны пережить ее закрытие
+        del args, kwargs
+        return result
+    finally:
+        for block in opened:
+            block.close()
+
+
+def server_workers() -> int:
+    """Число процессов сервера: SERVER_WORKERS или WEB_CONCURRENCY (его читает uvicorn для --workers)"""
+    if settings.SERVER_WORKERS:
+        return settings.SERVER_WORKERS
+    try:
+        return max(int(os.environ.get("WEB_CONCURRENCY", 1)), 1)
+    except ValueError:
+        return 1
+
+
+class ComputePool:
+    """Пул процессов с передачей NumPy-массивов через разделяемую память"""
+
+    def __init__(self):
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self.processes = 0
+
+    def _create(self) -> ProcessPoolExecutor:
+        self.processes = settings.COMPUTE_PROCESSES or max(((os.cpu_count() or 2) - 1) // server_workers(), 1)
+        return ProcessPoolExecutor(
+            max_workers=self.processes,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm_worker,
+            initargs=(settings.COMPUTE_NICE,),
+        )
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            self._executor = self._create()
+        return self._executor
+
+    async def start(self):
+        """Запустить и прогреть все процессы пула"""
+        loop = asyncio.get_running_loop()
+        executor = self.executor
+        pids = await asyncio.gather(*[loop.run_in_executor(executor, _ping) for _ in range(self.processes)])
+        logger.info(f"Пул вычислений: {len(set(pids))} процессов (процессов сервера: {server_workers()})")
+
+    def stop(self):
+        """Остановить пул, не дожидаясь выполняемых задач"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _share(self, value: Any, blocks: List[shared_memory.SharedMemory]) -> Any:
+        if (not isinstance(value, np.ndarray) or value.dtype.hasobject
+                or value.nbytes < settings.COMPUTE_SHARED_MIN_BYTES):
+            return value
+        block = shared_memory.SharedMemory(create=True, size=max(value.nbytes, 1))
+        blocks.append(block)
+        np.ndarray(value.shape, dtype=value.dtype, buffer=block.buf)[...] = value
+        return SharedArray(block.name, value.shape, value.dtype.str)
+
+    async def run(self, fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """Выполнить fn(*args, **kwargs) в пуле; большие NumPy-массивы - через разделяемую память"""
+        blocks: List[shared_memory.SharedMemory] = []
+        try:
+            shared_args = tuple(self._share(value, blocks) for value in args)
+            shared_kwargs = {key: self._share(value, blocks) for key, value in kwargs.items()}
+            call = functools.partial(_call, fn, shared_args, shared_kwargs)
+            try:
+                return await asyncio.get_running_loop().run_in_executor(self.executor, call)
+            except BrokenProcessPool:
+                # Воркер упал (например, OOM) - пул больше не принимает задачи, пересоздаем
+                logger.error("Пул вычислений сломан, процессы перезапускаются")
+                self.stop()
+                raise
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+
+compute_pool = ComputePool()
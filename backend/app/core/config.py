@@ -9,6 +9,7 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite+aiosqlite:///./data/rm_agent.db"
+    DATABASE_BUSY_TIMEOUT: float = 30.0  # ожидание блокировки записи SQLite, сек
     
     # App
     DEBUG: bool = True
@@ -18,6 +19,66 @@ class Settings(BaseSettings):
     # LLM
     LLM_API_URL: str = "http://localhost:8080"  # llama.cpp сервер
     LLM_MODEL: str = "llama-3.1-8b"
+    LLM_MAX_TOKENS: int = 512
+    LLM_TEMPERATURE: float = 0.3
+    LLM_CONNECT_TIMEOUT: float = 5.0
+    LLM_READ_TIMEOUT: float = 120.0  # максимальная пауза между токенами
+    LLM_HISTORY_EXCHANGES: int = 6  # последних обменов диалога в промпте
+    LLM_SLOTS: int = 0  # одновременных генераций (--parallel llama.cpp), 0 - из /props
+    LLM_MAX_QUEUE: int = 16  # генераций в ожидании слота, сверх - сразу отказ
+    LLM_QUEUE_TIMEOUT: float = 60.0  # максимальное ожидание слота
+    LLM_REQUEST_TIMEOUT: float = 300.0  # вся генерация, включая ожидание слота
+    LLM_POOL_SIZE: int = 16  # keep-alive соединений с LLM-сервером
+    
+    # Кэш ответов LLM для ИИ-инструментов
+    AI_CACHE_ENABLED: bool = True
+    AI_CACHE_MAX_ENTRIES: int = 5000
+    AI_CACHE_MAX_BYTES: int = 50 * 1024 * 1024
+    
+    # Пул процессов для CPU-емких вычислений
+    COMPUTE_PROCESSES: int = 0  # 0 - (ядра минус одно) / SERVER_WORKERS
+    SERVER_WORKERS: int = 0  # процессов сервера (uvicorn --workers); 0 - из WEB_CONCURRENCY, иначе 1
+    COMPUTE_NICE: int = 10  # понижение приоритета воркеров (POSIX)
+    COMPUTE_SHARED_MIN_BYTES: int = 1024 * 1024  # массивы от этого размера - через shared_memory
+    
+    # Фоновые задачи ИИ-инструментов
+    AI_JOBS_WORKERS: int = 2  # одновременно выполняемых задач
+    AI_JOBS_MAX_QUEUE: int = 100  # задач в очереди, сверх - отказ
+    AI_JOBS_TIMEOUT_SECONDS: float = 600.0
+    AI_JOBS_PROGRESS_INTERVAL_SECONDS: float = 1.0  # как часто прогресс пишется в БД
+    AI_JOBS_RETENTION_HOURS: float = 72.0  # завершенные задачи старше удаляются при старте
+    AI_JOBS_HEARTBEAT_SECONDS: float = 10.0  # как часто процесс отмечает, что его задачи живы
+    AI_JOBS_STALE_SECONDS: float = 60.0  # задача без отметки дольше считается прерванной
+    
+    # Metrics
+    METRICS_ENABLED: bool = True
+    METRICS_QUERY_WARNING_THRESHOLD: int = 100  # SQL-запросов на HTTP-запрос, 0 - не предупреждать
+    
+    # Slow query log
+    SLOW_QUERY_LOG_ENABLED: bool = False
+    SLOW_QUERY_THRESHOLD_MS: float = 100.0
+    SLOW_QUERY_BUFFER_SIZE: int = 200
+    SLOW_QUERY_EXPLAIN: bool = True  # снимать план выполнения (EXPLAIN QUERY PLAN / EXPLAIN)
+    
+    # Page cache (HTML-страницы ролевых моделей, ETag/304)
+    PAGE_CACHE_ENABLED: bool = True
+    PAGE_CACHE_SIZE: int = 256
+    
+    # Chat conversation store
+    CHAT_FLUSH_INTERVAL_SECONDS: float = 1.0  # как часто писать накопленные обмены в БД
+    CHAT_FLUSH_BATCH: int = 100  # писать сразу, если накопилось столько обменов
+    CHAT_MAX_PENDING: int = 10000  # предел очереди записи, если БД недоступна
+    CHAT_CACHE_SIZE: int = 1000  # диалогов в памяти
+    CHAT_CACHE_MESSAGES: int = 50  # последних обменов диалога в памяти
+    CHAT_CACHE_TTL_SECONDS: float = 1800.0
+    
+    # Admin
+    ADMIN_TOKEN: str = ""  # /api/v1/admin/* требует заголовок X-Admin-Token с этим значением
+    ADMIN_OPEN_ACCESS: bool = False  # без ADMIN_TOKEN: True - открыть admin всем (только локально), иначе 403
+    
+    # Sampling profiler
+    PROFILER_ENABLED: bool = False
+    PROFILER_MAX_SECONDS: float = 300.0
     
     class Config:
         env_file = ".env"
@@ -2,6 +2,10 @@
 Асинхронное подключение к SQLite через aiosqlite
 """
 import logging
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from sqlalchemy import insert, inspect, text
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
 from sqlalchemy.pool import StaticPool
 
@@ -13,14 +17,32 @@ logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
 logging.getLogger('sqlalchemy.pool').setLevel(logging.WARNING)
 logging.getLogger('sqlalchemy.dialects').setLevel(logging.WARNING)
 
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    """
+    Пул соединений для SQLite
+
+    БД в памяти существует только в своем соединении, поэтому для нее одно
+    общее соединение (StaticPool). Файловой БД нужен обычный пул: на общем
+    соединении транзакции параллельных сессий перемешиваются, и закрытие
+    любой сессии откатывает незакоммиченные записи остальных (например,
+    фоновых задач). Писатели ждут блокировку до DATABASE_BUSY_TIMEOUT секунд.
+    """
+    if ":memory:" in url or url.rstrip("/").endswith("sqlite+aiosqlite:"):
+        return {"poolclass": StaticPool, "connect_args": {"check_same_thread": False}}
+    return {
+        "connect_args": {
+            "check_same_thread": False,  # Для SQLite
+            "timeout": settings.DATABASE_BUSY_TIMEOUT,
+        },
+    }
+
+
 # Создаем async движок для SQLite
 engine = create_async_engine(
     settings.DATABASE_URL,
     echo=False,  # Отключаем SQL логи для экономии токенов
-    poolclass=StaticPool,
-    connect_args={
-        "check_same_thread": False,  # Для SQLite
-    },
+    **_engine_options(settings.DATABASE_URL),
 )
 
 # Фабрика сессий
@@ -31,10 +53,34 @@ AsyncSessionLocal = async_sessionmaker(
 )
 
 
+# Колонки, добавленные в модели после создания таблиц: create_all не меняет существующие таблицы
+ADDED_COLUMNS = [
+    ("employee_accesses", "updated_at", "DATETIME"),
+    ("ai_jobs", "owner", "VARCHAR(64)"),
+    ("ai_jobs", "heartbeat_at", "DATETIME"),
+]
+
+
+def _add_missing_columns(connection):
+    inspector = inspect(connection)
+    for table, column, column_type in ADDED_COLUMNS:
+        if column not in {existing["name"] for existing in inspector.get_columns(table)}:
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}"))
+
+
+def _add_missing_indexes(connection):
+    # Индексы, объявленные в моделях позже таблиц, create_all тоже не создает
+    for table in Base.metadata.tables.values():
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
 async def create_tables():
-    """Создание всех таблиц"""
+    """Создание всех таблиц и недостающих в них колонок и индексов"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(_add_missing_columns)
+        await conn.run_sync(_add_missing_indexes)
 
 
 async def get_session() -> AsyncSession:
@@ -48,3 +94,26 @@ async def get_session() -> AsyncSession:
             raise
         finally:
             await session.close()
+
+
+@asynccontextmanager
+async def session_scope(session: Optional[AsyncSession] = None) -> AsyncIterator[AsyncSession]:
+    """
+    Сессия для скриптов заполнения
+
+    Если сессия передана (например, этапом пайплайна), транзакцией управляет
+    вызывающий код. Иначе открывается новая сессия и коммитится в конце.
+    """
+    if session is not None:
+        yield session
+        return
+    async with AsyncSessionLocal() as own_session:
+        yield own_session
+        await own_session.commit()
+
+
+async def bulk_insert(session: AsyncSession, model, rows: List[Dict[str, Any]]) -> int:
+    """Массовая вставка одним executemany вместо session.add по строке"""
+    if rows:
+        await session.execute(insert(model), rows)
+    return len(rows)
@@ -0,0 +1,268 @@
+"""
+Метрики запросов: время ответа, число SQL-запросов и время в БД
+
+- MetricsMiddleware замеряет каждый HTTP-запрос и добавляет заголовок Server-Timing
+- instrument_engine вешает before/after_cursor_execute и считает запросы к БД
+  в рамках текущего HTTP-запроса (через contextvars)
+- render_metrics отдает всё в текстовом формате Prometheus для /metrics
+"""
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.utils import logger
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+LabelValues = Tuple[str, ...]
+
+
+# ===== ПРИМИТИВЫ PROMETHEUS =====
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    """Метки в формате {name="value",...}"""
+    parts = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{name}="{escaped}"')
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_value(value: float) -> str:
+    """Число без лишних нулей: 3 вместо 3.0"""
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    """Монотонный счетчик с метками"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for labels, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+@dataclass
+class _HistogramSeries:
+    """Значения гистограммы для одного набора меток"""
+    buckets: List[int]
+    sum: float = 0.0
+    count: int = 0
+
+
+class Histogram:
+    """Гистограмма с фиксированными границами корзин"""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.bounds = tuple(sorted(buckets))
+        self._series: Dict[LabelValues, _HistogramSeries] = {}
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = _HistogramSeries(buckets=[0] * len(self.bounds))
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                series.buckets[i] += 1
+        series.sum += value
+        series.count += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(self._series.items()):
+            for bound, bucket_count in zip(self.bounds, series.buckets):
+                le = _format_labels(self.labelnames, labels, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {bucket_count}")
+            inf = _format_labels(self.labelnames, labels, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{inf} {series.count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, labels)} {_format_value(round(series.sum, 6))}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, labels)} {series.count}")
+        return lines
+
+
+# ===== МЕТРИКИ ПРИЛОЖЕНИЯ =====
+
+REQUEST_DURATION = Histogram(
+    "rm_agent_http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ("method", "route", "status"),
+)
+REQUEST_DB_QUERIES = Histogram(
+    "rm_agent_http_request_db_queries",
+    "Число SQL-запросов на один HTTP-запрос",
+    ("method", "route"),
+    buckets=QUERY_COUNT_BUCKETS,
+)
+REQUEST_DB_DURATION = Histogram(
+    "rm_agent_http_request_db_duration_seconds",
+    "Суммарное время SQL-запросов на один HTTP-запрос",
+    ("method", "route"),
+)
+DB_QUERIES_TOTAL = Counter(
+    "rm_agent_db_queries_total",
+    "Всего SQL-запросов (route=\"-\" - вне HTTP-запросов)",
+    ("route",),
+)
+
+_METRICS = (REQUEST_DURATION, REQUEST_DB_QUERIES, REQUEST_DB_DURATION, DB_QUERIES_TOTAL)
+
+
+def render_metrics() -> str:
+    """Все метрики в текстовом формате Prometheus"""
+    lines: List[str] = []
+    for metric in _METRICS:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# ===== КОНТЕКСТ ЗАПРОСА =====
+
+@dataclass
+class RequestStats:
+    """Счетчики текущего HTTP-запроса"""
+    scope: Dict[str, Any]
+    started: float = field(default_factory=time.perf_counter)
+    db_queries: int = 0
+    db_time: float = 0.0
+
+    @property
+    def method(self) -> str:
+        return self.scope.get("method", "")
+
+    @property
+    def route(self) -> str:
+        """Шаблон маршрута (/employees/{employee_id}), а не фактический путь - чтобы не плодить метки"""
+        route = self.scope.get("route")
+        if route is None or not hasattr(route, "path"):
+            return "unmatched"
+        template = getattr(route, "path_format", route.path)
+        # У маршрутов из include_router путь может быть без префикса роутера -
+        # восстанавливаем префикс по фактическому пути запроса
+        try:
+            rendered = template.format(**{k: str(v) for k, v in self.scope.get("path_params", {}).items()})
+        except (KeyError, IndexError, ValueError):
+            return template
+        path = self.scope.get("path", "")
+        if path.endswith(rendered):
+            return path[:len(path) - len(rendered)] + template
+        return template
+
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+
+def current_request_stats() -> Optional[RequestStats]:
+    """Счетчики HTTP-запроса, в рамках которого выполняется код (None вне запроса)"""
+    return _current_request.get()
+
+
+# ===== SQLALCHEMY =====
+
+# Время старта храним в контексте выполнения: он свой у каждого запроса и
+# просто отбрасывается, если запрос упал и after_cursor_execute не вызван
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - context._metrics_started
+    stats = _current_request.get()
+    if stats is None:
+        DB_QUERIES_TOTAL.inc("-")
+        return
+    stats.db_queries += 1
+    stats.db_time += elapsed
+    DB_QUERIES_TOTAL.inc(stats.route)
+
+
+def instrument_engine(engine: AsyncEngine):
+    """Подключить подсчет SQL-запросов к движку (повторный вызов ничего не делает)"""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ===== MIDDLEWARE =====
+
+class MetricsMiddleware:
+    """
+    ASGI middleware: время ответа, число запросов к БД и заголовок Server-Timing
+
+    Написан на чистом ASGI, а не BaseHTTPMiddleware, чтобы не буферизовать
+    потоковые ответы. Server-Timing отражает состояние на момент отправки
+    заголовков - для обычных ответов это уже полное время обработчика.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope=scope)
+        token = _current_request.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - stats.started) * 1000
+                server_timing = (
+                    f'app;dur={elapsed_ms:.1f}, '
+                    f'db;dur={stats.db_time * 1000:.1f};desc="{stats.db_queries} queries"'
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", server_timing.encode("latin-1")),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current_request.reset(token)
+            self._record(stats, status_code)
+
+    @staticmethod
+    def _record(stats: RequestStats, status_code: int):
+        """Записать метрики завершенного запроса"""
+        method, route = stats.method, stats.route
+        REQUEST_DURATION.observe(time.perf_counter() - stats.started, method, route, str(status_code))
+        REQUEST_DB_QUERIES.observe(stats.db_queries, method, route)
+        REQUEST_DB_DURATION.observe(stats.db_time, method, route)
+
+        threshold = settings.METRICS_QUERY_WARNING_THRESHOLD
+        if threshold and stats.db_queries > threshold:
+            logger.warning(
+                f"{method} {route}: {stats.db_queries} SQL-запросов за один HTTP-запрос "
+                f"({stats.db_time * 1000:.0f} мс в БД) - возможен N+1"
+            )
@@ -0,0 +1,179 @@
+"""
+Кэш отрендеренных HTML-страниц и условные GET-запросы
+
+Ключ страницы - ее имя и параметры плюс версия данных: отпечаток из БД
+(updated_at и количества строк, которые показывает страница) и локальное
+поколение ролевой модели, которое увеличивается после коммита изменений
+через API. Отпечаток снимается одним легким запросом; если он совпал с
+If-None-Match клиента, ответ - 304 без рендеринга, иначе HTML берется из
+LRU-кэша или рендерится и кладется туда.
+
+Поколение нужно потому, что updated_at в SQLite хранится с точностью до
+секунды: два изменения в одну секунду дали бы одинаковый отпечаток.
+"""
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, Optional
+
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+# Ключ поколения для страниц со всеми ролевыми моделями (список)
+ALL_MODELS = None
+
+_INVALIDATE_KEY = "page_cache_invalidate"
+
+
+def _templates_stamp(directory: str = "templates") -> str:
+    """Версия шаблонов: после выкладки новых шаблонов ETag меняется"""
+    mtimes = [
+        os.path.getmtime(os.path.join(root, name))
+        for root, _, names in os.walk(directory)
+        for name in names
+    ]
+    return f"{settings.VERSION}:{max(mtimes, default=0):.0f}"
+
+
+class PageCache:
+    """LRU-кэш отрендеренных страниц с поколениями ролевых моделей"""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._generations: Dict[Optional[int], int] = {}
+        self._lock = threading.Lock()
+        self._stamp = _templates_stamp()
+
+    def generation(self, role_model_id: Optional[int]) -> str:
+        """Поколение страницы: общее (список) и, для страниц модели, ее собственное"""
+        with self._lock:
+            shared = self._generations.get(ALL_MODELS, 0)
+            if role_model_id is None:
+                return str(shared)
+            return f"{shared}.{self._generations.get(role_model_id, 0)}"
+
+    def etag(self, *parts: Any) -> str:
+        digest = hashlib.sha1(repr((self._stamp,) + parts).encode()).hexdigest()
+        return f'"{digest[:32]}"'
+
+    def get(self, etag: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(etag)
+            if body is not None:
+                self._entries.move_to_end(etag)
+            return body
+
+    def put(self, etag: str, body: bytes):
+        with self._lock:
+            self._entries[etag] = body
+            self._entries.move_to_end(etag)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, role_model_ids: Iterable[Optional[int]]):
+        """
+        Новое поколение для моделей и для списка
+
+        Старые записи не удаляются: их ETag больше не совпадет, и LRU
+        вытеснит их сам.
+        """
+        with self._lock:
+            for role_model_id in set(role_model_ids) | {ALL_MODELS}:
+                self._generations[role_model_id] = self._generations.get(role_model_id, 0) + 1
+
+
+page_cache = PageCache(settings.PAGE_CACHE_SIZE)
+
+
+# ===== ИНВАЛИДАЦИЯ ПОСЛЕ КОММИТА =====
+
+def invalidate_on_commit(db: AsyncSession, role_model_id: Optional[int] = None):
+    """
+    Сбросить страницы ролевой модели (и список), когда транзакция сессии закоммитится
+
+    Сброс до коммита позволил бы параллельному запросу отрендерить и
+    закэшировать еще старые данные уже под новым поколением.
+    """
+    db.sync_session.info.setdefault(_INVALIDATE_KEY, set()).add(role_model_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session: Session):
+    role_model_ids = session.info.pop(_INVALIDATE_KEY, None)
+    if role_model_ids:
+        page_cache.invalidate(role_model_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session: Session):
+    session.info.pop(_INVALIDATE_KEY, None)
+
+
+# ===== УСЛОВНЫЙ GET =====
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        # SQLite func.now() хранит UTC без часового пояса
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Условный GET: у клиента уже есть эта версия ответа"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match важнее If-Modified-Since (RFC 9110, 13.2.2)
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+async def cached_page(
+    request: Request,
+    key: tuple,
+    last_modified: Optional[datetime],
+    render: Callable[[], Awaitable[Response]],
+) -> Response:
+    """
+    Ответ со страницей из кэша, 304 или свежим рендером
+
+    key - имя и параметры страницы вместе с версией данных;
+    render вызывается, только если страницы нет в кэше.
+    """
+    if not settings.PAGE_CACHE_ENABLED:
+        return await render()
+
+    etag = page_cache.etag(*key)
+    last_modified = _as_utc(last_modified)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    if not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+
+    body = page_cache.get(etag)
+    if body is None:
+        response = await render()
+        if response.status_code != 200:
+            return response
+        body = response.body
+        page_cache.put(etag, body)
+    return HTMLResponse(body, headers=headers)
@@ -0,0 +1,224 @@
+"""
+Встроенный сэмплирующий профилировщик для диагностики в продакшене
+
+Отдельный поток раз в interval снимает стеки всех потоков через
+sys._current_frames() - без sys.setprofile и внешних агентов, накладные
+расходы не зависят от числа вызовов в профилируемом коде. Результат -
+collapsed stacks ("поток;кадр;кадр;... число"), которые напрямую читают
+flamegraph.pl, speedscope и inferno.
+
+Два режима:
+- на N секунд - сэмплы пишутся все время;
+- на следующие N запросов к маршруту - сэмплы пишутся только пока такой
+  запрос обрабатывается (параллельные запросы к другим маршрутам тоже
+  попадут в профиль, для чистого замера профилируйте под одиночной нагрузкой).
+
+Время в SQL видно как стеки потоков aiosqlite, время Pydantic и Jinja -
+в стеке потока event loop.
+"""
+import asyncio
+import linecache
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Optional, Pattern
+
+# Кадры ожидания: поток простаивает, в профиле это шум
+IDLE_FRAMES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("threading.py", "_wait_for_tstate_lock"),
+    ("queue.py", "get"),
+}
+
+# Ожидание в C-вызове не видно как отдельный кадр - узнаем его по строке исходника
+IDLE_LINES = {
+    ("core.py", "_connection_worker_thread"): "tx.get()",  # aiosqlite ждет следующий запрос
+}
+
+_APP_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class ProfilerBusyError(RuntimeError):
+    """Профилирование уже запущено"""
+
+
+def _short_path(filename: str) -> str:
+    """Путь без site-packages и корня проекта - короче и одинаков на разных машинах"""
+    marker = "site-packages" + os.sep
+    if marker in filename:
+        return filename.split(marker, 1)[1]
+    if filename.startswith(_APP_ROOT):
+        return os.path.relpath(filename, _APP_ROOT)
+    return os.path.basename(filename)
+
+
+def _frame_label(frame) -> str:
+    """Функция и текущая строка: по строке видно, например, ждет поток aiosqlite или выполняет SQL"""
+    code = frame.f_code
+    return f"{code.co_name} ({_short_path(code.co_filename)}:{frame.f_lineno})".replace(";", ",")
+
+
+def _is_idle(frame) -> bool:
+    code = frame.f_code
+    key = (os.path.basename(code.co_filename), code.co_name)
+    if key in IDLE_FRAMES:
+        return True
+    idle_line = IDLE_LINES.get(key)
+    return idle_line is not None and idle_line in linecache.getline(code.co_filename, frame.f_lineno)
+
+
+class SamplingProfiler:
+    """Поток-сэмплер стеков всех потоков процесса"""
+
+    def __init__(self, interval: float, include_idle: bool = False):
+        self.interval = interval
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.ticks = 0
+        self.enabled = True  # в режиме "по запросам" включается только на время запроса
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._started = 0.0
+        self.duration = 0.0
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        own_ident = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if not self.enabled:
+                continue
+            self.ticks += 1
+            thread_names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident or (not self.include_idle and _is_idle(frame)):
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(thread_names.get(ident, f"thread-{ident}"))
+                self.stacks[";".join(reversed(stack))] += 1
+
+    def collapsed(self) -> str:
+        """Стеки в формате collapsed, самые частые первыми"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+# ===== СЕАНС ПРОФИЛИРОВАНИЯ =====
+
+@dataclass
+class ProfilingSession:
+    """Текущий сеанс: профилировщик и, для режима по запросам, маршрут"""
+    profiler: SamplingProfiler
+    route: Optional[str] = None
+    route_pattern: Optional[Pattern] = None
+    remaining: int = 0
+    completed: int = 0
+    in_flight: int = 0
+    done: Optional[asyncio.Future] = None
+    started_at: float = field(default_factory=time.time)
+
+
+_session: Optional[ProfilingSession] = None
+
+
+def route_to_pattern(route: str) -> Pattern:
+    """Шаблон маршрута (/role-models/{role_model_id}) в регулярное выражение для пути"""
+    parts = re.split(r"(\{[^}]+\})", route)
+    regex = "".join("[^/]+" if part.startswith("{") else re.escape(part) for part in parts)
+    return re.compile(f"^{regex}$")
+
+
+def _begin(profiler: SamplingProfiler, **kwargs) -> ProfilingSession:
+    global _session
+    if _session is not None:
+        raise ProfilerBusyError("Профилирование уже выполняется")
+    _session = ProfilingSession(profiler=profiler, **kwargs)
+    profiler.start()
+    return _session
+
+
+def _end(session: ProfilingSession):
+    global _session
+    session.profiler.stop()
+    _session = None
+
+
+async def profile_for_seconds(seconds: float, interval: float, include_idle: bool = False) -> ProfilingSession:
+    """Профилировать процесс заданное время"""
+    session = _begin(SamplingProfiler(interval, include_idle))
+    try:
+        await asyncio.sleep(seconds)
+    finally:
+        _end(session)
+    return session
+
+
+async def profile_requests(route: str, count: int, timeout: float, interval: float,
+                           include_idle: bool = False) -> ProfilingSession:
+    """Профилировать следующие count запросов к маршруту (не дольше timeout секунд)"""
+    profiler = SamplingProfiler(interval, include_idle)
+    profiler.enabled = False
+    session = _begin(
+        profiler,
+        route=route,
+        route_pattern=route_to_pattern(route),
+        remaining=count,
+        done=asyncio.get_running_loop().create_future(),
+    )
+    try:
+        await asyncio.wait_for(asyncio.shield(session.done), timeout)
+    except asyncio.TimeoutError:
+        pass  # отдаем то, что успели собрать
+    finally:
+        _end(session)
+    return session
+
+
+class ProfilerMiddleware:
+    """
+    ASGI middleware для режима "следующие N запросов к маршруту"
+
+    Пока сеанса нет, стоит одну проверку на запрос.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        session = _session
+        if (
+            session is None
+            or session.route_pattern is None
+            or scope["type"] != "http"
+            or session.remaining <= 0
+            or not session.route_pattern.match(scope.get("path", ""))
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        session.remaining -= 1
+        session.in_flight += 1
+        session.profiler.enabled = True
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session.in_flight -= 1
+            session.completed += 1
+            if session.in_flight == 0:
+                session.profiler.enabled = False
+            if session.remaining <= 0 and session.in_flight == 0 and not session.done.done():
+                session.done.set_result(None)
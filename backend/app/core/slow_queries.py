@@ -0,0 +1,167 @@
+"""
+Журнал медленных SQL-запросов с планами выполнения
+
+Включается настройкой SLOW_QUERY_LOG_ENABLED. Запрос дольше
+SLOW_QUERY_THRESHOLD_MS попадает в кольцевой буфер вместе с параметрами,
+маршрутом, из которого он выполнен, и выводом EXPLAIN QUERY PLAN (SQLite)
+или EXPLAIN (PostgreSQL). Буфер просматривается через /api/v1/admin/slow-queries.
+"""
+import itertools
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.config import settings
+from app.core.metrics import current_request_stats
+from app.utils import logger
+
+# Длина строкового представления параметров, чтобы буфер не раздувался от executemany
+MAX_PARAMETERS_LENGTH = 1000
+
+# Для каких запросов имеет смысл снимать план
+EXPLAINABLE_PREFIXES = ("select", "with", "update", "delete", "insert")
+
+EXPLAIN_PREFIX_BY_DIALECT = {
+    "sqlite": "EXPLAIN QUERY PLAN ",
+    "postgresql": "EXPLAIN ",
+}
+
+
+@dataclass
+class SlowQuery:
+    """Запись о медленном запросе"""
+    id: int
+    recorded_at: datetime
+    duration_ms: float
+    statement: str
+    parameters: str
+    executemany: bool
+    method: Optional[str] = None
+    route: Optional[str] = None
+    plan: List[str] = field(default_factory=list)
+
+
+class SlowQueryLog:
+    """Кольцевой буфер медленных запросов"""
+
+    def __init__(self, max_size: int):
+        self._entries: Deque[SlowQuery] = deque(maxlen=max_size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def add(self, **kwargs) -> SlowQuery:
+        with self._lock:
+            entry = SlowQuery(id=next(self._ids), recorded_at=datetime.now(), **kwargs)
+            self._entries.append(entry)
+        return entry
+
+    def list(self, route: Optional[str] = None, min_duration_ms: float = 0.0) -> List[SlowQuery]:
+        """Записи от новых к старым"""
+        with self._lock:
+            entries = list(self._entries)
+        return [
+            entry for entry in reversed(entries)
+            if entry.duration_ms >= min_duration_ms and (route is None or entry.route == route)
+        ]
+
+    def get(self, entry_id: int) -> Optional[SlowQuery]:
+        with self._lock:
+            return next((entry for entry in self._entries if entry.id == entry_id), None)
+
+    def clear(self) -> int:
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+        return count
+
+    @property
+    def capacity(self) -> int:
+        return self._entries.maxlen
+
+
+slow_query_log = SlowQueryLog(settings.SLOW_QUERY_BUFFER_SIZE)
+
+
+# ===== ПЛАН ВЫПОЛНЕНИЯ =====
+
+def _format_sqlite_plan(rows) -> List[str]:
+    """Строки EXPLAIN QUERY PLAN (id, parent, notused, detail) в виде дерева"""
+    depth = {0: -1}
+    lines = []
+    for node_id, parent_id, _, detail in rows:
+        depth[node_id] = depth.get(parent_id, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def explain(dbapi_connection, dialect_name: str, statement: str, parameters: Any) -> List[str]:
+    """
+    План запроса через отдельный курсор DBAPI
+
+    Курсор DBAPI не проходит через события SQLAlchemy, поэтому сам EXPLAIN
+    не учитывается в метриках и не попадает в журнал рекурсивно.
+    """
+    prefix = EXPLAIN_PREFIX_BY_DIALECT.get(dialect_name)
+    if prefix is None:
+        return [f"EXPLAIN для диалекта {dialect_name} не поддерживается"]
+
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(prefix + statement, parameters)
+        rows = cursor.fetchall()
+    finally:
+        cursor.close()
+
+    if dialect_name == "sqlite":
+        return _format_sqlite_plan(rows)
+    return [row[0] for row in rows]
+
+
+# ===== СОБЫТИЯ SQLALCHEMY =====
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context._slow_query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if not settings.SLOW_QUERY_LOG_ENABLED:
+        return
+    duration_ms = (time.perf_counter() - context._slow_query_started) * 1000
+    if duration_ms < settings.SLOW_QUERY_THRESHOLD_MS:
+        return
+
+    plan: List[str] = []
+    # executemany - это пакет вставок, план одной строки ничего не скажет
+    if settings.SLOW_QUERY_EXPLAIN and not executemany \
+            and statement.lstrip().lower().startswith(EXPLAINABLE_PREFIXES):
+        try:
+            plan = explain(conn.connection.dbapi_connection, conn.dialect.name, statement, parameters)
+        except Exception as e:
+            plan = [f"EXPLAIN не выполнен: {e}"]
+
+    stats = current_request_stats()
+    entry = slow_query_log.add(
+        duration_ms=round(duration_ms, 2),
+        statement=statement,
+        parameters=repr(parameters)[:MAX_PARAMETERS_LENGTH],
+        executemany=executemany,
+        method=stats.method if stats else None,
+        route=stats.route if stats else None,
+        plan=plan,
+    )
+    logger.warning(f"Медленный SQL-запрос #{entry.id}: {entry.duration_ms:.0f} мс ({entry.route or 'вне HTTP-запроса'})")
+
+
+def instrument_slow_queries(engine: AsyncEngine):
+    """Подключить журнал медленных запросов к движку (повторный вызов ничего не делает)"""
+    sync_engine = engine.sync_engine
+    if event.contains(sync_engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(sync_engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", _after_cursor_execute)
@@ -1,14 +1,22 @@
 """
 Главный модуль FastAPI приложения
 """
-from fastapi import FastAPI, Request
+from fastapi import Depends, FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, PlainTextResponse
 
 from app.core.config import settings
-from app.core.database import create_tables
-from app.api import organization, employee, access, role_model
+from app.core.compute import compute_pool
+from app.core.database import create_tables, engine
+from app.core.metrics import MetricsMiddleware, PROMETHEUS_CONTENT_TYPE, instrument_engine, render_metrics
+from app.core.profiler import ProfilerMiddleware
+from app.core.slow_queries import instrument_slow_queries
+from app.api import organization, employee, access, role_model, admin
+from app.api.deps import require_admin
+from app.services.conversation_store import conversation_store
+from app.services.ai_jobs import job_queue
+from app.services.llm_client import llm_client
 from app.views import role_models, ai_tools, chat
 
 # Создание FastAPI приложения
@@ -32,6 +40,10 @@ app = FastAPI(
         {
             "name": "role-models",
             "description": "Ролевые модели и профили"
+        },
+        {
+            "name": "admin",
+            "description": "Диагностика производительности"
         }
     ]
 )
@@ -45,6 +57,14 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Метрики: время ответа, число SQL-запросов, заголовок Server-Timing
+instrument_engine(engine)
+instrument_slow_queries(engine)
+app.add_middleware(MetricsMiddleware)
+
+# Сэмплирующий профилировщик (режим "следующие N запросов к маршруту")
+app.add_middleware(ProfilerMiddleware)
+
 # Статические файлы
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -73,6 +93,13 @@ app.include_router(
     tags=["role-models"]
 )
 
+app.include_router(
+    admin.router,
+    prefix="/api/v1/admin",
+    tags=["admin"],
+    dependencies=[Depends(require_admin)]
+)
+
 # Подключение view роутеров
 app.include_router(
     role_models.router,
@@ -101,6 +128,19 @@ async def startup_event():
     print(f"🚀 {settings.PROJECT_NAME} запущен!")
     print(f"📖 Документация: http://localhost:8000/docs")
     print(f"🗄️ База данных: {settings.DATABASE_URL}")
+    conversation_store.start()
+    await llm_client.start()
+    await compute_pool.start()
+    await job_queue.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Завершение работы: остановить задачи ИИ, дописать очередь диалогов чата, закрыть соединения с LLM"""
+    await job_queue.stop()
+    compute_pool.stop()
+    await conversation_store.stop()
+    await llm_client.close()
 
 
 @app.get("/")
@@ -131,6 +171,12 @@ async def health_check():
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def metrics():
+    """Метрики в формате Prometheus"""
+    return PlainTextResponse(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
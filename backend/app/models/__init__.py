@@ -9,7 +9,7 @@ from .organization import (
 from .employee import Employee
 from .access import ApplicationSystem, Access, EmployeeAccess
 from .role_model import RoleModel, RoleProfile, ProfileAccess
-from .ml import MLModel, Cluster, AgentConversation, Feedback
+from .ml import MLModel, Cluster, AgentConversation, AIResponseCache, AIJob, Feedback
 
 __all__ = [
     "Base",
@@ -37,5 +37,7 @@ __all__ = [
     "MLModel",
     "Cluster",
     "AgentConversation", 
+    "AIResponseCache",
+    "AIJob",
     "Feedback"
 ]
@@ -3,7 +3,7 @@
 """
 from datetime import datetime
 from typing import List, Optional
-from sqlalchemy import String, Integer, ForeignKey, DateTime, func
+from sqlalchemy import String, Integer, ForeignKey, DateTime, Index, func
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.models.base import Base, TimestampMixin
@@ -40,6 +40,10 @@ class Access(Base, TimestampMixin):
 class EmployeeAccess(Base):
     """Назначенные доступы сотрудникам"""
     __tablename__ = "employee_accesses"
+    __table_args__ = (
+        # Ключ сопоставления назначений при синхронизации со снимком IAM
+        Index("ix_employee_accesses_employee_access", "employee_id", "access_id"),
+    )
     
     id: Mapped[int] = mapped_column(primary_key=True)
     employee_id: Mapped[int] = mapped_column(ForeignKey("employees.id"), nullable=False)
@@ -49,6 +53,11 @@ class EmployeeAccess(Base):
     
     assigned_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
     last_used: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    # Последнее изменение строки (вставка или обновление синхронизацией) - для отпечатка версии данных,
+    # индекс - чтобы max(updated_at) не сканировал таблицу
+    updated_at: Mapped[Optional[datetime]] = mapped_column(
+        DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), index=True
+    )
     
     # Relationships
     employee: Mapped["Employee"] = relationship("Employee", back_populates="employee_accesses")
@@ -49,7 +49,7 @@ class AgentConversation(Base):
     __tablename__ = "agent_conversations"
     
     id: Mapped[int] = mapped_column(primary_key=True)
-    session_id: Mapped[str] = mapped_column(String(100), nullable=False)
+    session_id: Mapped[str] = mapped_column(String(100), nullable=False, index=True)
     user_message: Mapped[str] = mapped_column(Text, nullable=False)
     agent_response: Mapped[str] = mapped_column(Text, nullable=False)
     context_data: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON)
@@ -57,6 +57,44 @@ class AgentConversation(Base):
     timestamp: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
 
 
+class AIResponseCache(Base):
+    """Кэш ответов LLM для ИИ-инструментов"""
+    __tablename__ = "ai_response_cache"
+    
+    id: Mapped[int] = mapped_column(primary_key=True)
+    cache_key: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)  # sha256 промпта, модели и версии данных
+    model_name: Mapped[str] = mapped_column(String(200), nullable=False)
+    role_model_id: Mapped[Optional[int]] = mapped_column(Integer, index=True)  # без FK: запись переживает удаление модели до вытеснения
+    data_version: Mapped[str] = mapped_column(String(64), nullable=False)
+    response: Mapped[str] = mapped_column(Text, nullable=False)
+    size_bytes: Mapped[int] = mapped_column(Integer, nullable=False)
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    last_used_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now(), index=True)
+
+
+class AIJob(Base):
+    """Фоновые задачи ИИ-инструментов"""
+    __tablename__ = "ai_jobs"
+    
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)  # uuid4().hex
+    tool: Mapped[str] = mapped_column(String(100), nullable=False)
+    params: Mapped[Dict[str, Any]] = mapped_column(JSON, nullable=False)
+    dedupe_key: Mapped[str] = mapped_column(String(64), nullable=False, index=True)  # sha256 инструмента и параметров
+    status: Mapped[str] = mapped_column(String(20), nullable=False, index=True)  # queued/running/done/failed
+    progress: Mapped[float] = mapped_column(Float, default=0.0)  # 0..1
+    progress_message: Mapped[Optional[str]] = mapped_column(String(255))
+    result: Mapped[Optional[Dict[str, Any]]] = mapped_column(JSON)
+    error: Mapped[Optional[str]] = mapped_column(Text)
+    owner: Mapped[Optional[str]] = mapped_column(String(64))  # процесс сервера, который выполняет задачу
+    heartbeat_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))  # владелец жив, пока обновляет
+    
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
+    started_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+    finished_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
+
+
 class Feedback(Base, TimestampMixin):
     """Обратная связь для ML моделей"""
     __tablename__ = "feedback"
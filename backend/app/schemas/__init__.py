@@ -6,3 +6,5 @@ from .employee import *
 from .access import *
 from .role_model import *
 from .ml import *
+from .sync import *
+from .admin import *
@@ -0,0 +1,45 @@
+"""
+Pydantic схемы для административных эндпоинтов
+"""
+from datetime import datetime
+from typing import List, Optional
+from pydantic import BaseModel, Field
+
+
+# ===== SLOW QUERIES =====
+
+class SlowQuery(BaseModel):
+    """Медленный SQL-запрос"""
+    id: int = Field(..., example=17)
+    recorded_at: datetime
+    duration_ms: float = Field(..., example=412.5, description="Время выполнения, мс")
+    statement: str = Field(..., description="SQL-запрос")
+    parameters: str = Field(..., example="('%иван%', 50, 0)", description="Параметры запроса (усечены)")
+    executemany: bool = Field(False, description="Пакетное выполнение")
+    method: Optional[str] = Field(None, example="GET", description="HTTP-метод запроса-источника")
+    route: Optional[str] = Field(None, example="/api/v1/employees/", description="Маршрут-источник")
+    plan: List[str] = Field(default_factory=list, example=["SCAN employees"], description="План выполнения")
+
+    class Config:
+        from_attributes = True
+
+
+class SlowQueryList(BaseModel):
+    """Содержимое журнала медленных запросов"""
+    enabled: bool = Field(..., description="Журнал включен (SLOW_QUERY_LOG_ENABLED)")
+    threshold_ms: float = Field(..., example=100, description="Порог записи, мс")
+    capacity: int = Field(..., example=200, description="Размер кольцевого буфера")
+    total: int = Field(..., example=3, description="Записей после фильтрации")
+    items: List[SlowQuery]
+
+
+# ===== AI RESPONSE CACHE =====
+
+class AICacheStats(BaseModel):
+    """Состояние кэша ответов LLM"""
+    enabled: bool = Field(..., description="Кэш включен (AI_CACHE_ENABLED)")
+    entries: int = Field(..., example=42, description="Записей в кэше")
+    size_bytes: int = Field(..., example=81920, description="Объем ответов, байт")
+    hits: int = Field(..., example=17, description="Попаданий по текущим записям")
+    max_entries: int = Field(..., example=5000)
+    max_bytes: int = Field(..., example=52428800)
@@ -165,6 +165,7 @@ class ClusteringRequest(BaseModel):
         description="Стратегия кластеризации: formal_attributes/access_history/hybrid"
     )
     target_clusters_count: Optional[int] = Field(None, example=6, description="Желаемое количество кластеров")
+    algorithm: str = Field("kmeans", example="kmeans", description="Алгоритм: kmeans (MiniBatchKMeans)/gmm (GaussianMixture)")
     features: Optional[List[str]] = Field(
         None,
         example=["org_unit", "position", "profile", "experience_years", "tech_stack"],
@@ -0,0 +1,26 @@
+"""
+Pydantic схемы для синхронизации со снимками HR/IAM
+"""
+from typing import Dict
+from pydantic import BaseModel, Field
+
+
+class TableChanges(BaseModel):
+    """Изменения по одной таблице"""
+    inserted: int = Field(0, example=12, description="Добавлено записей")
+    updated: int = Field(0, example=40, description="Изменено записей")
+    deleted: int = Field(0, example=7, description="Удалено (или деактивировано) записей")
+    unchanged: int = Field(0, example=1941, description="Записей без изменений")
+
+
+class SnapshotSyncResult(BaseModel):
+    """Сводка применения снимка"""
+    dry_run: bool = Field(False, example=False, description="Изменения рассчитаны, но не применены")
+    employees: TableChanges = Field(default_factory=TableChanges, description="Изменения по сотрудникам")
+    employee_accesses: TableChanges = Field(default_factory=TableChanges, description="Изменения по доступам сотрудников")
+    skipped_rows: Dict[str, int] = Field(
+        default_factory=dict,
+        example={"accesses_unknown_employee": 3},
+        description="Строки снимка, которые не удалось сопоставить"
+    )
+    duration_seconds: float = Field(0.0, example=1.8, description="Время синхронизации")
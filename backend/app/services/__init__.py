@@ -0,0 +1,3 @@
+"""
+Сервисный слой приложения
+"""
@@ -0,0 +1,407 @@
+"""
+Рекомендации доступов профилю по ассоциативным правилам (FP-Growth)
+
+Транзакции - наборы доступов сотрудников, подходящих под критерии профиля.
+Матрица "сотрудник x доступ" хранится разреженно (CSR: indptr + indices по
+назначениям), частые наборы доступов ищутся FP-Growth в пуле процессов:
+- редкие доступы (поддержка ниже min_support) отбрасываются до построения
+  дерева, одинаковые транзакции сливаются, поэтому FP-дерево не больше
+  числа частых назначений;
+- длина набора ограничена max_itemset_length, число наборов - MAX_ITEMSETS,
+  так что память не растет комбинаторно на плотных данных.
+
+Из частых наборов строятся правила A -> b с support/confidence/lift.
+Уверенность рекомендации доступа, которого нет в профиле, - наибольшее из
+его охвата среди сотрудников профиля и confidence правил с lift от MIN_LIFT,
+посылка которых состоит из доступов профиля (их получат все сотрудники
+профиля).
+
+Результат майнинга кэшируется в ml_models (model_type="recommendation"):
+одна запись на профиль с версией данных ролевой модели, справочников
+и параметрами.
+"""
+import hashlib
+import json
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.compute import compute_pool
+from app.models import (
+    Access, ApplicationSystem, Employee, EmployeeAccess, MLModel, ProfileAccess, RoleProfile
+)
+from app.schemas.ml import AccessRecommendation, AccessRecommendationResult
+from app.services.ai_cache import data_version, reference_version
+from app.services.profile_matching import matching_condition
+
+# Параметры по умолчанию (переопределяются параметрами инструмента)
+MIN_SUPPORT = 0.1
+MIN_CONFIDENCE = 0.4
+MAX_ITEMSET_LENGTH = 3
+MAX_ITEMSETS = 20000
+# Правило с меньшим lift почти не отличается от охвата доступа и рекомендацию не усиливает
+MIN_LIFT = 1.2
+RULES_LIMIT = 20
+
+# Границы корзин AccessRecommendationResult
+HIGH_CONFIDENCE = 0.8
+MEDIUM_CONFIDENCE = 0.6
+
+MODEL_TYPE = "recommendation"
+
+
+@dataclass
+class ProfileTransactions:
+    """Доступы сотрудников профиля в виде CSR-матрицы"""
+    employee_count: int
+    indptr: np.ndarray  # (сотрудники + 1,) начала строк
+    indices: np.ndarray  # (назначения,) столбец доступа
+    access_ids: np.ndarray  # (доступы,) id доступа столбца
+
+
+async def load_profile_transactions(criteria: Optional[Dict[str, Any]], db: AsyncSession) -> ProfileTransactions:
+    """Доступы сотрудников, подходящих под критерии, одним запросом"""
+    condition = matching_condition(criteria)
+    if condition is None:
+        return ProfileTransactions(0, np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.int32),
+                                   np.zeros(0, dtype=np.int64))
+
+    employee_count = (await db.execute(select(func.count(Employee.id)).where(condition))).scalar() or 0
+    pairs = (await db.execute(
+        select(EmployeeAccess.employee_id, EmployeeAccess.access_id)
+        .where(EmployeeAccess.employee_id.in_(select(Employee.id).where(condition)))
+    )).all()
+
+    flat = np.fromiter((value for pair in pairs for value in pair), dtype=np.int64, count=2 * len(pairs))
+    access_ids, columns = np.unique(flat[1::2], return_inverse=True)
+    # Повторные назначения одного доступа сотруднику считаются один раз
+    _, rows = np.unique(flat[0::2], return_inverse=True)
+    cells = np.unique(rows.astype(np.int64) * max(len(access_ids), 1) + columns)
+    rows, columns = cells // max(len(access_ids), 1), cells % max(len(access_ids), 1)
+
+    # Сотрудники без доступов - пустые строки в конце
+    indptr = np.zeros(employee_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=employee_count), out=indptr[1:])
+    return ProfileTransactions(employee_count, indptr, columns.astype(np.int32), access_ids)
+
+
+# ===== FP-GROWTH =====
+
+class _Node:
+    __slots__ = ("item", "count", "parent", "children")
+
+    def __init__(self, item: int, parent: Optional["_Node"]):
+        self.item = item
+        self.count = 0
+        self.parent = parent
+        self.children: Dict[int, "_Node"] = {}
+
+
+def _fp_tree(paths: Iterable[Tuple[Tuple[int, ...], int]]) -> Dict[int, List[_Node]]:
+    """FP-дерево по путям (элементы в порядке убывания поддержки); возвращает узлы по элементам"""
+    root = _Node(-1, None)
+    header: Dict[int, List[_Node]] = {}
+    for path, count in paths:
+        node = root
+        for item in path:
+            child = node.children.get(item)
+            if child is None:
+                child = node.children[item] = _Node(item, node)
+                header.setdefault(item, []).append(child)
+            child.count += count
+            node = child
+    return header
+
+
+def _prefix(node: _Node) -> Tuple[int, ...]:
+    items = []
+    node = node.parent
+    while node.item != -1:
+        items.append(node.item)
+        node = node.parent
+    return tuple(reversed(items))
+
+
+def _fp_growth(paths: List[Tuple[Tuple[int, ...], int]], suffix: Tuple[int, ...], min_count: int,
+               max_length: int, max_itemsets: int, found: Dict[Tuple[int, ...], int]) -> bool:
+    """Частые наборы с суффиксом suffix в found; False - достигнут max_itemsets"""
+    counts: Counter = Counter()
+    for path, count in paths:
+        for item in path:
+            counts[item] += count
+    frequent = {item for item, count in counts.items() if count >= min_count}
+    header = _fp_tree(
+        (tuple(item for item in path if item in frequent), count) for path, count in paths
+    )
+    # Элементы - ранги по убыванию поддержки: обход с наименее частых
+    for item in sorted(frequent, reverse=True):
+        itemset = tuple(sorted(suffix + (item,)))
+        found[itemset] = counts[item]
+        if len(found) >= max_itemsets:
+            return False
+        if len(itemset) < max_length:
+            conditional = [(_prefix(node), node.count) for node in header[item]]
+            conditional = [(path, count) for path, count in conditional if path]
+            if conditional and not _fp_growth(conditional, suffix + (item,), min_count,
+                                              max_length, max_itemsets, found):
+                return False
+    return True
+
+
+def mine_access_rules(indptr: np.ndarray, indices: np.ndarray, column_count: int, min_count: int,
+                      max_length: int, max_itemsets: int, min_confidence: float) -> Dict[str, Any]:
+    """
+    Частые наборы доступов и правила A -> b по CSR-матрице транзакций
+
+    Выполняется в пуле процессов. Элементы наборов - столбцы матрицы.
+    """
+    transactions = len(indptr) - 1
+    item_counts = np.bincount(indices, minlength=column_count)
+    frequent = np.flatnonzero(item_counts >= min_count)
+    # Ранг 0 - самый частый доступ; редкие доступы в дерево не попадают
+    rank = np.full(column_count, -1, dtype=np.int64)
+    rank[frequent[np.argsort(-item_counts[frequent], kind="stable")]] = np.arange(len(frequent))
+    column_of_rank = np.argsort(np.where(rank >= 0, rank, column_count + np.arange(column_count)))
+
+    ranked = rank[indices]
+    paths: Counter = Counter()
+    for row in range(transactions):
+        items = ranked[indptr[row]:indptr[row + 1]]
+        items = np.sort(items[items >= 0])
+        if len(items):
+            paths[tuple(items.tolist())] += 1
+
+    found: Dict[Tuple[int, ...], int] = {}
+    complete = _fp_growth(list(paths.items()), (), max(min_count, 1), max_length, max_itemsets, found)
+
+    rules = []
+    for itemset, count in found.items():
+        if len(itemset) < 2:
+            continue
+        for consequent in itemset:
+            antecedent = tuple(item for item in itemset if item != consequent)
+            if antecedent not in found:
+                # Перебор остановлен на max_itemsets раньше, чем дошел до посылки
+                continue
+            confidence = count / found[antecedent]
+            if confidence < min_confidence:
+                continue
+            lift = confidence / (item_counts[column_of_rank[consequent]] / transactions)
+            rules.append((
+                [int(column_of_rank[item]) for item in antecedent], int(column_of_rank[consequent]),
+                count, confidence, float(lift),
+            ))
+    return {
+        "item_counts": item_counts,
+        "itemsets": len(found),
+        "complete": complete,
+        "rules": rules,
+    }
+
+
+# ===== КЭШ =====
+
+def _model_name(profile_id: int) -> str:
+    return f"fpgrowth:profile:{profile_id}"
+
+
+def _settings_digest(settings: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()
+
+
+async def _cached_mining(profile_id: int, version: str, digest: str, db: AsyncSession) -> Optional[Dict[str, Any]]:
+    row = (await db.execute(
+        select(MLModel.model_metadata, MLModel.model_data)
+        .where(MLModel.model_type == MODEL_TYPE, MLModel.model_name == _model_name(profile_id))
+    )).first()
+    if row is None or row.model_metadata is None:
+        return None
+    if row.model_metadata.get("data_version") != version or row.model_metadata.get("settings") != digest:
+        return None
+    return json.loads(row.model_data)
+
+
+async def _store_mining(profile_id: int, version: str, digest: str, mining: Dict[str, Any], db: AsyncSession):
+    """Заменить запись профиля: по старой версии данных правила уже не нужны"""
+    await db.execute(delete(MLModel).where(
+        MLModel.model_type == MODEL_TYPE, MLModel.model_name == _model_name(profile_id)
+    ))
+    db.add(MLModel(
+        model_type=MODEL_TYPE,
+        model_name=_model_name(profile_id),
+        model_data=json.dumps(mining).encode(),
+        model_metadata={
+            "algorithm": "FP-Growth",
+            "profile_id": profile_id,
+            "data_version": version,
+            "settings": digest,
+            "transactions": mining["employees"],
+            "frequent_itemsets": mining["itemsets"],
+            "rules": len(mining["rules"]),
+        },
+    ))
+
+
+# ===== РЕКОМЕНДАЦИИ =====
+
+async def _mine(criteria: Optional[Dict[str, Any]], settings: Dict[str, Any], db: AsyncSession) -> Dict[str, Any]:
+    """Майнинг правил по сотрудникам профиля; в результате - id доступов, а не столбцы"""
+    transactions = await load_profile_transactions(criteria, db)
+    if not transactions.employee_count:
+        return {"employees": 0, "supports": {}, "itemsets": 0, "complete": True, "rules": []}
+
+    min_count = int(np.ceil(settings["min_support"] * transactions.employee_count))
+    mined = await compute_pool.run(
+        mine_access_rules, transactions.indptr, transactions.indices, len(transactions.access_ids),
+        min_count, settings["max_itemset_length"], MAX_ITEMSETS, settings["min_confidence"],
+    )
+    access_ids = transactions.access_ids.tolist()
+    return {
+        "employees": transactions.employee_count,
+        "supports": {str(access_ids[column]): int(count)
+                     for column, count in enumerate(mined["item_counts"].tolist()) if count},
+        "itemsets": mined["itemsets"],
+        "complete": mined["complete"],
+        "rules": [
+            {"antecedent": [access_ids[column] for column in antecedent], "consequent": access_ids[consequent],
+             "support": count, "confidence": confidence, "lift": lift}
+            for antecedent, consequent, count, confidence, lift in mined["rules"]
+        ],
+    }
+
+
+def _bucket(result: AccessRecommendationResult, recommendation: AccessRecommendation):
+    if recommendation.confidence > HIGH_CONFIDENCE:
+        result.high_confidence.append(recommendation)
+    elif recommendation.confidence >= MEDIUM_CONFIDENCE:
+        result.medium_confidence.append(recommendation)
+    else:
+        result.low_confidence.append(recommendation)
+
+
+async def suggest_profile_accesses(profile_id: int, db: AsyncSession,
+                                   parameters: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Рекомендации доступов профилю по корзинам уверенности (None - профиля нет)"""
+    parameters = parameters or {}
+    settings = {
+        "min_support": float(parameters.get("min_support", MIN_SUPPORT)),
+        "min_confidence": float(parameters.get("min_confidence", MIN_CONFIDENCE)),
+        "max_itemset_length": int(parameters.get("max_itemset_length", MAX_ITEMSET_LENGTH)),
+    }
+
+    profile = (await db.execute(
+        select(RoleProfile.role_model_id, RoleProfile.criteria).where(RoleProfile.id == profile_id)
+    )).one_or_none()
+    if profile is None:
+        return None
+
+    # критерии профиля подбирают сотрудников по справочникам: их правка меняет охват
+    version = f"{await data_version(profile.role_model_id)}:{await reference_version()}"
+    digest = _settings_digest(settings)
+    mining = await _cached_mining(profile_id, version, digest, db)
+    cached = mining is not None
+    if mining is None:
+        mining = await _mine(profile.criteria, settings, db)
+        await _store_mining(profile_id, version, digest, mining, db)
+
+    profile_accesses = set((await db.execute(
+        select(ProfileAccess.access_id).where(ProfileAccess.role_profile_id == profile_id)
+    )).scalars().all())
+    employees = mining["employees"]
+    supports = {int(access_id): count for access_id, count in mining["supports"].items()}
+
+    # Лучшее правило для каждого доступа вне профиля: посылка - только доступы профиля
+    best_rules: Dict[int, Dict[str, Any]] = {}
+    for rule in mining["rules"]:
+        consequent = rule["consequent"]
+        if (consequent in profile_accesses or rule["lift"] < MIN_LIFT
+                or not profile_accesses.issuperset(rule["antecedent"])):
+            continue
+        if consequent not in best_rules or rule["confidence"] > best_rules[consequent]["confidence"]:
+            best_rules[consequent] = rule
+
+    candidates = {}
+    for access_id, count in supports.items():
+        if access_id in profile_accesses:
+            continue
+        coverage = count / employees
+        rule = best_rules.get(access_id)
+        confidence = max(coverage, rule["confidence"] if rule else 0.0)
+        if confidence >= settings["min_confidence"]:
+            candidates[access_id] = (coverage, confidence, rule if rule and rule["confidence"] > coverage else None)
+
+    top_rules = sorted(mining["rules"], key=lambda rule: (-rule["lift"], -rule["confidence"]))[:RULES_LIMIT]
+    names_needed = set(candidates) | profile_accesses | {
+        access_id for rule in top_rules for access_id in rule["antecedent"] + [rule["consequent"]]
+    } | {access_id for _, _, rule in candidates.values() if rule for access_id in rule["antecedent"]}
+    names = {}
+    if names_needed:
+        names = {
+            row.id: row for row in await db.execute(
+                select(Access.id, Access.role_name, Access.criticality, ApplicationSystem.name.label("system"))
+                .join(ApplicationSystem, ApplicationSystem.id == Access.system_id)
+                .where(Access.id.in_(names_needed))
+            )
+        }
+
+    def title(access_id: int) -> str:
+        access = names.get(access_id)
+        return f"{access.system}: {access.role_name}" if access else f"#{access_id}"
+
+    result = AccessRecommendationResult()
+    for access_id, (coverage, confidence, rule) in sorted(candidates.items(), key=lambda item: -item[1][1]):
+        if access_id not in names:
+            continue
+        if rule:
+            explanation = (
+                f"{rule['confidence']:.0%} сотрудников с доступами профиля "
+                f"{', '.join(title(item) for item in rule['antecedent'])} имеют и этот доступ "
+                f"(lift {rule['lift']:.2f})"
+            )
+        else:
+            explanation = f"{supports[access_id]} из {employees} сотрудников профиля уже имеют этот доступ"
+        _bucket(result, AccessRecommendation(
+            access_id=access_id,
+            access_name=names[access_id].role_name,
+            system_name=names[access_id].system,
+            confidence=round(confidence, 3),
+            explanation=explanation,
+            current_coverage=round(coverage, 3),
+        ))
+        if names[access_id].criticality in ("high", "critical"):
+            result.warnings.append(
+                f"Доступ '{title(access_id)}' имеет критичность {names[access_id].criticality} "
+                f"- требует дополнительного согласования"
+            )
+    if not employees:
+        result.warnings.append("Под критерии профиля не подходит ни один сотрудник")
+    if not mining["complete"]:
+        result.warnings.append(
+            f"Найдено больше {MAX_ITEMSETS} частых наборов, перебор остановлен - увеличьте min_support"
+        )
+
+    return {
+        **result.model_dump(),
+        "current_accesses": [
+            {"access_id": access_id, "name": title(access_id),
+             "current_coverage": round(supports.get(access_id, 0) / employees, 3) if employees else 0.0}
+            for access_id in sorted(profile_accesses)
+        ],
+        "rules": [
+            {"antecedent": [title(item) for item in rule["antecedent"]], "consequent": title(rule["consequent"]),
+             "support": round(rule["support"] / employees, 3), "confidence": round(rule["confidence"], 3),
+             "lift": round(rule["lift"], 2)}
+            for rule in top_rules
+        ],
+        "metrics": {
+            "employees": employees,
+            "frequent_itemsets": mining["itemsets"],
+            "rules": len(mining["rules"]),
+            **settings,
+            "cached": cached,
+        },
+    }
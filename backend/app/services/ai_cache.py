@@ -0,0 +1,192 @@
+"""
+Кэш ответов LLM для ИИ-инструментов
+
+Промпты инструментов собираются из состояния БД, а генерация на CPU идет
+десятки секунд, поэтому ответ сохраняется в таблицу ai_response_cache.
+Ключ - sha256 от сообщений промпта, имени модели и версии данных.
+
+Версия данных - отпечаток того, из чего собирается промпт: ролевая модель,
+ее профили и их доступы (количество и последнее изменение), а также
+сотрудники и назначенные доступы (количество, последний id и последнее
+изменение - обновление назначения синхронизацией со снимком не меняет
+ни количество, ни id). После изменения данных ключ меняется,
+а записи ролевой модели со старой версией удаляются при сохранении нового
+ответа. Размер кэша ограничен AI_CACHE_MAX_ENTRIES записей и
+AI_CACHE_MAX_BYTES байт, вытесняются давно не читавшиеся записи (LRU).
+"""
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import delete, func, select, update
+
+from app.core.config import settings
+from app.core.database import session_scope
+from app.models import (
+    AIResponseCache, Employee, EmployeeAccess, EmployeeProfile, EmployeeType, OrganizationalUnit, Position,
+    ProfileAccess, RoleModel, RoleProfile
+)
+from app.services.llm_client import complete
+from app.utils.logger import logger
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, ensure_ascii=False, sort_keys=True, default=str).encode()).hexdigest()
+
+
+async def data_version(role_model_id: Optional[int]) -> str:
+    """Отпечаток данных, из которых собираются промпты инструментов ролевой модели"""
+    profiles = select(RoleProfile.id).where(RoleProfile.role_model_id == role_model_id)
+    async with session_scope() as session:
+        row = (await session.execute(select(
+            select(RoleModel.updated_at).where(RoleModel.id == role_model_id).scalar_subquery(),
+            select(func.count(RoleProfile.id)).where(RoleProfile.role_model_id == role_model_id).scalar_subquery(),
+            select(func.max(RoleProfile.updated_at)).where(RoleProfile.role_model_id == role_model_id).scalar_subquery(),
+            select(func.count(ProfileAccess.id)).where(ProfileAccess.role_profile_id.in_(profiles)).scalar_subquery(),
+            select(func.max(ProfileAccess.updated_at)).where(ProfileAccess.role_profile_id.in_(profiles)).scalar_subquery(),
+            select(func.count(Employee.id)).scalar_subquery(),
+            select(func.max(Employee.updated_at)).scalar_subquery(),
+            select(func.count(EmployeeAccess.id)).scalar_subquery(),
+            select(func.max(EmployeeAccess.id)).scalar_subquery(),
+            select(func.max(EmployeeAccess.updated_at)).scalar_subquery(),
+        ))).one()
+    return _digest(tuple(row))
+
+
+async def snapshot_version() -> str:
+    """Отпечаток снимка сотрудников и их доступов (без ролевых моделей)"""
+    async with session_scope() as session:
+        row = (await session.execute(select(
+            select(func.count(Employee.id)).scalar_subquery(),
+            select(func.max(Employee.updated_at)).scalar_subquery(),
+            select(func.count(EmployeeAccess.id)).scalar_subquery(),
+            select(func.max(EmployeeAccess.id)).scalar_subquery(),
+            select(func.max(EmployeeAccess.updated_at)).scalar_subquery(),
+        ))).one()
+    return _digest(tuple(row))
+
+
+async def reference_version() -> str:
+    """Отпечаток справочников, по которым критерии профилей подбирают сотрудников"""
+    tables = (OrganizationalUnit, Position, EmployeeProfile, EmployeeType)
+    async with session_scope() as session:
+        row = (await session.execute(select(*(
+            column
+            for table in tables
+            for column in (
+                select(func.count(table.id)).scalar_subquery(),
+                select(func.max(table.updated_at)).scalar_subquery(),
+            )
+        )))).one()
+    return _digest(tuple(row))
+
+
+class AIResponseCacheStore:
+    """Ответы LLM в SQLite с LRU-вытеснением по числу записей и размеру"""
+
+    def cache_key(self, messages: List[Dict[str, str]], version: str) -> str:
+        return _digest({"messages": messages, "model": settings.LLM_MODEL, "version": version})
+
+    async def get(self, key: str) -> Optional[str]:
+        """Ответ из кэша (с отметкой обращения для LRU)"""
+        async with session_scope() as session:
+            response = (await session.execute(
+                select(AIResponseCache.response).where(AIResponseCache.cache_key == key)
+            )).scalar_one_or_none()
+            if response is not None:
+                await session.execute(
+                    update(AIResponseCache)
+                    .where(AIResponseCache.cache_key == key)
+                    .values(hits=AIResponseCache.hits + 1, last_used_at=datetime.now())
+                )
+        return response
+
+    async def put(self, key: str, response: str, role_model_id: Optional[int], version: str):
+        """Сохранить ответ, удалить ответы по устаревшим данным модели и вытеснить лишнее"""
+        async with session_scope() as session:
+            await session.execute(
+                delete(AIResponseCache).where(
+                    AIResponseCache.role_model_id.is_not_distinct_from(role_model_id),
+                    AIResponseCache.data_version != version,
+                )
+            )
+            await session.execute(delete(AIResponseCache).where(AIResponseCache.cache_key == key))
+            session.add(AIResponseCache(
+                cache_key=key,
+                model_name=settings.LLM_MODEL,
+                role_model_id=role_model_id,
+                data_version=version,
+                response=response,
+                size_bytes=len(response.encode()),
+                # С микросекундами: func.now() в SQLite дает секунды, и LRU путал бы порядок
+                last_used_at=datetime.now(),
+            ))
+            await session.flush()
+            await self._evict(session)
+
+    async def _evict(self, session):
+        """Удалить давно не читавшиеся записи сверх лимитов количества и размера"""
+        ranked = select(
+            AIResponseCache.id,
+            func.row_number().over(
+                order_by=(AIResponseCache.last_used_at.desc(), AIResponseCache.id.desc())
+            ).label("position"),
+            func.sum(AIResponseCache.size_bytes).over(
+                order_by=(AIResponseCache.last_used_at.desc(), AIResponseCache.id.desc())
+            ).label("total_bytes"),
+        ).subquery()
+        result = await session.execute(
+            delete(AIResponseCache).where(AIResponseCache.id.in_(
+                select(ranked.c.id).where(
+                    (ranked.c.position > settings.AI_CACHE_MAX_ENTRIES)
+                    | (ranked.c.total_bytes > settings.AI_CACHE_MAX_BYTES)
+                )
+            ))
+        )
+        if result.rowcount:
+            logger.info(f"Из кэша ответов LLM вытеснено записей: {result.rowcount}")
+
+    async def invalidate(self, role_model_id: Optional[int] = None) -> int:
+        """Удалить ответы ролевой модели (или все, если модель не указана)"""
+        query = delete(AIResponseCache)
+        if role_model_id is not None:
+            query = query.where(AIResponseCache.role_model_id == role_model_id)
+        async with session_scope() as session:
+            result = await session.execute(query)
+        return result.rowcount
+
+    async def stats(self) -> Dict[str, int]:
+        """Число записей, их объем и суммарное число попаданий"""
+        async with session_scope() as session:
+            row = (await session.execute(select(
+                func.count(AIResponseCache.id),
+                func.coalesce(func.sum(AIResponseCache.size_bytes), 0),
+                func.coalesce(func.sum(AIResponseCache.hits), 0),
+            ))).one()
+        return {"entries": row[0], "size_bytes": row[1], "hits": row[2]}
+
+
+ai_response_cache = AIResponseCacheStore()
+
+
+async def cached_completion(messages: List[Dict[str, str]],
+                            role_model_id: Optional[int]) -> Tuple[str, bool]:
+    """
+    Ответ LLM на промпт по данным ролевой модели и признак попадания в кэш
+
+    Одинаковые промпты, которые генерируются прямо сейчас, объединяет сам
+    LLM-клиент, поэтому повторная генерация не запускается и без кэша.
+    """
+    if not settings.AI_CACHE_ENABLED:
+        return await complete(messages), False
+
+    version = await data_version(role_model_id)
+    key = ai_response_cache.cache_key(messages, version)
+    response = await ai_response_cache.get(key)
+    if response is not None:
+        return response, True
+
+    response = await complete(messages)
+    await ai_response_cache.put(key, response, role_model_id, version)
+    return response, False
@@ -0,0 +1,346 @@
+"""
+Очередь фоновых задач ИИ-инструментов
+
+Запуск инструмента только ставит задачу в очередь и сразу возвращает ее id,
+а выполняют задачи AI_JOBS_WORKERS фоновых воркеров, поэтому долгий анализ
+не занимает обработчик запроса. CPU-емкие части инструменты отдают в пул
+процессов (app.core.compute), чтобы не блокировать event loop.
+
+Состояние задачи (статус, прогресс, результат или ошибка) хранится в
+таблице ai_jobs: статус пишется сразу, прогресс - не чаще
+AI_JOBS_PROGRESS_INTERVAL_SECONDS. Пока задача не завершена, ее снимок
+держится в памяти, и подписчики (SSE) получают каждое изменение.
+
+Одинаковые задачи (тот же инструмент с теми же параметрами), которые еще
+в очереди или выполняются, не дублируются - возвращается уже поставленная,
+в том числе другим процессом сервера (поиск по ai_jobs.dedupe_key).
+
+Сервер работает в нескольких процессах (uvicorn --workers), и задача
+выполняется в том процессе, который ее поставил. Процесс записывает себя в
+ai_jobs.owner и раз в AI_JOBS_HEARTBEAT_SECONDS обновляет heartbeat_at своих
+незавершенных задач. Задача, отметка которой старше AI_JOBS_STALE_SECONDS,
+считается прерванной (процесс упал или перезапущен) и помечается ошибкой -
+при старте и при каждой отметке любого процесса; задачи живых процессов
+не трогаются.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from uuid import uuid4
+
+from sqlalchemy import delete, or_, select, update
+
+from app.core.config import settings
+from app.core.database import session_scope
+from app.models import AIJob
+from app.utils.logger import logger
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+PENDING = (QUEUED, RUNNING)
+FINISHED = (DONE, FAILED)
+
+# Колонки ai_jobs, которые меняются по ходу выполнения
+_MUTABLE_FIELDS = ("status", "progress", "progress_message", "result", "error", "started_at", "finished_at")
+
+
+class JobQueueFullError(Exception):
+    """Очередь задач заполнена"""
+
+
+class JobProgress:
+    """Callback прогресса задачи: await progress(0.5, "Кластеризация")"""
+
+    def __init__(self, queue: "JobQueue", job_id: str):
+        self._queue = queue
+        self.job_id = job_id
+
+    async def __call__(self, fraction: float, message: Optional[str] = None):
+        changes: Dict[str, Any] = {"progress": min(max(fraction, 0.0), 1.0)}
+        if message is not None:
+            changes["progress_message"] = message
+        await self._queue._update(self.job_id, persist=False, **changes)
+
+
+JobHandler = Callable[[Dict[str, Any], JobProgress], Awaitable[Dict[str, Any]]]
+
+
+@dataclass
+class _JobState:
+    """Снимок незавершенной задачи и подписчики его изменений"""
+    snapshot: Dict[str, Any]
+    version: int = 0
+    persisted_at: float = field(default_factory=time.monotonic)
+    changed: asyncio.Condition = field(default_factory=asyncio.Condition)
+
+
+def _dedupe_key(tool: str, params: Dict[str, Any]) -> str:
+    return hashlib.sha256(
+        json.dumps({"tool": tool, "params": params}, ensure_ascii=False, sort_keys=True, default=str).encode()
+    ).hexdigest()
+
+
+def _job_snapshot(job: AIJob) -> Dict[str, Any]:
+    return {name: getattr(job, name) for name in ("id", "tool", "params", "created_at") + _MUTABLE_FIELDS}
+
+
+def _stale_before() -> datetime:
+    """Задачи с отметкой раньше этого момента считаются прерванными"""
+    return datetime.now() - timedelta(seconds=settings.AI_JOBS_STALE_SECONDS)
+
+
+class JobQueue:
+    """Очередь задач с пулом воркеров, сохранением прогресса и дедупликацией"""
+
+    def __init__(self):
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._states: Dict[str, _JobState] = {}
+        self._pending_keys: Dict[str, str] = {}
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        self._start_lock = asyncio.Lock()
+        # Уникален для процесса и его запуска: pid может повториться после перезапуска
+        self.owner = f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid4().hex[:8]}"
+
+    def tool(self, name: str) -> Callable[[JobHandler], JobHandler]:
+        """Декоратор: зарегистрировать обработчик инструмента"""
+        def register(handler: JobHandler) -> JobHandler:
+            self._handlers[name] = handler
+            return handler
+        return register
+
+    # ===== ЖИЗНЕННЫЙ ЦИКЛ =====
+
+    async def start(self):
+        """Пометить прерванные задачи, удалить старые и запустить воркеры"""
+        async with self._start_lock:
+            if self._workers:
+                return
+            await self._recover()
+            self._queue = asyncio.Queue()
+            self._workers = [
+                asyncio.create_task(self._worker(), name=f"ai-jobs-worker-{number}")
+                for number in range(settings.AI_JOBS_WORKERS)
+            ]
+            self._heartbeat_task = asyncio.create_task(self._heartbeat(), name="ai-jobs-heartbeat")
+
+    async def stop(self):
+        """Остановить воркеры; незавершенные задачи помечаются ошибкой"""
+        tasks = self._workers + ([self._heartbeat_task] if self._heartbeat_task else [])
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+        self._heartbeat_task = None
+        for job_id in list(self._states):
+            await self._finish(job_id, status=FAILED, error="Прервана остановкой сервера")
+
+    async def _recover(self):
+        now = datetime.now()
+        await self._fail_stale()
+        async with session_scope() as session:
+            result = await session.execute(
+                delete(AIJob).where(
+                    AIJob.finished_at < now - timedelta(hours=settings.AI_JOBS_RETENTION_HOURS)
+                )
+            )
+        if result.rowcount:
+            logger.info(f"Удалено старых задач ИИ-инструментов: {result.rowcount}")
+
+    async def _fail_stale(self):
+        """Пометить ошибкой незавершенные задачи, владелец которых давно не отмечался"""
+        async with session_scope() as session:
+            result = await session.execute(
+                update(AIJob)
+                .where(
+                    AIJob.status.in_(PENDING),
+                    or_(AIJob.heartbeat_at.is_(None), AIJob.heartbeat_at < _stale_before()),
+                )
+                .values(status=FAILED, error="Прервана перезапуском сервера", finished_at=datetime.now())
+            )
+        if result.rowcount:
+            logger.warning(f"Прерванных задач ИИ-инструментов помечено ошибкой: {result.rowcount}")
+
+    async def _heartbeat(self):
+        """Отмечать незавершенные задачи процесса живыми и закрывать брошенные"""
+        while True:
+            await asyncio.sleep(settings.AI_JOBS_HEARTBEAT_SECONDS)
+            try:
+                if self._states:
+                    async with session_scope() as session:
+                        await session.execute(
+                            update(AIJob)
+                            .where(AIJob.id.in_(list(self._states)), AIJob.owner == self.owner)
+                            .values(heartbeat_at=datetime.now())
+                        )
+                await self._fail_stale()
+            except Exception as e:
+                logger.error(f"Не удалось отметить задачи ИИ-инструментов: {e}")
+
+    # ===== ПОСТАНОВКА И ЧТЕНИЕ =====
+
+    async def submit(self, tool: str, params: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """Поставить задачу в очередь; возвращает снимок задачи и признак, что она уже стояла"""
+        if tool not in self._handlers:
+            raise KeyError(f"Неизвестный инструмент: {tool}")
+        await self.start()
+
+        key = _dedupe_key(tool, params)
+        job_id = self._pending_keys.get(key)
+        if job_id is not None:
+            return dict(self._states[job_id].snapshot), True
+        if self._queue.qsize() >= settings.AI_JOBS_MAX_QUEUE:
+            raise JobQueueFullError(f"В очереди {self._queue.qsize()} задач")
+
+        now = datetime.now()
+        snapshot = {
+            "id": uuid4().hex,
+            "tool": tool,
+            "params": params,
+            "status": QUEUED,
+            "progress": 0.0,
+            "progress_message": None,
+            "result": None,
+            "error": None,
+            "created_at": now,
+            "started_at": None,
+            "finished_at": None,
+        }
+        # Регистрируем до обращения к БД, чтобы параллельный такой же запрос попал в дедупликацию
+        self._states[snapshot["id"]] = _JobState(snapshot)
+        self._pending_keys[key] = snapshot["id"]
+        try:
+            async with session_scope() as session:
+                # Такая же задача другого процесса сервера
+                existing = (await session.execute(
+                    select(AIJob)
+                    .where(
+                        AIJob.dedupe_key == key,
+                        AIJob.status.in_(PENDING),
+                        AIJob.heartbeat_at >= _stale_before(),
+                    )
+                    .order_by(AIJob.created_at)
+                    .limit(1)
+                )).scalar_one_or_none()
+                if existing is None:
+                    session.add(AIJob(dedupe_key=key, owner=self.owner, heartbeat_at=now, **snapshot))
+        except Exception:
+            self._states.pop(snapshot["id"], None)
+            self._pending_keys.pop(key, None)
+            raise
+        if existing is not None:
+            self._states.pop(snapshot["id"], None)
+            self._pending_keys.pop(key, None)
+            return _job_snapshot(existing), True
+        self._queue.put_nowait(snapshot["id"])
+        logger.info(f"Задача {tool} поставлена в очередь: {snapshot['id']}")
+        return dict(snapshot), False
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Снимок задачи: незавершенной - из памяти, остальных - из БД"""
+        state = self._states.get(job_id)
+        if state is not None:
+            return dict(state.snapshot)
+        async with session_scope() as session:
+            job = (await session.execute(select(AIJob).where(AIJob.id == job_id))).scalar_one_or_none()
+        if job is None:
+            return None
+        return _job_snapshot(job)
+
+    async def watch(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """Снимки задачи при каждом изменении, до завершения (пусто, если задачи нет)"""
+        state = self._states.get(job_id)
+        if state is None:
+            # Задача завершена или выполняется другим процессом: следим по БД
+            previous = None
+            while True:
+                snapshot = await self.get(job_id)
+                if snapshot is None:
+                    return
+                if snapshot != previous:
+                    yield snapshot
+                    previous = snapshot
+                if snapshot["status"] in FINISHED:
+                    return
+                await asyncio.sleep(settings.AI_JOBS_PROGRESS_INTERVAL_SECONDS)
+
+        seen = -1
+        while True:
+            async with state.changed:
+                await state.changed.wait_for(lambda: state.version != seen)
+                seen = state.version
+                snapshot = dict(state.snapshot)
+            yield snapshot
+            if snapshot["status"] in FINISHED:
+                return
+
+    # ===== ВЫПОЛНЕНИЕ =====
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                logger.error(f"Ошибка воркера задач ИИ-инструментов: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str):
+        snapshot = self._states[job_id].snapshot
+        tool = snapshot["tool"]
+        await self._update(job_id, persist=True, status=RUNNING, started_at=datetime.now())
+        try:
+            async with asyncio.timeout(settings.AI_JOBS_TIMEOUT_SECONDS):
+                result = await self._handlers[tool](dict(snapshot["params"]), JobProgress(self, job_id))
+        except TimeoutError:
+            logger.error(f"Задача {tool} {job_id} не уложилась в {settings.AI_JOBS_TIMEOUT_SECONDS:.0f} с")
+            await self._finish(job_id, status=FAILED, error="Превышено время выполнения")
+        except Exception as e:
+            logger.error(f"Ошибка задачи {tool} {job_id}: {e}")
+            await self._finish(job_id, status=FAILED, error=str(e))
+        else:
+            await self._finish(job_id, status=DONE, progress=1.0, result=result)
+
+    async def _finish(self, job_id: str, **changes: Any):
+        await self._update(job_id, persist=True, finished_at=datetime.now(), **changes)
+        self._states.pop(job_id, None)
+        for key, pending_id in list(self._pending_keys.items()):
+            if pending_id == job_id:
+                del self._pending_keys[key]
+
+    async def _update(self, job_id: str, persist: bool, **changes: Any):
+        """Изменить снимок задачи, уведомить подписчиков и при необходимости записать в БД"""
+        state = self._states.get(job_id)
+        if state is None:
+            return
+        async with state.changed:
+            state.snapshot.update(changes)
+            state.version += 1
+            state.changed.notify_all()
+
+        now = time.monotonic()
+        if not persist and now - state.persisted_at < settings.AI_JOBS_PROGRESS_INTERVAL_SECONDS:
+            return
+        state.persisted_at = now
+        try:
+            async with session_scope() as session:
+                await session.execute(
+                    update(AIJob)
+                    .where(AIJob.id == job_id)
+                    .values({name: state.snapshot[name] for name in _MUTABLE_FIELDS})
+                )
+        except Exception as e:
+            logger.error(f"Не удалось сохранить состояние задачи {job_id}: {e}")
+
+
+job_queue = JobQueue()
@@ -0,0 +1,480 @@
+"""
+Кластеризация сотрудников для поиска ролей (role mining)
+
+Три стратегии (ClusteringRequest.strategy):
+- formal_attributes - one-hot формальных атрибутов (подразделение,
+  должность, профиль, тип сотрудника; состав задается features), числовые
+  признаки стандартизуются, списки (tech_stack, skills) - multi-hot;
+- access_history - разреженная матрица "сотрудник x доступ" с весами TF-IDF
+  и L2-нормировкой строк: косинусная близость наборов доступов, редкие
+  доступы весят больше массовых;
+- hybrid - взвешенная конкатенация обеих матриц (вес доступов HYBRID_ACCESS_WEIGHT).
+
+Разреженная матрица сжимается TruncatedSVD до SVD_COMPONENTS измерений, затем
+MiniBatchKMeans или GaussianMixture (diag). Если число кластеров не задано,
+перебираются кандидаты от 2 до MAX_CLUSTERS и выбирается лучший silhouette;
+silhouette и остальные метрики считаются на подвыборке SILHOUETTE_SAMPLE
+сотрудников, поэтому 40k сотрудников укладываются в десятки секунд.
+Вычисления выполняются в пуле процессов.
+
+Найденные кластеры сохраняются в clusters одной пакетной вставкой и заменяют
+прежние кластеры ролевой модели. Центры кластеров и scatter-график строятся
+по общей проекции сотрудников (app.services.projection), а не пересчитываются
+для каждой кластеризации.
+"""
+from collections import Counter
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.compute import compute_pool
+from app.models import Cluster, Employee, EmployeeAccess, EmployeeProfile, OrganizationalUnit, Position
+from app.schemas.ml import Cluster as ClusterSchema
+from app.schemas.ml import ClusteringRequest, ClusteringResult
+
+if TYPE_CHECKING:
+    from app.services.projection import Projection
+
+STRATEGIES = ("formal_attributes", "access_history", "hybrid")
+ALGORITHMS = ("kmeans", "gmm")
+
+# Признаки formal_attributes: категориальные (one-hot), числовые, списки (multi-hot)
+CATEGORICAL_FEATURES = {
+    "org_unit": Employee.org_unit_id,
+    "position": Employee.position_id,
+    "profile": Employee.profile_id,
+    "employee_type": Employee.employee_type_id,
+    "team_role": Employee.team_role_id,
+    "agile_team": Employee.agile_team_id,
+}
+NUMERIC_FEATURES = {
+    "experience_years": Employee.experience_years,
+    "company_tenure_months": Employee.company_tenure_months,
+}
+LIST_FEATURES = {
+    "tech_stack": Employee.tech_stack,
+    "skills": Employee.skills,
+}
+FEATURES = (*CATEGORICAL_FEATURES, *NUMERIC_FEATURES, *LIST_FEATURES)
+DEFAULT_FEATURES = ("org_unit", "position", "profile", "employee_type")
+
+HYBRID_ACCESS_WEIGHT = 0.5
+SVD_COMPONENTS = 32
+MAX_CLUSTERS = 30
+CLUSTER_CANDIDATES = 8
+SILHOUETTE_SAMPLE = 4000
+GMM_FIT_SAMPLE = 10000
+KMEANS_BATCH_SIZE = 2048
+# Порог рекомендаций по результатам
+LOW_SILHOUETTE = 0.1
+COMMON_TECH_SHARE = 0.5
+# Точек scatter-графика в результате (полная проекция - отдельным бинарным ответом)
+VISUALIZATION_POINTS = 2000
+CLUSTER_COLORS = (
+    "#FF6B6B", "#4ECDC4", "#45B7D1", "#F7B801", "#6A4C93", "#1B998B",
+    "#E36414", "#8AC926", "#FF595E", "#3D5A80", "#C77DFF", "#F15BB5",
+)
+
+
+@dataclass
+class ClusteringData:
+    """Признаки активных сотрудников для кластеризации"""
+    employee_ids: np.ndarray  # (сотрудники,)
+    categorical: np.ndarray  # (сотрудники, категориальные признаки) код, -1 - нет значения
+    numeric: np.ndarray  # (сотрудники, числовые признаки) float, nan - нет значения
+    lists: List[Tuple[np.ndarray, np.ndarray, int]]  # multi-hot признаки в CSR: indptr, indices, размер
+    access_indptr: np.ndarray  # (сотрудники + 1,)
+    access_indices: np.ndarray  # (назначения,) столбец доступа
+    access_count: int
+    profile_names: List[Optional[str]]
+    position_titles: List[Optional[str]]
+    experience: np.ndarray  # (сотрудники,) для описания кластеров
+    tech_stacks: List[Optional[List[str]]]
+
+
+def csr_pairs(rows: np.ndarray, values: np.ndarray, row_count: int) -> Tuple[np.ndarray, np.ndarray, int]:
+    """CSR-представление пар (строка, значение) без повторов: indptr, indices, число столбцов"""
+    uniques, columns = np.unique(values, return_inverse=True)
+    width = max(len(uniques), 1)
+    cells = np.unique(rows.astype(np.int64) * width + columns)
+    indptr = np.zeros(row_count + 1, dtype=np.int64)
+    np.cumsum(np.bincount(cells // width, minlength=row_count), out=indptr[1:])
+    return indptr, (cells % width).astype(np.int32), len(uniques)
+
+
+def _multi_hot(lists: List[Optional[List[str]]]) -> Tuple[np.ndarray, np.ndarray, int]:
+    rows = [row for row, values in enumerate(lists) for _ in (values or [])]
+    values = [value for values in lists for value in (values or [])]
+    return csr_pairs(np.asarray(rows, dtype=np.int64), np.asarray(values, dtype=object).astype(str), len(lists))
+
+
+async def load_clustering_data(request: ClusteringRequest, db: AsyncSession) -> ClusteringData:
+    """Признаки активных сотрудников (в подразделениях запроса и их потомках)"""
+    features = request.features or DEFAULT_FEATURES
+    categorical = [name for name in features if name in CATEGORICAL_FEATURES]
+    numeric = [name for name in features if name in NUMERIC_FEATURES]
+    lists = [name for name in features if name in LIST_FEATURES]
+
+    conditions = [Employee.status == "active"]
+    if request.org_unit_ids:
+        unit = aliased(OrganizationalUnit)
+        ancestor = aliased(OrganizationalUnit)
+        conditions.append(Employee.org_unit_id.in_(
+            select(unit.id)
+            .join(ancestor, or_(unit.id == ancestor.id, unit.path.startswith(ancestor.path + "/")))
+            .where(ancestor.id.in_(request.org_unit_ids))
+        ))
+
+    employees = (await db.execute(
+        select(
+            Employee.id,
+            EmployeeProfile.name,
+            Position.title,
+            Employee.experience_years,
+            Employee.tech_stack,
+            *(CATEGORICAL_FEATURES[name] for name in categorical),
+            *(NUMERIC_FEATURES[name] for name in numeric),
+            *(LIST_FEATURES[name] for name in lists),
+        )
+        .outerjoin(EmployeeProfile, EmployeeProfile.id == Employee.profile_id)
+        .outerjoin(Position, Position.id == Employee.position_id)
+        .where(*conditions)
+        .order_by(Employee.id)
+    )).all()
+    count = len(employees)
+    employee_ids = np.fromiter((row[0] for row in employees), dtype=np.int64, count=count)
+
+    offset = 5
+    categorical_codes = np.full((count, len(categorical)), -1, dtype=np.int64)
+    for column in range(len(categorical)):
+        categorical_codes[:, column] = [
+            -1 if row[offset + column] is None else row[offset + column] for row in employees
+        ]
+    offset += len(categorical)
+    numeric_values = np.array(
+        [[np.nan if row[offset + column] is None else row[offset + column] for column in range(len(numeric))]
+         for row in employees],
+        dtype=np.float64,
+    ).reshape(count, len(numeric))
+    offset += len(numeric)
+    list_matrices = [_multi_hot([row[offset + column] for row in employees]) for column in range(len(lists))]
+
+    pairs = (await db.execute(
+        select(EmployeeAccess.employee_id, EmployeeAccess.access_id)
+        .where(EmployeeAccess.employee_id.in_(select(Employee.id).where(*conditions)))
+    )).all()
+    flat = np.fromiter((value for pair in pairs for value in pair), dtype=np.int64, count=2 * len(pairs))
+    access_indptr, access_indices, access_count = csr_pairs(
+        np.searchsorted(employee_ids, flat[0::2]), flat[1::2], count
+    )
+
+    return ClusteringData(
+        employee_ids=employee_ids,
+        categorical=categorical_codes,
+        numeric=numeric_values,
+        lists=list_matrices,
+        access_indptr=access_indptr,
+        access_indices=access_indices,
+        access_count=access_count,
+        profile_names=[row[1] for row in employees],
+        position_titles=[row[2] for row in employees],
+        experience=np.array([np.nan if row[3] is None else row[3] for row in employees], dtype=np.float64),
+        tech_stacks=[row[4] for row in employees],
+    )
+
+
+# ===== ВЫЧИСЛЕНИЯ (ПУЛ ПРОЦЕССОВ) =====
+
+def _formal_matrix(categorical: np.ndarray, numeric: np.ndarray, lists: List[Tuple[np.ndarray, np.ndarray, int]]):
+    """Блоки формальных признаков с нормой строки ~1 у каждого блока"""
+    from scipy import sparse
+    from sklearn.preprocessing import normalize
+
+    count = len(categorical)
+    blocks = []
+    for column in range(categorical.shape[1]):
+        codes = categorical[:, column]
+        rows = np.flatnonzero(codes >= 0)
+        _, columns = np.unique(codes[rows], return_inverse=True)
+        blocks.append(sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.float32), (rows, columns)), shape=(count, int(columns.max(initial=-1)) + 1)
+        ))
+    for column in range(numeric.shape[1]):
+        values = numeric[:, column]
+        values = np.where(np.isnan(values), np.nanmean(values) if np.isfinite(values).any() else 0.0, values)
+        spread = values.std() or 1.0
+        blocks.append(sparse.csr_matrix(((values - values.mean()) / spread).astype(np.float32)[:, None]))
+    for indptr, indices, width in lists:
+        if not width:
+            continue
+        matrix = sparse.csr_matrix((np.ones(len(indices), dtype=np.float32), indices, indptr), shape=(count, width))
+        blocks.append(normalize(matrix))
+    if not blocks:
+        return sparse.csr_matrix((count, 0), dtype=np.float32)
+    return sparse.hstack(blocks, format="csr") / np.sqrt(len(blocks))
+
+
+def access_matrix(indptr: np.ndarray, indices: np.ndarray, access_count: int):
+    """TF-IDF матрица доступов с L2-нормировкой строк"""
+    from scipy import sparse
+    from sklearn.preprocessing import normalize
+
+    count = len(indptr) - 1
+    if not access_count:
+        return sparse.csr_matrix((count, 0), dtype=np.float32)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(indices), dtype=np.float32), indices, indptr), shape=(count, access_count)
+    )
+    frequency = np.bincount(indices, minlength=access_count)
+    idf = (np.log((1 + count) / (1 + frequency)) + 1).astype(np.float32)
+    return normalize(matrix @ sparse.diags(idf))
+
+
+def feature_matrix(strategy: str, categorical: np.ndarray, numeric: np.ndarray,
+                   lists: List[Tuple[np.ndarray, np.ndarray, int]], access_indptr: np.ndarray,
+                   access_indices: np.ndarray, access_count: int, seed: int = 0) -> np.ndarray:
+    """Плотная матрица признаков стратегии после TruncatedSVD (float32)"""
+    from scipy import sparse
+    from sklearn.decomposition import TruncatedSVD
+
+    if strategy == "formal_attributes":
+        matrix = _formal_matrix(categorical, numeric, lists)
+    elif strategy == "access_history":
+        matrix = access_matrix(access_indptr, access_indices, access_count)
+    else:
+        matrix = sparse.hstack([
+            _formal_matrix(categorical, numeric, lists) * np.sqrt(1 - HYBRID_ACCESS_WEIGHT),
+            access_matrix(access_indptr, access_indices, access_count) * np.sqrt(HYBRID_ACCESS_WEIGHT),
+        ], format="csr")
+
+    if matrix.shape[1] > SVD_COMPONENTS and matrix.shape[0] > SVD_COMPONENTS:
+        return TruncatedSVD(SVD_COMPONENTS, random_state=seed).fit_transform(matrix).astype(np.float32)
+    return matrix.toarray().astype(np.float32)
+
+
+def _fit(features: np.ndarray, clusters: int, algorithm: str, seed: int) -> np.ndarray:
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.mixture import GaussianMixture
+
+    if algorithm == "gmm":
+        rng = np.random.default_rng(seed)
+        sample = rng.choice(len(features), min(len(features), GMM_FIT_SAMPLE), replace=False)
+        model = GaussianMixture(clusters, covariance_type="diag", reg_covar=1e-4, random_state=seed)
+        return model.fit(features[sample]).predict(features)
+    model = MiniBatchKMeans(clusters, batch_size=KMEANS_BATCH_SIZE, n_init=3, random_state=seed)
+    return model.fit_predict(features)
+
+
+def _cluster_candidates(count: int, target: Optional[int]) -> List[int]:
+    if target:
+        return [max(1, min(target, count))]
+    upper = min(MAX_CLUSTERS, count - 1)
+    if upper < 2:
+        return [1]
+    return sorted(set(np.geomspace(2, upper, CLUSTER_CANDIDATES).round().astype(int).tolist()))
+
+
+def cluster_employees(strategy: str, algorithm: str, target_clusters: Optional[int], categorical: np.ndarray,
+                      numeric: np.ndarray, lists: List[Tuple[np.ndarray, np.ndarray, int]],
+                      access_indptr: np.ndarray, access_indices: np.ndarray, access_count: int,
+                      seed: int = 0) -> Dict[str, Any]:
+    """
+    Метки кластеров (0 - самый большой), выбор числа кластеров и метрики качества
+
+    Выполняется в пуле процессов.
+    """
+    from sklearn.metrics import (
+        calinski_harabasz_score, davies_bouldin_score, silhouette_samples, silhouette_score
+    )
+
+    features = feature_matrix(strategy, categorical, numeric, lists, access_indptr, access_indices,
+                              access_count, seed)
+    count = len(features)
+    sample = np.random.default_rng(seed).choice(count, min(count, SILHOUETTE_SAMPLE), replace=False)
+
+    def separable(labels: np.ndarray) -> bool:
+        return 1 < len(np.unique(labels[sample])) < len(sample)
+
+    # Без признаков (например, ни у кого нет доступов) все сотрудники - один кластер
+    candidates = _cluster_candidates(count, target_clusters) if features.shape[1] else [1]
+    scores: Dict[int, float] = {}
+    best_labels, best_score = np.zeros(count, dtype=np.int64), -np.inf
+    for clusters in candidates:
+        labels = _fit(features, clusters, algorithm, seed) if clusters > 1 else np.zeros(count, dtype=np.int64)
+        score = float(silhouette_score(features[sample], labels[sample])) if separable(labels) else -1.0
+        scores[clusters] = round(score, 4)
+        if score > best_score:
+            best_labels, best_score = labels, score
+
+    # Перенумерация по убыванию размера; пустые кластеры (GMM) исчезают
+    sizes = np.bincount(best_labels)
+    order = np.argsort(-sizes, kind="stable")
+    order = order[sizes[order] > 0]
+    relabel = np.empty(len(sizes), dtype=np.int64)
+    relabel[order] = np.arange(len(order))
+    labels = relabel[best_labels]
+
+    metrics: Dict[str, float] = {}
+    cluster_silhouette = [None] * len(order)
+    if separable(labels):
+        samples = silhouette_samples(features[sample], labels[sample])
+        for cluster in range(len(order)):
+            mask = labels[sample] == cluster
+            if mask.any():
+                cluster_silhouette[cluster] = float(samples[mask].mean())
+        metrics = {
+            "silhouette_score": float(samples.mean()),
+            "calinski_harabasz": float(calinski_harabasz_score(features[sample], labels[sample])),
+            "davies_bouldin": float(davies_bouldin_score(features[sample], labels[sample])),
+        }
+    return {
+        "labels": labels.astype(np.int32),
+        "scores": scores,
+        "metrics": metrics,
+        "cluster_silhouette": cluster_silhouette,
+    }
+
+
+# ===== РЕЗУЛЬТАТ =====
+
+def _dominant(values: List[Optional[str]]) -> Optional[str]:
+    common = Counter(value for value in values if value).most_common(1)
+    return common[0][0] if common else None
+
+
+def _cluster_name(profile: Optional[str], position: Optional[str], used: Counter) -> str:
+    name = " / ".join(value for value in (profile, position) if value) or "Кластер"
+    used[name] += 1
+    return (name if used[name] == 1 else f"{name} #{used[name]}")[:255]
+
+
+def _method(request: ClusteringRequest) -> str:
+    features = {
+        "formal_attributes": "one-hot",
+        "access_history": "TF-IDF",
+        "hybrid": "one-hot + TF-IDF",
+    }[request.strategy]
+    algorithm = "GaussianMixture" if request.algorithm == "gmm" else "MiniBatchKMeans"
+    return f"{request.strategy}: {features} + TruncatedSVD + {algorithm}"
+
+
+def _visualization(projection: "Projection", labels: np.ndarray,
+                   employee_ids: np.ndarray) -> Tuple[List[Optional[List[float]]], Dict[str, Any]]:
+    """Центры кластеров на проекции и прореженный scatter для ClusteringResult.visualization_data"""
+    positions, found = projection.positions(employee_ids)
+    clusters = int(labels.max()) + 1
+    coordinates = projection.coordinates[positions]
+    centers: List[Optional[List[float]]] = []
+    for cluster in range(clusters):
+        members = found & (labels == cluster)
+        center = coordinates[members].mean(axis=0, dtype=np.float64) if members.any() else None
+        centers.append(None if center is None else np.round(center, 4).tolist())
+
+    shown = np.flatnonzero(found)
+    if len(shown) > VISUALIZATION_POINTS:
+        shown = np.sort(np.random.default_rng(0).choice(shown, VISUALIZATION_POINTS, replace=False))
+    return centers, {
+        "projection": {
+            "url": "/api/v1/ai-tools/projection",
+            "version": projection.version,
+            "method": projection.method,
+            "points": len(projection.employee_ids),
+        },
+        "scatter_plot": {
+            "x": np.round(coordinates[shown, 0], 3).tolist(),
+            "y": np.round(coordinates[shown, 1], 3).tolist(),
+            "cluster": labels[shown].tolist(),
+        },
+        "cluster_colors": [CLUSTER_COLORS[cluster % len(CLUSTER_COLORS)] for cluster in range(clusters)],
+    }
+
+
+async def cluster_role_model(role_model_id: int, request: ClusteringRequest, data: ClusteringData,
+                             db: AsyncSession, projection: Optional["Projection"] = None) -> Dict[str, Any]:
+    """
+    Кластеризация, сохранение кластеров ролевой модели и рекомендации по ним
+
+    С проекцией (app.services.projection) центры кластеров - координаты на ней,
+    а в результат добавляется прореженный scatter-график.
+    """
+    if not len(data.employee_ids):
+        return {**ClusteringResult(recommendations=["Нет активных сотрудников для кластеризации"]).model_dump(),
+                "cluster_scores": {}}
+
+    computed = await compute_pool.run(
+        cluster_employees, request.strategy, request.algorithm, request.target_clusters_count,
+        data.categorical, data.numeric, data.lists,
+        data.access_indptr, data.access_indices, data.access_count,
+    )
+    labels = computed["labels"]
+    centers, visualization = (
+        _visualization(projection, labels, data.employee_ids) if projection is not None
+        else ([None] * (int(labels.max()) + 1), None)
+    )
+    members = np.argsort(labels, kind="stable")
+    bounds = np.cumsum(np.bincount(labels))[:-1]
+    method = _method(request)
+
+    used: Counter = Counter()
+    rows, details, profiles = [], [], []
+    for cluster, indexes in enumerate(np.split(members, bounds)):
+        indexes = indexes.tolist()
+        experience = data.experience[indexes]
+        techs = Counter(tech for index in indexes for tech in set(data.tech_stacks[index] or []))
+        profiles.append(_dominant([data.profile_names[index] for index in indexes]))
+        rows.append({
+            "role_model_id": role_model_id,
+            "name": _cluster_name(profiles[-1], _dominant([data.position_titles[index] for index in indexes]), used),
+            "employee_ids": data.employee_ids[indexes].tolist(),
+            "center_coordinates": centers[cluster],
+            "silhouette_score": computed["cluster_silhouette"][cluster],
+            "clustering_method": method,
+        })
+        details.append({
+            "employees_count": len(indexes),
+            "avg_experience_years": (
+                round(float(np.nanmean(experience)), 1) if np.isfinite(experience).any() else None
+            ),
+            "common_tech_stack": [
+                tech for tech, count in techs.most_common() if count >= COMMON_TECH_SHARE * len(indexes)
+            ] or None,
+        })
+
+    await db.execute(delete(Cluster).where(Cluster.role_model_id == role_model_id))
+    # Пакетный INSERT ... RETURNING: строки ответа сопоставляются с rows по порядку параметров
+    saved = (await db.execute(
+        insert(Cluster).returning(Cluster.id, Cluster.created_at, sort_by_parameter_order=True), rows
+    )).all()
+
+    clusters = [
+        ClusterSchema(id=cluster_id, created_at=created_at, **row, **detail)
+        for (cluster_id, created_at), row, detail in zip(saved, rows, details)
+    ]
+    recommendations = []
+    for cluster in clusters:
+        if cluster.silhouette_score is not None and cluster.silhouette_score < LOW_SILHOUETTE:
+            recommendations.append(
+                f"Кластер «{cluster.name}» разнородный (silhouette {cluster.silhouette_score:.2f}) - стоит разделить"
+            )
+    by_profile: Dict[str, List[str]] = {}
+    for cluster, profile in zip(clusters, profiles):
+        if profile:
+            by_profile.setdefault(profile, []).append(cluster.name)
+    for profile, names in by_profile.items():
+        if len(names) > 1:
+            recommendations.append(
+                f"Кластеры {', '.join(f'«{name}»' for name in names)} относятся к профилю «{profile}» "
+                f"- проверьте, не объединить ли их"
+            )
+
+    result = ClusteringResult(
+        clusters=clusters,
+        quality_metrics={name: round(value, 4) for name, value in computed["metrics"].items()},
+        recommendations=recommendations,
+        visualization_data=visualization,
+    )
+    return {**result.model_dump(mode="json"), "cluster_scores": computed["scores"]}
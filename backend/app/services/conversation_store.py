@@ -0,0 +1,241 @@
+"""
+Хранилище диалогов чата с ИИ-ассистентом
+
+Каждый обмен (сообщение пользователя + ответ ассистента) - строка
+agent_conversations. Запись не блокирует запрос: обмен ставится в очередь,
+а фоновая задача вставляет очередь пакетами (executemany) раз в
+CHAT_FLUSH_INTERVAL_SECONDS или при накоплении CHAT_FLUSH_BATCH строк.
+
+Последние CHAT_CACHE_MESSAGES обменов горячих диалогов держатся в памяти:
+LRU на CHAT_CACHE_SIZE диалогов, запись вытесняется через
+CHAT_CACHE_TTL_SECONDS без обращений. Чтение истории постранично идет из
+БД, первая страница - из кэша, если он ее покрывает.
+
+Кэш у каждого воркера свой: если запросы одного диалога попадают на разные
+воркеры, кэш может отставать от БД не дольше TTL.
+"""
+import asyncio
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.database import bulk_insert, session_scope
+from app.models import AgentConversation
+from app.utils.logger import logger
+
+
+@dataclass
+class _CachedConversation:
+    """Окно последних обменов диалога"""
+    exchanges: Deque[Dict[str, Any]]
+    complete: bool  # в окне весь диалог (он короче окна)
+    total: int
+    last_access: float = field(default_factory=time.monotonic)
+
+
+def _exchange_messages(exchange: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Обмен в виде двух сообщений чата"""
+    return [
+        {"role": "user", "content": exchange["user_message"],
+         "timestamp": exchange["timestamp"], "context": exchange["context_data"]},
+        {"role": "assistant", "content": exchange["agent_response"],
+         "timestamp": exchange["timestamp"], "context": exchange["context_data"]},
+    ]
+
+
+class ConversationStore:
+    """Диалоги в БД с пакетной записью и LRU+TTL кэшем горячих диалогов"""
+
+    def __init__(self):
+        self._cache: "OrderedDict[str, _CachedConversation]" = OrderedDict()
+        self._pending: List[Dict[str, Any]] = []
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._writer: Optional[asyncio.Task] = None
+
+    # ===== ЖИЗНЕННЫЙ ЦИКЛ =====
+
+    def start(self):
+        """Запустить фоновую запись (повторный вызов ничего не делает)"""
+        if self._writer is None or self._writer.done():
+            self._wakeup = asyncio.Event()
+            self._writer = asyncio.create_task(self._write_loop(), name="conversation-store-writer")
+
+    async def stop(self):
+        """Остановить фоновую запись и дописать очередь"""
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+        await self.flush()
+
+    async def _write_loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), settings.CHAT_FLUSH_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            self._evict_expired()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Ошибка записи диалогов чата: {e}")
+
+    # ===== ЗАПИСЬ =====
+
+    def append(self, conversation_id: str, user_message: str, agent_response: str,
+               context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Добавить обмен в диалог: сразу в кэш, в БД - со следующим пакетом"""
+        exchange = {
+            "session_id": conversation_id,
+            "user_message": user_message,
+            "agent_response": agent_response,
+            "context_data": context,
+            "timestamp": datetime.now(),
+        }
+
+        cached = self._cache.get(conversation_id)
+        if cached is not None:
+            cached.exchanges.append(exchange)
+            cached.total += 1
+            cached.complete = cached.complete and cached.total <= settings.CHAT_CACHE_MESSAGES
+            self._touch(conversation_id, cached)
+
+        if len(self._pending) >= settings.CHAT_MAX_PENDING:
+            # БД недоступна дольше, чем помещается в очередь - теряем самое старое, но не память
+            self._pending.pop(0)
+            logger.error("Очередь записи диалогов переполнена, старейший обмен отброшен")
+        self._pending.append(exchange)
+
+        self.start()
+        if len(self._pending) >= settings.CHAT_FLUSH_BATCH:
+            self._wakeup.set()
+        return exchange
+
+    async def flush(self):
+        """Записать накопленные обмены одним пакетом"""
+        async with self._flush_lock:
+            if not self._pending:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                async with session_scope() as session:
+                    await bulk_insert(session, AgentConversation, batch)
+            except Exception:
+                # Вернуть пакет в начало очереди - запишется в следующий раз
+                self._pending[:0] = batch
+                raise
+            logger.info(f"Записано обменов чата: {len(batch)}")
+
+    def _has_pending(self, conversation_id: str) -> bool:
+        return any(exchange["session_id"] == conversation_id for exchange in self._pending)
+
+    # ===== КЭШ =====
+
+    def _touch(self, conversation_id: str, cached: _CachedConversation):
+        cached.last_access = time.monotonic()
+        self._cache.move_to_end(conversation_id)
+
+    def _evict_expired(self):
+        deadline = time.monotonic() - settings.CHAT_CACHE_TTL_SECONDS
+        # Порядок LRU: самые давние обращения в начале
+        while self._cache:
+            conversation_id, cached = next(iter(self._cache.items()))
+            if cached.last_access > deadline:
+                break
+            self._cache.pop(conversation_id)
+
+    def _remember(self, conversation_id: str, cached: _CachedConversation):
+        self._cache[conversation_id] = cached
+        self._touch(conversation_id, cached)
+        while len(self._cache) > settings.CHAT_CACHE_SIZE:
+            self._cache.popitem(last=False)
+
+    def _cached(self, conversation_id: str) -> Optional[_CachedConversation]:
+        self._evict_expired()
+        cached = self._cache.get(conversation_id)
+        if cached is not None:
+            self._touch(conversation_id, cached)
+        return cached
+
+    # ===== ЧТЕНИЕ =====
+
+    async def _window(self, conversation_id: str) -> _CachedConversation:
+        """Окно последних обменов из кэша или из БД при промахе"""
+        cached = self._cached(conversation_id)
+        if cached is None:
+            if self._has_pending(conversation_id):
+                await self.flush()
+            exchanges, total = await self._load(conversation_id, 0, settings.CHAT_CACHE_MESSAGES)
+            cached = _CachedConversation(
+                exchanges=deque(exchanges, maxlen=settings.CHAT_CACHE_MESSAGES),
+                complete=total <= settings.CHAT_CACHE_MESSAGES,
+                total=total,
+            )
+            # При маленьком CHAT_CACHE_SIZE запись может сразу вытесниться - возвращаем её саму
+            self._remember(conversation_id, cached)
+        return cached
+
+    async def recent(self, conversation_id: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Последние обмены диалога (для контекста ответа), по возможности из кэша"""
+        limit = min(limit or settings.CHAT_CACHE_MESSAGES, settings.CHAT_CACHE_MESSAGES)
+        cached = await self._window(conversation_id)
+        return list(cached.exchanges)[-limit:]
+
+    async def history(self, conversation_id: str, offset: int = 0,
+                      limit: int = 20) -> Tuple[List[Dict[str, Any]], int]:
+        """
+        Страница истории: сообщения в хронологическом порядке и общее число обменов
+
+        offset отсчитывается от самого нового обмена, поэтому первая страница -
+        последние limit обменов.
+        """
+        cached = self._cached(conversation_id)
+        if offset + limit <= settings.CHAT_CACHE_MESSAGES or (cached is not None and cached.complete):
+            # Окно последних обменов покрывает страницу - читаем из кэша (загрузив окно при промахе)
+            cached = await self._window(conversation_id)
+            window = list(cached.exchanges)
+            end = len(window) - offset
+            exchanges = window[max(end - limit, 0):max(end, 0)]
+            total = cached.total
+        else:
+            if self._has_pending(conversation_id):
+                await self.flush()
+            exchanges, total = await self._load(conversation_id, offset, limit)
+
+        messages = [message for exchange in exchanges for message in _exchange_messages(exchange)]
+        return messages, total
+
+    async def _load(self, conversation_id: str, offset: int, limit: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Обмены из БД от новых к старым со сдвигом offset, в хронологическом порядке"""
+        async with session_scope() as session:
+            total = (await session.execute(
+                select(func.count(AgentConversation.id))
+                .where(AgentConversation.session_id == conversation_id)
+            )).scalar() or 0
+            rows = (await session.execute(
+                select(
+                    AgentConversation.session_id,
+                    AgentConversation.user_message,
+                    AgentConversation.agent_response,
+                    AgentConversation.context_data,
+                    AgentConversation.timestamp,
+                )
+                .where(AgentConversation.session_id == conversation_id)
+                .order_by(AgentConversation.id.desc())
+                .offset(offset)
+                .limit(limit)
+            )).all()
+        return [dict(row._mapping) for row in reversed(rows)], total
+
+
+conversation_store = ConversationStore()
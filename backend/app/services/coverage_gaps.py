@@ -0,0 +1,224 @@
+"""
+Анализ пробелов покрытия ролевой модели
+
+Активные сотрудники, которые не подходят ни под один профиль модели,
+находятся одним запросом: условия профилей (matching_condition) объединяются
+через OR, и за один проход по employees отбираются активные вне этого
+условия. Назначения (employee_accesses) загружаются только для непокрытых
+сотрудников, а при полном покрытии не загружаются вовсе.
+
+Непокрытые сотрудники группируются по (профиль сотрудника, должность, тип
+подразделения). Для каждой группы строится кандидатный профиль: доступы,
+которые есть хотя бы у CORE_ACCESS_SHARE сотрудников группы. Группы
+ранжируются по размеру и по доле их фактических назначений
+(employee_accesses), которую покрыл бы кандидатный профиль. Подсчеты по
+назначениям идут одним np.unique по парам (группа, доступ) в пуле
+процессов - память растет с числом назначений, а не с группы x доступы.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.compute import compute_pool
+from app.models import (
+    Access, ApplicationSystem, Employee, EmployeeAccess, EmployeeProfile, OrganizationalUnit,
+    Position, RoleModel, RoleProfile
+)
+from app.services.profile_matching import matching_condition
+
+# Доступ входит в кандидатный профиль, если он есть у этой доли группы
+CORE_ACCESS_SHARE = 0.5
+GAPS_LIMIT = 20
+
+
+@dataclass
+class CoverageData:
+    """Сотрудники, их группы, покрытие профилями и назначенные доступы"""
+    employee_count: int
+    active: np.ndarray  # (сотрудники,) bool
+    uncovered: np.ndarray  # (сотрудники,) bool, активные вне всех профилей
+    group_keys: List[Tuple[Optional[str], Optional[str], Optional[str]]]
+    group_of: np.ndarray  # (сотрудники,) индекс группы
+    assignment_rows: np.ndarray  # (назначения непокрытых активных,) индекс сотрудника
+    assignment_access_ids: np.ndarray  # (назначения непокрытых активных,) id доступа
+
+
+async def load_coverage_data(role_model_id: int, db: AsyncSession) -> Optional[CoverageData]:
+    """Данные для анализа пробелов (None - модели нет)"""
+    role_model = (await db.execute(select(RoleModel.id).where(RoleModel.id == role_model_id))).scalar()
+    if role_model is None:
+        return None
+
+    employees = (await db.execute(
+        select(
+            Employee.id,
+            Employee.status,
+            EmployeeProfile.name,
+            Position.title,
+            OrganizationalUnit.unit_type,
+        )
+        .outerjoin(EmployeeProfile, EmployeeProfile.id == Employee.profile_id)
+        .outerjoin(Position, Position.id == Employee.position_id)
+        .outerjoin(OrganizationalUnit, OrganizationalUnit.id == Employee.org_unit_id)
+        .order_by(Employee.id)
+    )).all()
+    employee_ids = np.fromiter((row[0] for row in employees), dtype=np.int64, count=len(employees))
+
+    group_index: Dict[Tuple[Optional[str], Optional[str], Optional[str]], int] = {}
+    group_of = np.fromiter(
+        (group_index.setdefault(tuple(row[2:]), len(group_index)) for row in employees),
+        dtype=np.int32, count=len(employees),
+    )
+
+    criteria = (await db.execute(
+        select(RoleProfile.criteria).where(RoleProfile.role_model_id == role_model_id)
+    )).scalars().all()
+    conditions = [condition for condition in map(matching_condition, criteria) if condition is not None]
+    uncovered_ids = select(Employee.id).where(Employee.status == "active")
+    if conditions:
+        # NOT IN, а не NOT (...): условие с NULL (опыт не указан) иначе выбросило бы сотрудника
+        uncovered_ids = uncovered_ids.where(Employee.id.not_in(select(Employee.id).where(or_(*conditions))))
+    uncovered = np.zeros(len(employees), dtype=bool)
+    uncovered_employee_ids = np.fromiter(await db.scalars(uncovered_ids), dtype=np.int64)
+    uncovered[np.searchsorted(employee_ids, uncovered_employee_ids)] = True
+
+    pairs = []
+    if len(uncovered_employee_ids):
+        pairs = (await db.execute(
+            select(EmployeeAccess.employee_id, EmployeeAccess.access_id)
+            .where(EmployeeAccess.employee_id.in_(uncovered_ids))
+        )).all()
+    # fromiter по плоскому потоку: np.asarray по строкам Row на порядки медленнее
+    assignments = np.fromiter(
+        (value for pair in pairs for value in pair), dtype=np.int64, count=2 * len(pairs)
+    ).reshape(-1, 2)
+    # Назначения сотрудников, которых нет в таблице (рассинхрон снимка), не учитываем
+    known = np.isin(assignments[:, 0], employee_ids)
+    rows = np.searchsorted(employee_ids, assignments[known, 0])
+
+    return CoverageData(
+        employee_count=len(employees),
+        active=np.fromiter((row[1] == "active" for row in employees), dtype=bool, count=len(employees)),
+        uncovered=uncovered,
+        group_keys=list(group_index),
+        group_of=group_of,
+        assignment_rows=rows.astype(np.int32),
+        assignment_access_ids=assignments[known, 1],
+    )
+
+
+def gap_statistics(uncovered_group: np.ndarray, group_count: int, assignment_rows: np.ndarray,
+                   assignment_access_ids: np.ndarray, core_share: float) -> Dict[str, np.ndarray]:
+    """
+    Размеры групп непокрытых сотрудников и покрытие их назначений кандидатными профилями
+
+    uncovered_group - группа каждого сотрудника или -1, если он покрыт или неактивен.
+    Выполняется в пуле процессов.
+    """
+    sizes = np.bincount(uncovered_group[uncovered_group >= 0], minlength=group_count)
+
+    assignment_group = uncovered_group[assignment_rows]
+    mask = assignment_group >= 0
+    access_ids, access_columns = np.unique(assignment_access_ids[mask], return_inverse=True)
+    access_count = max(len(access_ids), 1)
+    pairs, holders = np.unique(
+        assignment_group[mask].astype(np.int64) * access_count + access_columns, return_counts=True
+    )
+    pair_group = pairs // access_count
+    pair_access = access_ids[pairs % access_count]
+
+    core = holders >= core_share * sizes[pair_group]
+    return {
+        "sizes": sizes,
+        "assignments": np.bincount(pair_group, weights=holders, minlength=group_count),
+        "covered_assignments": np.bincount(pair_group[core], weights=holders[core], minlength=group_count),
+        "core_group": pair_group[core],
+        "core_access": pair_access[core],
+        "core_share": holders[core] / sizes[pair_group[core]],
+    }
+
+
+def _group_label(key: Tuple[Optional[str], Optional[str], Optional[str]]) -> str:
+    profile, position, unit_type = key
+    parts = [profile or "без профиля", position or "без должности"]
+    if unit_type:
+        parts.append(f"подразделения типа {unit_type}")
+    return ", ".join(parts)
+
+
+async def analyze_coverage_gaps(data: CoverageData, db: AsyncSession,
+                                parameters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Группы непокрытых сотрудников с кандидатными профилями, по убыванию пользы"""
+    parameters = parameters or {}
+    core_share = float(parameters.get("core_access_share", CORE_ACCESS_SHARE))
+    limit = int(parameters.get("limit", GAPS_LIMIT))
+
+    uncovered = data.uncovered
+    uncovered_group = np.where(uncovered, data.group_of, -1).astype(np.int32)
+    stats = await compute_pool.run(
+        gap_statistics, uncovered_group, len(data.group_keys),
+        data.assignment_rows, data.assignment_access_ids, core_share,
+    )
+
+    sizes = stats["sizes"]
+    coverage = np.divide(stats["covered_assignments"], stats["assignments"],
+                         out=np.zeros(len(sizes)), where=stats["assignments"] > 0)
+    # Польза кандидатного профиля: размер группы с поправкой на долю объясненных назначений
+    score = sizes * coverage
+    order = [group for group in np.lexsort((-sizes, -score)).tolist() if sizes[group] > 0][:limit]
+    selected = set(order)
+
+    core_by_group: Dict[int, List[Tuple[int, float]]] = {}
+    for group, access_id, share in zip(stats["core_group"].tolist(), stats["core_access"].tolist(),
+                                       stats["core_share"].tolist()):
+        if group in selected:
+            core_by_group.setdefault(group, []).append((access_id, share))
+
+    access_ids = {access_id for accesses in core_by_group.values() for access_id, _ in accesses}
+    names = {}
+    if access_ids:
+        names = {
+            row.id: row for row in await db.execute(
+                select(Access.id, Access.role_name, ApplicationSystem.name.label("system"))
+                .join(ApplicationSystem, ApplicationSystem.id == Access.system_id)
+                .where(Access.id.in_(access_ids))
+            )
+        }
+
+    gaps = []
+    for group in order:
+        key = data.group_keys[group]
+        accesses = sorted(core_by_group.get(group, []), key=lambda item: -item[1])
+        label = _group_label(key)
+        size = int(sizes[group])
+        gaps.append({
+            "type": "missing_profile",
+            "description": f"Нет профиля для {size} сотрудников: {label}",
+            "affected_employees": size,
+            "group": {"employee_profile": key[0], "position": key[1], "org_unit_type": key[2]},
+            "suggested_accesses": [
+                {"access_id": access_id, "system": names[access_id].system,
+                 "role_name": names[access_id].role_name, "share": round(share, 3)}
+                for access_id, share in accesses if access_id in names
+            ],
+            "access_coverage": round(float(coverage[group]), 3),
+            "score": round(float(score[group]), 2),
+            "suggestion": (
+                f"Создать профиль ({label}) с {len(accesses)} доступами: покроет "
+                f"{coverage[group]:.0%} текущих назначений группы"
+                if accesses else f"Проверить доступы группы ({label}): общих доступов нет"
+            ),
+        })
+
+    active = int(data.active.sum())
+    uncovered_count = int(uncovered.sum())
+    return {
+        "gaps": gaps,
+        "uncovered_employees": uncovered_count,
+        "active_employees": active,
+        "coverage_percentage": round(100 * (active - uncovered_count) / active, 1) if active else 0.0,
+        "uncovered_groups": int((sizes > 0).sum()),
+    }
@@ -0,0 +1,270 @@
+"""
+Подбор критериев профиля ролевой модели
+
+Эталон - активные сотрудники, которые фактически держат доступы профиля:
+назначено не меньше HOLDER_SHARE доступов ProfileAccess (по employee_accesses).
+Доступы, которые есть у большинства компании (COMMON_ACCESS_SHARE активных
+сотрудников), не отличают сотрудников профиля от остальных и в эталоне не
+участвуют.
+
+Критерии оцениваются по тому, насколько их состав совпадает с эталоном:
+precision - доля держателей среди подходящих под критерии, recall - доля
+держателей, которых критерии охватывают, итог - F-мера (beta).
+
+Поиск - жадный локальный: от текущих критериев перебираются изменения на
+один шаг (добавить или убрать должность, профиль сотрудника, тип
+сотрудника, подразделение; снять ограничение ключа; задать или снять
+диапазон experience_years по квантилям опыта держателей), лучшее изменение
+применяется, пока оно улучшает F-меру не меньше чем на MIN_GAIN, но не
+больше MAX_STEPS шагов. Кандидаты оцениваются по индексу сотрудников:
+состав - AND/OR кэшированных битсетов значений, совпадение с эталоном -
+popcount пересечения, поэтому SQL на кандидата не выполняется и за секунду
+оцениваются тысячи кандидатов.
+"""
+import json
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import ProfileAccess, RoleProfile
+from app.services.employee_index import VALUE_KEYS, EmployeeIndex, employee_index
+from app.services.profile_split import KEY_LABELS
+
+# Параметры по умолчанию (переопределяются параметрами инструмента)
+HOLDER_SHARE = 0.5
+COMMON_ACCESS_SHARE = 0.5
+BETA = 1.0
+MAX_STEPS = 5
+MIN_GAIN = 0.005
+# Значений одного ключа среди кандидатов на добавление (самые частые у держателей)
+MAX_CANDIDATE_VALUES = 20
+EXPERIENCE_QUANTILES_MIN = (0.05, 0.1, 0.25)
+EXPERIENCE_QUANTILES_MAX = (0.75, 0.9, 0.95)
+ALTERNATIVES_LIMIT = 10
+
+
+def _normalized(criteria: Dict[str, Any]) -> Dict[str, Any]:
+    """Критерии без пустых ключей; без ограничений - все сотрудники"""
+    if criteria.get("all_employees"):
+        return {"all_employees": True}
+    result = {key: value for key, value in criteria.items() if key != "all_employees" and value}
+    experience = result.get("experience_years")
+    if experience is not None and experience.get("min") is None and experience.get("max") is None:
+        del result["experience_years"]
+    return result or {"all_employees": True}
+
+
+def _candidate_values(index: EmployeeIndex, target_rows: np.ndarray) -> Dict[str, List[str]]:
+    """Самые частые у держателей значения каждого ключа"""
+    values: Dict[str, List[str]] = {}
+    for key in VALUE_KEYS:
+        codes, counts = np.unique(index.codes[key][target_rows], return_counts=True)
+        order = [code for code in codes[np.argsort(-counts, kind="stable")].tolist() if code >= 0]
+        values[key] = [index.values[key][code] for code in order[:MAX_CANDIDATE_VALUES]]
+    units = index.org_unit_of[target_rows]
+    codes, counts = np.unique(units[units >= 0], return_counts=True)
+    types = list(dict.fromkeys(index.org_units[code].unit_type for code in codes.tolist()))
+    names = [index.org_units[code].name for code in codes[np.argsort(-counts, kind="stable")].tolist()]
+    values["org_units_type"] = (types + [name for name in names if name not in types])[:MAX_CANDIDATE_VALUES]
+    return values
+
+
+def _experience_bounds(index: EmployeeIndex, target_rows: np.ndarray) -> Tuple[List[Optional[int]], List[Optional[int]]]:
+    """Кандидаты на нижнюю и верхнюю границу опыта по квантилям опыта держателей"""
+    experience = index.experience[target_rows]
+    experience = experience[~np.isnan(experience)]
+    if not len(experience):
+        return [None], [None]
+    lows = sorted({int(np.floor(value)) for value in np.quantile(experience, EXPERIENCE_QUANTILES_MIN)})
+    highs = sorted({int(np.ceil(value)) for value in np.quantile(experience, EXPERIENCE_QUANTILES_MAX)})
+    return [None, *lows], [None, *highs]
+
+
+def _moves(criteria: Dict[str, Any], values: Dict[str, List[str]],
+           bounds: Tuple[List[Optional[int]], List[Optional[int]]]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """Критерии на один шаг от текущих и описание изменения"""
+    base = {} if criteria.get("all_employees") else dict(criteria)
+    for key in (*VALUE_KEYS, "org_units_type"):
+        label = KEY_LABELS[key]
+        current = list(base.get(key) or [])
+        if current:
+            yield f"{label}: снять ограничение", _normalized({**base, key: []})
+            if len(current) > 1:
+                for value in current:
+                    yield f"{label}: убрать {value}", _normalized({**base, key: [item for item in current if item != value]})
+        for value in values[key]:
+            if value in current:
+                continue
+            if current:
+                yield f"{label}: добавить {value}", _normalized({**base, key: current + [value]})
+            else:
+                yield f"{label}: только {value}", _normalized({**base, key: [value]})
+
+    current = base.get("experience_years") or {}
+    lows, highs = bounds
+    for low in lows:
+        for high in highs:
+            if low is not None and high is not None and low > high:
+                continue
+            if (low, high) == (current.get("min"), current.get("max")):
+                continue
+            if low is None and high is None:
+                description = "опыт: снять ограничение"
+            else:
+                description = "опыт: " + " ".join(
+                    ([f"от {low}"] if low is not None else []) + ([f"до {high}"] if high is not None else [])
+                )
+            yield description, _normalized({**base, "experience_years": {"min": low, "max": high}})
+
+
+class _Scorer:
+    """Оценка критериев по битсетам индекса с кэшем по критериям"""
+
+    def __init__(self, index: EmployeeIndex, target: int, beta: float):
+        self.index = index
+        self.active = index.active_bitset()
+        self.target = target
+        self.target_count = target.bit_count()
+        self.beta2 = beta * beta
+        self.evaluated = 0
+        self._cache: Dict[str, Dict[str, Any]] = {}
+
+    def members(self, criteria: Dict[str, Any]) -> int:
+        return self.index.members(criteria) & self.active
+
+    def __call__(self, criteria: Dict[str, Any]) -> Dict[str, Any]:
+        key = json.dumps(criteria, sort_keys=True, ensure_ascii=False)
+        result = self._cache.get(key)
+        if result is None:
+            self.evaluated += 1
+            members = self.members(criteria)
+            size = members.bit_count()
+            matched = (members & self.target).bit_count()
+            precision = matched / size if size else 0.0
+            recall = matched / self.target_count if self.target_count else 0.0
+            denominator = self.beta2 * precision + recall
+            result = self._cache[key] = {
+                "employees": size,
+                "matched": matched,
+                "precision": round(precision, 4),
+                "recall": round(recall, 4),
+                "f_score": round((1 + self.beta2) * precision * recall / denominator, 4) if denominator else 0.0,
+            }
+        return result
+
+
+async def optimize_criteria(profile_id: int, db: AsyncSession,
+                            parameters: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Предложенные критерии профиля с шагами поиска и альтернативами (None - профиля нет)"""
+    parameters = parameters or {}
+    holder_share = float(parameters.get("holder_share", HOLDER_SHARE))
+    common_share = float(parameters.get("common_access_share", COMMON_ACCESS_SHARE))
+    beta = float(parameters.get("beta", BETA))
+    max_steps = int(parameters.get("max_steps", MAX_STEPS))
+
+    profile = (await db.execute(
+        select(RoleProfile.name, RoleProfile.criteria).where(RoleProfile.id == profile_id)
+    )).one_or_none()
+    if profile is None:
+        return None
+    current_criteria = profile.criteria or {}
+    access_ids = (await db.execute(
+        select(ProfileAccess.access_id).where(ProfileAccess.role_profile_id == profile_id)
+    )).scalars().all()
+
+    index = await employee_index.get()
+    started = time.perf_counter()
+    active = index.active_bitset()
+    active_count = active.bit_count()
+    specific = [
+        access_id for access_id in access_ids
+        if (index.holders(access_id) & active).bit_count() < common_share * active_count
+    ]
+    held = index.held_counts(specific)
+    target = index.bitset((held >= max(1.0, holder_share * len(specific))) & index.active) if specific else 0
+    target_rows = index.rows(target)
+    scorer = _Scorer(index, target, beta)
+    baseline = scorer(_normalized(current_criteria))
+    summary = {
+        "profile_accesses": len(access_ids),
+        "common_accesses": len(access_ids) - len(specific),
+        "holder_share": holder_share,
+        "target_employees": len(target_rows),
+    }
+    if not len(target_rows):
+        return {
+            "current_criteria": current_criteria,
+            "suggested_criteria": current_criteria,
+            "target": summary,
+            "current": baseline,
+            "suggested": baseline,
+            "changes": [],
+            "alternatives": [],
+            "impact": {
+                "current_employees": baseline["employees"],
+                "suggested_employees": baseline["employees"],
+                "improvement": (
+                    "У профиля нет доступов" if not access_ids
+                    else "У профиля нет доступов, отличающих его сотрудников: подбирать критерии не по чему"
+                    if not specific else "Доступы профиля никому не назначены: подбирать критерии не по чему"
+                ),
+            },
+            "search": {"candidates": scorer.evaluated, "steps": 0},
+        }
+
+    values = _candidate_values(index, target_rows)
+    bounds = _experience_bounds(index, target_rows)
+    best_criteria, best = _normalized(current_criteria), baseline
+    changes, alternatives = [], []
+    for step in range(max_steps):
+        scored = [
+            (description, criteria, scorer(criteria))
+            for description, criteria in _moves(best_criteria, values, bounds)
+        ]
+        scored.sort(key=lambda item: (-item[2]["f_score"], -item[2]["precision"]))
+        if step == 0:
+            alternatives = [
+                {"change": description, "criteria": criteria, **metrics}
+                for description, criteria, metrics in scored[:ALTERNATIVES_LIMIT]
+            ]
+        if not scored or scored[0][2]["f_score"] < best["f_score"] + MIN_GAIN:
+            break
+        description, best_criteria, best = scored[0]
+        changes.append({"change": description, "criteria": best_criteria, **best})
+    elapsed = time.perf_counter() - started
+
+    current_members = scorer.members(_normalized(current_criteria))
+    suggested_members = scorer.members(best_criteria)
+    gain = best["f_score"] - baseline["f_score"]
+    suggested_criteria = {**best_criteria, "all_employees": bool(best_criteria.get("all_employees"))}
+    return {
+        "current_criteria": current_criteria,
+        "suggested_criteria": suggested_criteria,
+        "target": summary,
+        "current": baseline,
+        "suggested": best,
+        "changes": changes,
+        "alternatives": alternatives,
+        "impact": {
+            "current_employees": baseline["employees"],
+            "suggested_employees": best["employees"],
+            "added_employees": (suggested_members & ~current_members).bit_count(),
+            "removed_employees": (current_members & ~suggested_members).bit_count(),
+            "improvement": (
+                f"F-мера {baseline['f_score']:.2f} -> {best['f_score']:.2f}: precision "
+                f"{baseline['precision']:.0%} -> {best['precision']:.0%}, recall "
+                f"{baseline['recall']:.0%} -> {best['recall']:.0%}"
+                if changes else "Текущие критерии уже лучше найденных изменений"
+            ),
+            "f_score_gain": round(gain, 4),
+        },
+        "search": {
+            "candidates": scorer.evaluated,
+            "steps": len(changes),
+            "seconds": round(elapsed, 3),
+            "candidates_per_second": round(scorer.evaluated / elapsed) if elapsed else None,
+        },
+    }
@@ -0,0 +1,293 @@
+"""
+Индекс сотрудников для инструментов работы с профилями
+
+Разделение, объединение профилей и подбор их критериев многократно
+вычисляют состав профиля и наборы доступов сотрудников, поэтому снимок
+сотрудников держится в памяти процесса: коды атрибутов, по которым работают
+критерии (profile_matching), опыт, уровень должности и матрица доступов
+"сотрудник x доступ" в CSR. Индекс строится одним проходом по БД и
+пересобирается, когда меняется snapshot_version или справочники
+(reference_version); одновременные запросы новой версии строят его один раз.
+
+Множества сотрудников - битсеты в Python int (бит i - строка i индекса):
+состав профиля - AND по ключам критериев от OR по значениям ключа, размер
+множества - int.bit_count(). Битсеты значений атрибутов и держателей
+доступов кэшируются в индексе, поэтому оценка критериев не обращается к БД
+и занимает микросекунды. Семантика совпадает с SQL-условием
+matching_condition, включая вложенные подразделения и всех сотрудников
+независимо от статуса.
+"""
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import select
+
+from app.core.database import session_scope
+from app.models import Employee, EmployeeAccess, EmployeeProfile, EmployeeType, OrganizationalUnit, Position
+from app.services.ai_cache import reference_version, snapshot_version
+from app.services.clustering import csr_pairs
+from app.utils.logger import logger
+
+# Ключи критериев со списком значений из справочника (org_units_type сверяется с подразделениями)
+VALUE_KEYS = ("employee_profiles", "positions", "employee_types")
+
+
+@dataclass
+class OrgUnitRef:
+    """Подразделение для сопоставления org_units_type"""
+    id: int
+    name: str
+    code: Optional[str]
+    unit_type: str
+    path: Optional[str]
+
+
+@dataclass
+class EmployeeIndex:
+    """Снимок сотрудников, их атрибутов и доступов одной версии"""
+    version: Tuple[str, str]
+    employee_ids: np.ndarray  # (сотрудники,) int64, по возрастанию
+    active: np.ndarray  # (сотрудники,) bool
+    experience: np.ndarray  # (сотрудники,) float, nan - не указан
+    position_levels: np.ndarray  # (сотрудники,) hierarchy_level должности
+    codes: Dict[str, np.ndarray]  # ключ VALUE_KEYS -> (сотрудники,) код значения, -1 - нет
+    values: Dict[str, List[str]]  # ключ VALUE_KEYS -> значения по кодам
+    hierarchy_levels: Dict[str, int]  # название должности -> hierarchy_level
+    org_units: List[OrgUnitRef]
+    org_unit_of: np.ndarray  # (сотрудники,) индекс в org_units, -1 - нет
+    access_ids: np.ndarray  # (столбцы,) id доступа столбца
+    access_indptr: np.ndarray  # (сотрудники + 1,)
+    access_indices: np.ndarray  # (назначения,) столбец доступа
+    _bitsets: Dict[Tuple[str, Any], int] = field(default_factory=dict, repr=False)
+    _holder_rows: Optional[Tuple[np.ndarray, np.ndarray]] = field(default=None, repr=False)
+
+    @property
+    def count(self) -> int:
+        return len(self.employee_ids)
+
+    @property
+    def everyone(self) -> int:
+        return (1 << self.count) - 1
+
+    # ===== БИТСЕТЫ =====
+
+    def bitset(self, mask: np.ndarray) -> int:
+        """Битсет по булевой маске строк"""
+        return int.from_bytes(np.packbits(mask, bitorder="little").tobytes(), "little")
+
+    def rows(self, bitset: int) -> np.ndarray:
+        """Строки индекса, входящие в битсет (по возрастанию)"""
+        size = (self.count + 7) // 8
+        bits = np.unpackbits(np.frombuffer(bitset.to_bytes(size, "little"), dtype=np.uint8), bitorder="little")
+        return np.flatnonzero(bits[:self.count])
+
+    def active_bitset(self) -> int:
+        return self._cached(("active", None), lambda: self.bitset(self.active))
+
+    def _cached(self, key: Tuple[str, Any], build) -> int:
+        bitset = self._bitsets.get(key)
+        if bitset is None:
+            bitset = self._bitsets[key] = build()
+        return bitset
+
+    def value_bitset(self, key: str, value: str) -> int:
+        """Сотрудники, подходящие под одно значение ключа критериев"""
+        if key == "org_units_type":
+            return self._cached((key, value), lambda: self.bitset(np.isin(self.org_unit_of, self._org_units(value))))
+        codes = self.codes[key]
+        values = self.values[key]
+        return self._cached((key, value), lambda: (
+            self.bitset(codes == values.index(value)) if value in values else 0
+        ))
+
+    def _org_units(self, value: str) -> np.ndarray:
+        """Подразделения со значением value (тип, код или название) и их потомки"""
+        ancestors = [unit for unit in self.org_units if value in (unit.unit_type, unit.code, unit.name)]
+        ids = {unit.id for unit in ancestors}
+        paths = {unit.path for unit in ancestors if unit.path is not None}
+        return np.array([
+            position for position, unit in enumerate(self.org_units)
+            if unit.id in ids or (unit.path is not None and any(
+                unit.path[:cut] in paths for cut, char in enumerate(unit.path) if char == "/"
+            ))
+        ], dtype=np.int64)
+
+    def experience_bitset(self, minimum: Optional[float], maximum: Optional[float]) -> int:
+        """Сотрудники с опытом в диапазоне (границы включительно, неуказанный опыт не подходит)"""
+        def build() -> int:
+            mask = ~np.isnan(self.experience)
+            if minimum is not None:
+                mask &= self.experience >= minimum
+            if maximum is not None:
+                mask &= self.experience <= maximum
+            return self.bitset(mask)
+        return self._cached(("experience_years", (minimum, maximum)), build)
+
+    def members(self, criteria: Optional[Dict[str, Any]]) -> int:
+        """Битсет сотрудников, подходящих под критерии (как matching_condition)"""
+        criteria = criteria or {}
+        if criteria.get("all_employees"):
+            return self.everyone
+
+        result, constrained = self.everyone, False
+        for key in (*VALUE_KEYS, "org_units_type"):
+            if criteria.get(key):
+                union = 0
+                for value in criteria[key]:
+                    union |= self.value_bitset(key, value)
+                result &= union
+                constrained = True
+        experience = criteria.get("experience_years") or {}
+        if experience.get("min") is not None or experience.get("max") is not None:
+            result &= self.experience_bitset(experience.get("min"), experience.get("max"))
+            constrained = True
+        return result if constrained else 0
+
+    def holders(self, access_id: int) -> int:
+        """Битсет сотрудников, которым назначен доступ"""
+        def build() -> int:
+            if self._holder_rows is None:
+                order = np.argsort(self.access_indices, kind="stable")
+                rows = np.repeat(np.arange(self.count), np.diff(self.access_indptr))[order]
+                column_ptr = np.zeros(len(self.access_ids) + 1, dtype=np.int64)
+                np.cumsum(np.bincount(self.access_indices, minlength=len(self.access_ids)), out=column_ptr[1:])
+                self._holder_rows = (column_ptr, rows)
+            column_ptr, rows = self._holder_rows
+            column = int(np.searchsorted(self.access_ids, access_id))
+            if column >= len(self.access_ids) or self.access_ids[column] != access_id:
+                return 0
+            mask = np.zeros(self.count, dtype=bool)
+            mask[rows[column_ptr[column]:column_ptr[column + 1]]] = True
+            return self.bitset(mask)
+        return self._cached(("holders", access_id), build)
+
+    # ===== ДОСТУПЫ =====
+
+    def access_submatrix(self, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """CSR доступов для подмножества строк: indptr, indices (столбцы индекса)"""
+        starts = self.access_indptr[rows]
+        lengths = self.access_indptr[rows + 1] - starts
+        indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=indptr[1:])
+        offsets = np.repeat(starts - indptr[:-1], lengths) + np.arange(indptr[-1])
+        return indptr, self.access_indices[offsets]
+
+    def held_counts(self, access_ids: Sequence[int]) -> np.ndarray:
+        """Сколько из данных доступов назначено каждому сотруднику"""
+        selected = np.isin(self.access_ids, np.asarray(list(access_ids), dtype=np.int64))
+        rows = np.repeat(np.arange(self.count), np.diff(self.access_indptr))
+        return np.bincount(rows[selected[self.access_indices]], minlength=self.count)
+
+    def access_counts(self, rows: np.ndarray) -> np.ndarray:
+        """Число держателей каждого столбца доступа среди строк"""
+        _, indices = self.access_submatrix(rows)
+        return np.bincount(indices, minlength=len(self.access_ids))
+
+    def present_values(self, key: str, rows: np.ndarray) -> List[str]:
+        """Значения ключа критериев, встречающиеся у сотрудников строк"""
+        codes = np.unique(self.codes[key][rows])
+        return [self.values[key][code] for code in codes.tolist() if code >= 0]
+
+
+async def _load(version: Tuple[str, str]) -> EmployeeIndex:
+    async with session_scope() as session:
+        employees = (await session.execute(
+            select(
+                Employee.id, Employee.status, Employee.experience_years, Employee.profile_id,
+                Employee.position_id, Employee.employee_type_id, Employee.org_unit_id,
+            ).order_by(Employee.id)
+        )).all()
+        references = {
+            "employee_profiles": (await session.execute(
+                select(EmployeeProfile.id, EmployeeProfile.name).order_by(EmployeeProfile.id)
+            )).all(),
+            "positions": (await session.execute(
+                select(Position.id, Position.title, Position.hierarchy_level).order_by(Position.id)
+            )).all(),
+            "employee_types": (await session.execute(
+                select(EmployeeType.id, EmployeeType.name).order_by(EmployeeType.id)
+            )).all(),
+        }
+        org_units = [
+            OrgUnitRef(*row) for row in await session.execute(
+                select(
+                    OrganizationalUnit.id, OrganizationalUnit.name, OrganizationalUnit.code,
+                    OrganizationalUnit.unit_type, OrganizationalUnit.path,
+                ).order_by(OrganizationalUnit.id)
+            )
+        ]
+        pairs = (await session.execute(select(EmployeeAccess.employee_id, EmployeeAccess.access_id))).all()
+
+    count = len(employees)
+    employee_ids = np.fromiter((row[0] for row in employees), dtype=np.int64, count=count)
+
+    def column(position: int) -> np.ndarray:
+        return np.fromiter((-1 if row[position] is None else row[position] for row in employees),
+                           dtype=np.int64, count=count)
+
+    def encode(ids: np.ndarray, reference_ids: Sequence[int]) -> np.ndarray:
+        """FK -> позиция в справочнике (-1, если значения нет)"""
+        reference_ids = np.asarray(reference_ids, dtype=np.int64)
+        if not len(reference_ids):
+            return np.full(len(ids), -1, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(reference_ids, ids), len(reference_ids) - 1)
+        return np.where(reference_ids[positions] == ids, positions, -1)
+
+    codes = {
+        key: encode(column(position), [row[0] for row in references[key]])
+        for key, position in (("employee_profiles", 3), ("positions", 4), ("employee_types", 5))
+    }
+    levels = np.array([row[2] for row in references["positions"]] + [-1], dtype=np.int64)
+
+    flat = np.fromiter((value for pair in pairs for value in pair), dtype=np.int64, count=2 * len(pairs))
+    # Назначения сотрудников, которых нет в таблице (рассинхрон снимка), не учитываем
+    known = np.isin(flat[0::2], employee_ids)
+    access_ids = np.unique(flat[1::2][known])
+    indptr, indices, _ = csr_pairs(
+        np.searchsorted(employee_ids, flat[0::2][known]), flat[1::2][known], count
+    )
+
+    return EmployeeIndex(
+        version=version,
+        employee_ids=employee_ids,
+        active=np.fromiter((row[1] == "active" for row in employees), dtype=bool, count=count),
+        experience=np.fromiter((np.nan if row[2] is None else row[2] for row in employees),
+                               dtype=np.float64, count=count),
+        position_levels=levels[codes["positions"]],
+        codes=codes,
+        values={key: [row[1] for row in rows] for key, rows in references.items()},
+        hierarchy_levels={row[1]: row[2] for row in references["positions"]},
+        org_units=org_units,
+        org_unit_of=encode(column(6), [unit.id for unit in org_units]),
+        access_ids=access_ids,
+        access_indptr=indptr,
+        access_indices=indices,
+    )
+
+
+class EmployeeIndexStore:
+    """Индекс последней версии снимка в памяти процесса"""
+
+    def __init__(self):
+        self._latest: Optional[EmployeeIndex] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self) -> EmployeeIndex:
+        """Индекс для текущей версии снимка и справочников"""
+        version = (await snapshot_version(), await reference_version())
+        if self._latest is not None and self._latest.version == version:
+            return self._latest
+        # Одновременные запросы новой версии строят индекс один раз
+        async with self._lock:
+            if self._latest is None or self._latest.version != version:
+                self._latest = await _load(version)
+                logger.info(
+                    f"Индекс сотрудников построен: {self._latest.count} сотрудников, "
+                    f"{len(self._latest.access_indices)} назначений"
+                )
+        return self._latest
+
+
+employee_index = EmployeeIndexStore()
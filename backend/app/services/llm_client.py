@@ -0,0 +1,319 @@
+"""
+Клиент LLM-сервера llama.cpp с потоковой выдачей токенов
+
+Запросы идут в OpenAI-совместимый эндпоинт /v1/chat/completions с
+stream=true: llama.cpp сам применяет шаблон чата модели и отдает токены
+по мере генерации (SSE-строки "data: {...}"). Для 8B модели на CPU время
+до первого токена заметнее общего времени ответа, поэтому:
+- системный промпт всегда первый и неизменный, а cache_prompt=true
+  позволяет серверу переиспользовать KV-кэш общего префикса диалога;
+- токены отдаются вызывающему коду сразу, без накопления.
+
+Один CPU-сервер обрабатывает столько запросов, сколько у него слотов
+(--parallel), поэтому клиент общий на процесс:
+- один httpx.AsyncClient с keep-alive, создается при старте и закрывается
+  при остановке приложения;
+- семафор на LLM_SLOTS одновременных генераций (0 - узнать у сервера через
+  /props; если сервер при старте недоступен, до первого успешного ответа
+  работает один слот, затем число слотов запрашивается заново), очередь
+  ожидания ограничена LLM_MAX_QUEUE: сверх нее запрос сразу получает
+  отказ, а не висит минутами;
+- одинаковые промпты, которые уже генерируются, не запускаются повторно:
+  новые подписчики получают те же токены с начала.
+
+Если все подписчики генерации ушли (клиенты отключились), генерация
+отменяется, HTTP-соединение закрывается, и llama.cpp ее прекращает.
+"""
+import asyncio
+import hashlib
+import json
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.utils.logger import logger
+
+SYSTEM_PROMPT = (
+    "Ты - ИИ-ассистент системы проектирования ролевых моделей доступа. "
+    "Помогаешь аналитикам оптимизировать профили, критерии попадания сотрудников "
+    "и наборы доступов. Отвечай кратко и по делу, на русском языке."
+)
+
+
+class LLMError(Exception):
+    """Ошибка LLM-сервера"""
+
+
+class LLMUnavailableError(LLMError):
+    """LLM-сервер недоступен (не удалось подключиться)"""
+
+
+class LLMOverloadedError(LLMError):
+    """Все слоты LLM-сервера заняты и очередь ожидания переполнена"""
+
+
+def build_chat_messages(user_message: str, context: Optional[Dict[str, Any]] = None,
+                        history: Optional[List[Dict[str, Any]]] = None) -> List[Dict[str, str]]:
+    """Сообщения для модели: системный промпт, последние обмены диалога и новый вопрос"""
+    messages = [{"role": "system", "content": SYSTEM_PROMPT}]
+    for exchange in history or []:
+        messages.append({"role": "user", "content": exchange["user_message"]})
+        messages.append({"role": "assistant", "content": exchange["agent_response"]})
+
+    content = user_message
+    if context:
+        # Контекст страницы - в конце, чтобы не ломать общий префикс для кэша промпта
+        content = f"{user_message}\n\nКонтекст: {json.dumps(context, ensure_ascii=False)}"
+    messages.append({"role": "user", "content": content})
+    return messages
+
+
+def build_tool_messages(task: str, facts: Dict[str, Any]) -> List[Dict[str, str]]:
+    """Сообщения для модели: системный промпт, задача ИИ-инструмента и посчитанные данные"""
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": (
+            f"{task}\n\nДанные анализа: {json.dumps(facts, ensure_ascii=False, sort_keys=True, default=str)}"
+        )},
+    ]
+
+
+class _Generation:
+    """Одна генерация на сервере и ее подписчики (одинаковые запросы)"""
+
+    def __init__(self, key: str):
+        self.key = key
+        self.tokens: List[str] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.subscribers = 0
+        self.queued = True  # ждет слота
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Condition()
+
+    async def publish(self, token: Optional[str] = None, error: Optional[BaseException] = None,
+                      done: bool = False):
+        async with self._changed:
+            if token is not None:
+                self.tokens.append(token)
+            if error is not None:
+                self.error = error
+            self.done = self.done or done or error is not None
+            self._changed.notify_all()
+
+    async def tokens_from(self, index: int) -> List[str]:
+        """Токены начиная с index; ждет новые, пока генерация не закончилась"""
+        async with self._changed:
+            await self._changed.wait_for(lambda: len(self.tokens) > index or self.done)
+            if len(self.tokens) == index and self.error is not None:
+                raise self.error
+            return self.tokens[index:]
+
+
+class LLMClient:
+    """Общий клиент LLM-сервера: пул соединений, слоты, очередь и объединение запросов"""
+
+    def __init__(self):
+        self._http: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.slots = 0
+        # Число слотов узнано у сервера или задано LLM_SLOTS; иначе - временно 1
+        self._slots_known = False
+        self._detecting = False
+        self._waiting = 0
+        self._active = 0
+        self._generations: Dict[str, _Generation] = {}
+        self._start_lock = asyncio.Lock()
+
+    # ===== ЖИЗНЕННЫЙ ЦИКЛ =====
+
+    async def start(self):
+        """Открыть пул соединений и определить число слотов сервера"""
+        async with self._start_lock:
+            if self._http is not None:
+                return
+            http = httpx.AsyncClient(
+                base_url=settings.LLM_API_URL,
+                timeout=httpx.Timeout(settings.LLM_READ_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_keepalive_connections=settings.LLM_POOL_SIZE,
+                    max_connections=settings.LLM_POOL_SIZE,
+                    keepalive_expiry=60.0,
+                ),
+            )
+            detected = None if settings.LLM_SLOTS else await self._detect_slots(http)
+            self.slots = settings.LLM_SLOTS or detected or 1
+            self._slots_known = bool(settings.LLM_SLOTS or detected)
+            self._slots = asyncio.Semaphore(self.slots)
+            self._http = http
+            logger.info(f"LLM-клиент: {settings.LLM_API_URL}, слотов: {self.slots}")
+
+    async def close(self):
+        """Отменить генерации и закрыть пул соединений"""
+        for generation in list(self._generations.values()):
+            if generation.task is not None:
+                generation.task.cancel()
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    @staticmethod
+    async def _detect_slots(http: httpx.AsyncClient) -> Optional[int]:
+        """Число слотов llama.cpp из /props (total_slots), при ошибке - None"""
+        try:
+            response = await http.get("/props", timeout=settings.LLM_CONNECT_TIMEOUT)
+            response.raise_for_status()
+            return max(int(response.json().get("total_slots", 1)), 1)
+        except Exception:
+            return None
+
+    async def _redetect_slots(self):
+        """Повторно узнать число слотов, когда сервер ответил (при старте он был недоступен)"""
+        if self._slots_known or self._detecting or self._http is None:
+            return
+        self._detecting = True
+        try:
+            detected = await self._detect_slots(self._http)
+            if detected is None or self._slots_known:
+                return
+            # Семафор не уменьшаем: до этого работал один слот, добавляем недостающие
+            for _ in range(detected - self.slots):
+                self._slots.release()
+            self.slots = max(detected, self.slots)
+            self._slots_known = True
+            logger.info(f"LLM-клиент: слотов сервера: {self.slots}")
+        finally:
+            self._detecting = False
+
+    def stats(self) -> Dict[str, int]:
+        """Текущая загрузка: слоты, генерации на сервере и в очереди"""
+        return {
+            "slots": self.slots,
+            "active": self._active,
+            "waiting": self._waiting,
+            "generations": len(self._generations),
+        }
+
+    # ===== ГЕНЕРАЦИЯ =====
+
+    async def stream(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Токены ответа модели; одинаковый запрос, который уже генерируется, переиспользуется"""
+        await self.start()
+        payload = {
+            "model": settings.LLM_MODEL,
+            "messages": messages,
+            "stream": True,
+            "max_tokens": settings.LLM_MAX_TOKENS,
+            "temperature": settings.LLM_TEMPERATURE,
+            "cache_prompt": True,
+        }
+        key = hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+        generation = self._generations.get(key)
+        if generation is None:
+            # Быстрый отказ: слотов нет, очередь полна - новый запрос не ставим
+            if self._active + self._waiting >= self.slots + settings.LLM_MAX_QUEUE:
+                raise LLMOverloadedError(
+                    f"LLM-сервер занят: {self._active} генераций, {self._waiting} в очереди"
+                )
+            generation = _Generation(key)
+            self._generations[key] = generation
+            # В очереди с момента создания, а не с первого шага задачи
+            self._waiting += 1
+            generation.task = asyncio.create_task(self._generate(generation, payload))
+            generation.task.add_done_callback(lambda _, g=generation: self._finished(g))
+        else:
+            logger.info("LLM: запрос объединен с уже выполняющейся генерацией")
+
+        generation.subscribers += 1
+        try:
+            index = 0
+            while True:
+                tokens = await generation.tokens_from(index)
+                if not tokens:
+                    if generation.error is not None:
+                        raise generation.error
+                    return
+                index += len(tokens)
+                for token in tokens:
+                    yield token
+        finally:
+            generation.subscribers -= 1
+            if generation.subscribers == 0 and not generation.done and generation.task is not None:
+                # Слушать некому - освобождаем слот сервера
+                generation.task.cancel()
+
+    async def _generate(self, generation: _Generation, payload: Dict[str, Any]):
+        try:
+            async with asyncio.timeout(settings.LLM_REQUEST_TIMEOUT):
+                await self._acquire_slot(generation)
+                try:
+                    async for token in self._request(payload):
+                        await generation.publish(token)
+                finally:
+                    self._active -= 1
+                    self._slots.release()
+            await generation.publish(done=True)
+            if not self._slots_known:
+                await self._redetect_slots()
+        except asyncio.CancelledError:
+            await generation.publish(error=LLMError("Генерация отменена"))
+        except TimeoutError:
+            await generation.publish(error=LLMError(
+                f"LLM-сервер не ответил за {settings.LLM_REQUEST_TIMEOUT:.0f} с"
+            ))
+        except Exception as e:
+            await generation.publish(error=e)
+
+    def _finished(self, generation: _Generation):
+        # Колбэк задачи: срабатывает и при отмене до ее первого шага
+        if generation.queued:
+            self._waiting -= 1
+        self._generations.pop(generation.key, None)
+
+    async def _acquire_slot(self, generation: _Generation):
+        try:
+            await asyncio.wait_for(self._slots.acquire(), settings.LLM_QUEUE_TIMEOUT)
+        except asyncio.TimeoutError:
+            raise LLMOverloadedError(f"Слот LLM-сервера не освободился за {settings.LLM_QUEUE_TIMEOUT:.0f} с")
+        generation.queued = False
+        self._waiting -= 1
+        self._active += 1
+
+    async def _request(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        try:
+            async with self._http.stream("POST", "/v1/chat/completions", json=payload) as response:
+                if response.status_code != 200:
+                    body = (await response.aread()).decode(errors="replace")
+                    raise LLMError(f"LLM-сервер вернул {response.status_code}: {body[:200]}")
+
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        break
+                    choice = json.loads(data)["choices"][0]
+                    token = choice.get("delta", {}).get("content")
+                    if token:
+                        yield token
+                    if choice.get("finish_reason"):
+                        break
+        except (httpx.ConnectError, httpx.ConnectTimeout) as e:
+            raise LLMUnavailableError(f"LLM-сервер недоступен ({settings.LLM_API_URL}): {e}") from e
+        except httpx.TimeoutException as e:
+            raise LLMError(f"Таймаут LLM-сервера: {e}") from e
+
+
+llm_client = LLMClient()
+
+
+async def complete(messages: List[Dict[str, str]]) -> str:
+    """Ответ модели целиком"""
+    return "".join([token async for token in llm_client.stream(messages)])
+
+
+def stream_chat(messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+    """Токены ответа модели по мере генерации (через общий клиент)"""
+    return llm_client.stream(messages)
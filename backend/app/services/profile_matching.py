@@ -0,0 +1,146 @@
+"""
+Подбор сотрудников по критериям профиля ролевой модели
+
+Критерии профиля (JSON поле criteria) превращаются в одно SQL-условие,
+поэтому и подсчет, и постраничная выборка выполняются на стороне БД.
+Поддерживаемые ключи:
+- employee_profiles - названия профилей сотрудников
+- positions - названия должностей
+- org_units_type - тип (unit_type), код или название подразделения;
+  подходят сотрудники этого подразделения и всех вложенных
+- employee_types - названия типов сотрудников
+- experience_years - диапазон опыта {"min": ..., "max": ...}, границы
+  включительно, любая из них может быть null
+- all_employees - все сотрудники (остальные ключи игнорируются)
+"""
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, func, literal, or_, select, true, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.models import Employee, EmployeeProfile, EmployeeType, OrganizationalUnit, Position
+
+
+def _org_units_condition(values: List[str]):
+    """Сотрудник в подходящем подразделении или в одном из его потомков (по path)"""
+    unit = aliased(OrganizationalUnit)
+    ancestor = aliased(OrganizationalUnit)
+    matched_units = (
+        select(unit.id)
+        .join(ancestor, or_(unit.id == ancestor.id, unit.path.startswith(ancestor.path + "/")))
+        .where(or_(
+            ancestor.unit_type.in_(values),
+            ancestor.code.in_(values),
+            ancestor.name.in_(values),
+        ))
+    )
+    return Employee.org_unit_id.in_(matched_units)
+
+
+def matching_condition(criteria: Optional[Dict[str, Any]]):
+    """SQL-условие для критериев профиля; None - под профиль никто не подходит"""
+    criteria = criteria or {}
+    if criteria.get("all_employees"):
+        return true()
+
+    conditions = []
+    if criteria.get("employee_profiles"):
+        conditions.append(Employee.profile.has(EmployeeProfile.name.in_(criteria["employee_profiles"])))
+    if criteria.get("positions"):
+        conditions.append(Employee.position.has(Position.title.in_(criteria["positions"])))
+    if criteria.get("org_units_type"):
+        conditions.append(_org_units_condition(criteria["org_units_type"]))
+    if criteria.get("employee_types"):
+        conditions.append(Employee.employee_type.has(EmployeeType.name.in_(criteria["employee_types"])))
+    experience = criteria.get("experience_years") or {}
+    if experience.get("min") is not None:
+        conditions.append(Employee.experience_years >= experience["min"])
+    if experience.get("max") is not None:
+        conditions.append(Employee.experience_years <= experience["max"])
+
+    return and_(*conditions) if conditions else None
+
+
+def _search_condition(search: str):
+    pattern = f"%{search}%"
+    return or_(
+        Employee.full_name.ilike(pattern),
+        Employee.email.ilike(pattern),
+        Employee.employee_number.ilike(pattern),
+    )
+
+
+async def count_matching_employees(criteria: Optional[Dict[str, Any]], db: AsyncSession,
+                                   search: Optional[str] = None) -> int:
+    """Количество сотрудников, подходящих под критерии"""
+    condition = matching_condition(criteria)
+    if condition is None:
+        return 0
+    query = select(func.count(Employee.id)).where(condition)
+    if search:
+        query = query.where(_search_condition(search))
+    result = await db.execute(query)
+    return result.scalar() or 0
+
+
+def matching_employees_query(criteria: Optional[Dict[str, Any]], search: Optional[str] = None):
+    """
+    Выборка сотрудников, подходящих под критерии, без пагинации (None - никто не подходит)
+
+    Выбираются только колонки для списка (одним запросом с outer join
+    справочников), ORM-объекты сотрудников не создаются.
+    """
+    condition = matching_condition(criteria)
+    if condition is None:
+        return None
+
+    query = (
+        select(
+            Employee.id,
+            Employee.full_name,
+            Employee.employee_number,
+            Employee.email,
+            Employee.status,
+            EmployeeProfile.name.label("profile_name"),
+            Position.title.label("position_title"),
+            OrganizationalUnit.name.label("org_unit_name"),
+            EmployeeType.name.label("employee_type_name"),
+        )
+        .outerjoin(EmployeeProfile, EmployeeProfile.id == Employee.profile_id)
+        .outerjoin(Position, Position.id == Employee.position_id)
+        .outerjoin(OrganizationalUnit, OrganizationalUnit.id == Employee.org_unit_id)
+        .outerjoin(EmployeeType, EmployeeType.id == Employee.employee_type_id)
+        .where(condition)
+        .order_by(Employee.full_name, Employee.id)
+    )
+    if search:
+        query = query.where(_search_condition(search))
+    return query
+
+
+async def get_matching_employees(criteria: Optional[Dict[str, Any]], db: AsyncSession,
+                                 page: int = 1, size: int = 50,
+                                 search: Optional[str] = None) -> List[dict]:
+    """Страница сотрудников, подходящих под критерии"""
+    query = matching_employees_query(criteria, search)
+    if query is None:
+        return []
+    result = await db.execute(query.offset((page - 1) * size).limit(size))
+    return [dict(row._mapping) for row in result]
+
+
+def profiles_membership_query(criteria_list: List[Optional[Dict[str, Any]]]):
+    """
+    Пары (row, employee_id) для нескольких профилей одним запросом (UNION ALL)
+
+    row - индекс критериев в criteria_list; None - ни под один профиль никто не подходит.
+    """
+    selects = []
+    for row, criteria in enumerate(criteria_list):
+        condition = matching_condition(criteria)
+        if condition is not None:
+            selects.append(select(literal(row).label("row"), Employee.id.label("employee_id")).where(condition))
+    if not selects:
+        return None
+    return selects[0] if len(selects) == 1 else union_all(*selects)
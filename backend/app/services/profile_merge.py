@@ -0,0 +1,229 @@
+"""
+Оценка объединения профилей ролевой модели
+
+Состав профилей берется из индекса сотрудников (битсеты), поэтому оценка
+любого числа профилей - это несколько OR/AND над битсетами и укладывается
+в миллисекунды после построения индекса:
+- объединенный состав - OR составов, пересечения - сотрудники, попавшие
+  хотя бы в два профиля и во все профили, попарные пересечения с Jaccard;
+- объединенные критерии - значения ключей, общих для всех профилей, без
+  ключей, которые ограничивает не каждый профиль; они шире точного
+  объединения, разница сообщается как extra_employees;
+- доступы - объединение и пересечение наборов ProfileAccess;
+- расширение привилегий - доступы объединенного профиля, которых у
+  активного сотрудника объединенных критериев сейчас нет
+  (состав & ~держатели доступа по каждому доступу).
+"""
+from collections import Counter
+from itertools import combinations
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Access, ApplicationSystem, Employee, ProfileAccess, RoleProfile
+from app.services.employee_index import VALUE_KEYS, employee_index
+
+# Профили совместимы, если их наборы доступов пересекаются не меньше чем на эту долю (Jaccard)
+MIN_ACCESS_JACCARD = 0.5
+# Предупреждение, если объединенные критерии добавляют столько сотрудников сверх профилей
+MAX_EXTRA_SHARE = 0.1
+ACCESS_LIST_LIMIT = 20
+TOP_EMPLOYEES = 10
+
+
+def union_criteria(criteria_list: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Критерии, под которые подходит каждый сотрудник любого из профилей"""
+    if any(criteria.get("all_employees") for criteria in criteria_list):
+        return {"all_employees": True}
+
+    merged: Dict[str, Any] = {}
+    for key in (*VALUE_KEYS, "org_units_type"):
+        # Ключ, который ограничивает не каждый профиль, из объединения выпадает
+        if all(criteria.get(key) for criteria in criteria_list):
+            merged[key] = list(dict.fromkeys(value for criteria in criteria_list for value in criteria[key]))
+
+    ranges = [criteria.get("experience_years") or {} for criteria in criteria_list]
+    if all(bounds.get("min") is not None or bounds.get("max") is not None for bounds in ranges):
+        minimums = [bounds.get("min") for bounds in ranges]
+        maximums = [bounds.get("max") for bounds in ranges]
+        merged["experience_years"] = {
+            "min": None if None in minimums else min(minimums),
+            "max": None if None in maximums else max(maximums),
+        }
+    return merged if merged else {"all_employees": True}
+
+
+def _suggested_name(names: List[str]) -> str:
+    """Общие слова названий профилей, иначе названия через " / \""""
+    common = set.intersection(*(set(name.split()) for name in names))
+    words = [word for word in names[0].split() if word in common]
+    return " ".join(words) if words else " / ".join(names)
+
+
+async def evaluate_profile_merge(profile_ids: List[int], db: AsyncSession,
+                                 parameters: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Последствия объединения профилей (None - какого-то профиля нет)"""
+    parameters = parameters or {}
+    limit = int(parameters.get("limit", ACCESS_LIST_LIMIT))
+    profile_ids = list(dict.fromkeys(profile_ids))
+
+    rows = {
+        row.id: row for row in await db.execute(
+            select(RoleProfile.id, RoleProfile.name, RoleProfile.role_model_id, RoleProfile.criteria)
+            .where(RoleProfile.id.in_(profile_ids))
+        )
+    }
+    if len(rows) != len(profile_ids):
+        return None
+    profiles = [rows[profile_id] for profile_id in profile_ids]
+    accesses_of: Dict[int, set] = {profile_id: set() for profile_id in profile_ids}
+    for profile_id, access_id in await db.execute(
+        select(ProfileAccess.role_profile_id, ProfileAccess.access_id)
+        .where(ProfileAccess.role_profile_id.in_(profile_ids))
+    ):
+        accesses_of[profile_id].add(access_id)
+
+    index = await employee_index.get()
+    members = [index.members(profile.criteria) for profile in profiles]
+    union = 0
+    for bitset in members:
+        union |= bitset
+    common = members[0]
+    for bitset in members[1:]:
+        common &= bitset
+    # Сотрудники минимум в двух профилях: OR попарных пересечений
+    overlap = 0
+    for first, second in combinations(members, 2):
+        overlap |= first & second
+
+    merged_criteria = union_criteria([profile.criteria or {} for profile in profiles])
+    merged = index.members(merged_criteria)
+    union_count = union.bit_count()
+    extra = (merged & ~union).bit_count()
+
+    union_accesses = set().union(*accesses_of.values())
+    common_accesses = set.intersection(*accesses_of.values())
+    access_jaccard = len(common_accesses) / len(union_accesses) if union_accesses else 1.0
+
+    # ===== Расширение привилегий =====
+    targets = merged & index.active_bitset()
+    target_rows = index.rows(targets)
+    row_position = np.full(index.count, -1, dtype=np.int64)
+    row_position[target_rows] = np.arange(len(target_rows))
+    gained = np.zeros(len(target_rows), dtype=np.int32)
+    new_holders: Dict[int, int] = {}
+    for access_id in union_accesses:
+        gain = targets & ~index.holders(access_id)
+        if gain:
+            new_holders[access_id] = gain.bit_count()
+            gained[row_position[index.rows(gain)]] += 1
+
+    by_profile = []
+    for profile, bitset in zip(profiles, members):
+        positions = row_position[index.rows(bitset & targets)]
+        # Доступы других профилей, которых у сотрудников этого профиля нет
+        outside = sum(
+            (targets & bitset & ~index.holders(access_id)).bit_count()
+            for access_id in union_accesses - accesses_of[profile.id]
+        )
+        by_profile.append({
+            "profile_id": profile.id,
+            "name": profile.name,
+            "active_employees": len(positions),
+            "new_profile_accesses": len(union_accesses - accesses_of[profile.id]),
+            "avg_new_accesses": round(float(gained[positions].mean()), 2) if len(positions) else 0.0,
+            "avg_new_accesses_outside_profile": round(outside / len(positions), 2) if len(positions) else 0.0,
+        })
+
+    top_access_ids = [access_id for access_id, _ in Counter(new_holders).most_common(limit)]
+    names_needed = set(top_access_ids) | set(common_accesses)
+    names = {}
+    if names_needed:
+        names = {
+            row.id: row for row in await db.execute(
+                select(Access.id, Access.role_name, ApplicationSystem.name.label("system"))
+                .join(ApplicationSystem, ApplicationSystem.id == Access.system_id)
+                .where(Access.id.in_(names_needed))
+            )
+        }
+    top = np.argsort(-gained, kind="stable")[:TOP_EMPLOYEES]
+    top = top[gained[top] > 0]
+    top_ids = index.employee_ids[target_rows[top]].tolist()
+    full_names = dict((await db.execute(
+        select(Employee.id, Employee.full_name).where(Employee.id.in_(top_ids))
+    )).all()) if top_ids else {}
+
+    def access_entry(access_id: int) -> Dict[str, Any]:
+        row = names.get(access_id)
+        return {"access_id": access_id, "system": row.system if row else None,
+                "role_name": row.role_name if row else None}
+
+    reasons = []
+    if access_jaccard < MIN_ACCESS_JACCARD:
+        reasons.append(
+            f"Наборы доступов пересекаются на {access_jaccard:.0%} (порог {MIN_ACCESS_JACCARD:.0%})"
+        )
+    if union_count and extra > MAX_EXTRA_SHARE * union_count:
+        reasons.append(f"Объединенные критерии добавляют {extra} сотрудников вне исходных профилей")
+    if len({profile.role_model_id for profile in profiles}) > 1:
+        reasons.append("Профили относятся к разным ролевым моделям")
+
+    return {
+        "profiles": [
+            {
+                "id": profile.id,
+                "name": profile.name,
+                "employees_count": bitset.bit_count(),
+                "exclusive_employees": (bitset & ~overlap).bit_count(),
+                "accesses_count": len(accesses_of[profile.id]),
+            }
+            for profile, bitset in zip(profiles, members)
+        ],
+        "compatible": not reasons,
+        "compatibility_reasons": reasons,
+        "merged_criteria": merged_criteria,
+        "suggested_name": _suggested_name([profile.name for profile in profiles]),
+        "impact": {
+            "total_employees": union_count,
+            "overlap_employees": overlap.bit_count(),
+            "common_employees": common.bit_count(),
+            "criteria_employees": merged.bit_count(),
+            "extra_employees": extra,
+            "pairwise_overlap": [
+                {
+                    "profile_ids": [profiles[first].id, profiles[second].id],
+                    "employees": (members[first] & members[second]).bit_count(),
+                    "jaccard": round(
+                        (members[first] & members[second]).bit_count()
+                        / max((members[first] | members[second]).bit_count(), 1), 3
+                    ),
+                }
+                for first, second in combinations(range(len(profiles)), 2)
+            ],
+        },
+        "accesses": {
+            "union_count": len(union_accesses),
+            "intersection_count": len(common_accesses),
+            "jaccard": round(access_jaccard, 3),
+            "common": [access_entry(access_id) for access_id in sorted(common_accesses)[:limit]],
+        },
+        "privilege_expansion": {
+            "active_employees": len(target_rows),
+            "employees_affected": int((gained > 0).sum()),
+            "new_grants": int(gained.sum()),
+            "avg_per_employee": round(float(gained.mean()), 2) if len(gained) else 0.0,
+            "max_per_employee": int(gained.max(initial=0)),
+            "by_profile": by_profile,
+            "by_access": [
+                {**access_entry(access_id), "new_holders": new_holders[access_id]}
+                for access_id in top_access_ids
+            ],
+            "top_employees": [
+                {"employee_id": employee_id, "full_name": full_names.get(employee_id),
+                 "new_accesses": int(count)}
+                for employee_id, count in zip(top_ids, gained[top].tolist())
+            ],
+        },
+    }
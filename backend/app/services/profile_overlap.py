@@ -0,0 +1,200 @@
+"""
+Анализ пересечений профилей ролевой модели
+
+Состав профилей загружается двумя запросами: сотрудники всех профилей
+(profiles_membership_query - UNION ALL условий критериев) и доступы всех профилей
+(ProfileAccess). Из них строятся булевы матрицы "профиль x сотрудник" и
+"профиль x доступ", и размеры всех попарных пересечений получаются одним
+матричным произведением M @ M.T - без запроса на каждую пару профилей.
+
+По пересечениям строятся предложения:
+- merge - профили с почти одинаковыми сотрудниками и доступами;
+- refine - профили, у которых заметная часть сотрудников общая, а наборы
+  доступов разные: сотрудник получает доступы обоих, критерии стоит уточнить;
+- empty - профили, под критерии которых не подходит ни один сотрудник.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.compute import compute_pool
+from app.models import ProfileAccess, RoleModel, RoleProfile
+from app.services.profile_matching import profiles_membership_query
+
+# Пороги по умолчанию (переопределяются параметрами инструмента)
+MERGE_EMPLOYEE_JACCARD = 0.6
+MERGE_ACCESS_JACCARD = 0.6
+REFINE_SHARED_SHARE = 0.2  # доля общих сотрудников от меньшего профиля
+SUGGESTIONS_LIMIT = 10
+
+
+@dataclass
+class ProfileMemberships:
+    """Состав профилей ролевой модели в виде булевых матриц"""
+    profile_ids: List[int]
+    profile_names: List[str]
+    employees: np.ndarray  # (профили, сотрудники) bool
+    accesses: np.ndarray  # (профили, доступы) bool
+
+
+async def load_profile_memberships(role_model_id: int, db: AsyncSession) -> Optional[ProfileMemberships]:
+    """Матрицы состава профилей ролевой модели (None - модели нет)"""
+    role_model = (await db.execute(select(RoleModel.id).where(RoleModel.id == role_model_id))).scalar()
+    if role_model is None:
+        return None
+
+    profiles = (await db.execute(
+        select(RoleProfile.id, RoleProfile.name, RoleProfile.criteria)
+        .where(RoleProfile.role_model_id == role_model_id)
+        .order_by(RoleProfile.id)
+    )).all()
+    row_of = {profile.id: row for row, profile in enumerate(profiles)}
+
+    query = profiles_membership_query([profile.criteria for profile in profiles])
+    pairs = (await db.execute(query)).all() if query is not None else []
+
+    access_pairs = (await db.execute(
+        select(ProfileAccess.role_profile_id, ProfileAccess.access_id)
+        .join(RoleProfile, RoleProfile.id == ProfileAccess.role_profile_id)
+        .where(RoleProfile.role_model_id == role_model_id)
+    )).all()
+
+    return ProfileMemberships(
+        profile_ids=[profile.id for profile in profiles],
+        profile_names=[profile.name for profile in profiles],
+        employees=_membership_matrix(len(profiles), [(row, employee) for row, employee in pairs]),
+        accesses=_membership_matrix(len(profiles), [(row_of[profile], access) for profile, access in access_pairs]),
+    )
+
+
+def _membership_matrix(rows: int, pairs: List[tuple]) -> np.ndarray:
+    """Булева матрица по парам (строка, id): столбцы - отсортированные уникальные id"""
+    if not pairs:
+        return np.zeros((rows, 0), dtype=bool)
+    pairs = np.asarray(pairs, dtype=np.int64)
+    _, columns = np.unique(pairs[:, 1], return_inverse=True)
+    matrix = np.zeros((rows, int(columns.max()) + 1), dtype=bool)
+    matrix[pairs[:, 0], columns] = True
+    return matrix
+
+
+def _jaccard(intersections: np.ndarray, sizes: np.ndarray) -> np.ndarray:
+    unions = sizes[:, None] + sizes[None, :] - intersections
+    return np.divide(intersections, unions, out=np.zeros(intersections.shape), where=unions > 0)
+
+
+def overlap_statistics(employees: np.ndarray, accesses: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Попарные пересечения профилей по сотрудникам и доступам
+
+    Выполняется в пуле процессов: одно произведение матриц на каждую
+    сторону (float32 - точные целые до 2^24 и быстрый BLAS).
+    """
+    employee_matrix = employees.astype(np.float32)
+    access_matrix = accesses.astype(np.float32)
+    employee_intersections = np.rint(employee_matrix @ employee_matrix.T).astype(np.int64)
+    access_intersections = np.rint(access_matrix @ access_matrix.T).astype(np.int64)
+    coverage = employees.sum(axis=0)
+    return {
+        "employee_intersections": employee_intersections,
+        "access_intersections": access_intersections,
+        "covered_employees": int((coverage > 0).sum()),
+        "multi_profile_employees": int((coverage > 1).sum()),
+    }
+
+
+def _profile_ref(memberships: ProfileMemberships, row: int) -> Dict[str, Any]:
+    return {"id": memberships.profile_ids[row], "name": memberships.profile_names[row]}
+
+
+async def analyze_profile_overlaps(memberships: ProfileMemberships,
+                                   parameters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Предложения по объединению и уточнению профилей с метриками пересечений"""
+    parameters = parameters or {}
+    merge_employee = float(parameters.get("merge_employee_jaccard", MERGE_EMPLOYEE_JACCARD))
+    merge_access = float(parameters.get("merge_access_jaccard", MERGE_ACCESS_JACCARD))
+    refine_share = float(parameters.get("refine_shared_share", REFINE_SHARED_SHARE))
+    limit = int(parameters.get("limit", SUGGESTIONS_LIMIT))
+
+    stats = await compute_pool.run(overlap_statistics, memberships.employees, memberships.accesses)
+    employee_intersections = stats["employee_intersections"]
+    access_intersections = stats["access_intersections"]
+    employee_sizes = np.diag(employee_intersections)
+    access_sizes = np.diag(access_intersections)
+    employee_jaccard = _jaccard(employee_intersections, employee_sizes)
+    access_jaccard = _jaccard(access_intersections, access_sizes)
+    smaller = np.minimum(employee_sizes[:, None], employee_sizes[None, :])
+    shared_share = np.divide(employee_intersections, smaller,
+                             out=np.zeros(employee_intersections.shape), where=smaller > 0)
+
+    merges, refines = [], []
+    # Только пары с общими сотрудниками (над диагональью)
+    first, second = np.nonzero(np.triu(employee_intersections, k=1))
+    for a, b in zip(first.tolist(), second.tolist()):
+        shared = int(employee_intersections[a, b])
+        pair = {
+            "profiles": [_profile_ref(memberships, a), _profile_ref(memberships, b)],
+            "shared_employees": shared,
+            "employee_jaccard": round(float(employee_jaccard[a, b]), 3),
+            "shared_share": round(float(shared_share[a, b]), 3),
+            "shared_accesses": int(access_intersections[a, b]),
+            "access_jaccard": round(float(access_jaccard[a, b]), 3),
+        }
+        names = f"«{memberships.profile_names[a]}» и «{memberships.profile_names[b]}»"
+        if employee_jaccard[a, b] >= merge_employee and access_jaccard[a, b] >= merge_access:
+            pair["type"] = "merge"
+            pair["score"] = round(float(employee_jaccard[a, b] * access_jaccard[a, b]), 3)
+            pair["text"] = (
+                f"Объединить профили {names}: общих сотрудников {pair['employee_jaccard']:.0%}, "
+                f"общих доступов {pair['access_jaccard']:.0%}"
+            )
+            merges.append(pair)
+        elif shared_share[a, b] >= refine_share:
+            pair["type"] = "refine"
+            pair["score"] = round(float(shared_share[a, b] * (1 - access_jaccard[a, b])), 3)
+            pair["text"] = (
+                f"Уточнить критерии профилей {names}: {shared} сотрудников попадают в оба "
+                f"({pair['shared_share']:.0%} меньшего профиля) при {pair['access_jaccard']:.0%} общих доступов"
+            )
+            refines.append(pair)
+
+    empty = [
+        {"type": "empty", "profiles": [_profile_ref(memberships, row)], "score": 0.0,
+         "text": f"Под критерии профиля «{memberships.profile_names[row]}» не подходит ни один сотрудник"}
+        for row in np.flatnonzero(employee_sizes == 0).tolist()
+    ]
+
+    merges.sort(key=lambda pair: pair["score"], reverse=True)
+    refines.sort(key=lambda pair: pair["score"], reverse=True)
+
+    # Сколько профилей останется после объединений: пары объединяются как компоненты связности
+    groups = list(range(len(memberships.profile_ids)))
+
+    def root(row: int) -> int:
+        while groups[row] != row:
+            groups[row] = groups[groups[row]]
+            row = groups[row]
+        return row
+
+    row_of = {profile_id: row for row, profile_id in enumerate(memberships.profile_ids)}
+    for pair in merges:
+        a, b = (row_of[profile["id"]] for profile in pair["profiles"])
+        groups[root(a)] = root(b)
+
+    covered = stats["covered_employees"]
+    return {
+        "suggestions": merges[:limit] + refines[:limit] + empty,
+        "metrics": {
+            "current_profiles": len(memberships.profile_ids),
+            "suggested_profiles": len({root(row) for row in range(len(groups))}),
+            "covered_employees": covered,
+            "multi_profile_employees": stats["multi_profile_employees"],
+            "overlap_percentage": round(100 * stats["multi_profile_employees"] / covered, 1) if covered else 0.0,
+            "merge_candidates": len(merges),
+            "refine_candidates": len(refines),
+            "empty_profiles": len(empty),
+        },
+    }
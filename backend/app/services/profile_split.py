@@ -0,0 +1,427 @@
+"""
+Разделение профиля ролевой модели на подпрофили
+
+Активные сотрудники профиля (по индексу сотрудников, без запросов состава к
+БД) кластеризуются по наборам доступов - TF-IDF матрица, как в стратегии
+access_history, сжатая TruncatedSVD - с добавкой стандартизованных опыта и
+уровня должности (вес ATTRIBUTE_WEIGHT). Число групп от 2 до MAX_PARTS
+выбирается по silhouette.
+
+Чтобы группу можно было оформить профилем, неглубокое дерево решений
+(TREE_DEPTH) учится отличать группы по атрибутам критериев: должность,
+профиль и тип сотрудника, подразделение, опыт, уровень должности. Каждый
+лист дерева - набор условий, который переводится в критерии профиля
+(уровень должности - в список должностей этого уровня). Соседние листья
+одной группы сливаются, так что критерии остаются минимальными.
+
+Для каждого подпрофиля по индексу считается точный состав по новым
+критериям, доля сотрудников группы среди них (precision) и охват группы
+(recall), а также отличия наборов доступов: основные доступы подпрофиля
+(CORE_ACCESS_SHARE), которых нет в профиле, доступы профиля, не нужные
+подпрофилю, и доступы, отличающие его от остальных сотрудников профиля.
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.compute import compute_pool
+from app.models import Access, ApplicationSystem, ProfileAccess, RoleProfile
+from app.services.clustering import (
+    KMEANS_BATCH_SIZE, LOW_SILHOUETTE, SILHOUETTE_SAMPLE, SVD_COMPONENTS, access_matrix
+)
+from app.services.employee_index import VALUE_KEYS, EmployeeIndex, employee_index
+
+# Параметры по умолчанию (переопределяются параметрами инструмента)
+MAX_PARTS = 4
+TREE_DEPTH = 2
+CORE_ACCESS_SHARE = 0.5
+# Доля опыта и уровня должности в квадрате нормы вектора сотрудника
+ATTRIBUTE_WEIGHT = 0.3
+MIN_SPLIT_EMPLOYEES = 20
+# Лист дерева - не меньше этой доли сотрудников профиля
+MIN_LEAF_SHARE = 0.05
+# Значений одного ключа в признаках дерева (самые частые)
+MAX_FEATURE_VALUES = 30
+ACCESS_LIST_LIMIT = 10
+
+KEY_LABELS = {
+    "employee_profiles": "профиль сотрудника",
+    "positions": "должность",
+    "employee_types": "тип сотрудника",
+    "org_units_type": "подразделение",
+}
+
+
+# Условие пути в дереве: признак, порог, значение больше порога
+Condition = Tuple[int, float, bool]
+
+
+@dataclass
+class TreeFeature:
+    """Признак дерева: значение ключа критериев (0/1) или числовой атрибут"""
+    key: str  # ключ критериев, "experience_years" или "position_level"
+    value: Optional[str] = None
+
+
+# ===== ВЫЧИСЛЕНИЯ (ПУЛ ПРОЦЕССОВ) =====
+
+def _standardize(values: np.ndarray) -> np.ndarray:
+    values = np.where(np.isnan(values), np.nanmean(values) if np.isfinite(values).any() else 0.0, values)
+    return (values - values.mean()) / (values.std() or 1.0)
+
+
+def split_employees(indptr: np.ndarray, indices: np.ndarray, access_count: int, experience: np.ndarray,
+                    levels: np.ndarray, tree_features: np.ndarray, max_parts: int, tree_depth: int,
+                    min_leaf: int, seed: int = 0) -> Dict[str, Any]:
+    """
+    Группы сотрудников (0 - самая большая) и дерево решений, отличающее их по атрибутам
+
+    Выполняется в пуле процессов.
+    """
+    from sklearn.cluster import MiniBatchKMeans
+    from sklearn.decomposition import TruncatedSVD
+    from sklearn.metrics import silhouette_score
+    from sklearn.tree import DecisionTreeClassifier
+
+    matrix = access_matrix(indptr, indices, access_count)
+    count = matrix.shape[0]
+    if matrix.shape[1] > SVD_COMPONENTS and count > SVD_COMPONENTS:
+        accesses = TruncatedSVD(SVD_COMPONENTS, random_state=seed).fit_transform(matrix)
+    else:
+        accesses = matrix.toarray()
+    features = np.hstack([
+        accesses * np.sqrt(1 - ATTRIBUTE_WEIGHT),
+        np.column_stack([_standardize(experience), _standardize(levels)]) * np.sqrt(ATTRIBUTE_WEIGHT / 2),
+    ]).astype(np.float32)
+    sample = np.random.default_rng(seed).choice(count, min(count, SILHOUETTE_SAMPLE), replace=False)
+
+    scores: Dict[int, float] = {}
+    best_labels, best_score = np.zeros(count, dtype=np.int64), -1.0
+    for parts in range(2, min(max_parts, count - 1) + 1):
+        labels = MiniBatchKMeans(parts, batch_size=KMEANS_BATCH_SIZE, n_init=3,
+                                 random_state=seed).fit_predict(features)
+        separable = 1 < len(np.unique(labels[sample])) < len(sample)
+        score = float(silhouette_score(features[sample], labels[sample])) if separable else -1.0
+        scores[parts] = round(score, 4)
+        if score > best_score:
+            best_labels, best_score = labels, score
+
+    sizes = np.bincount(best_labels)
+    order = np.argsort(-sizes, kind="stable")
+    order = order[sizes[order] > 0]
+    relabel = np.empty(len(sizes), dtype=np.int64)
+    relabel[order] = np.arange(len(order))
+    labels = relabel[best_labels]
+
+    tree = DecisionTreeClassifier(max_depth=tree_depth, min_samples_leaf=min_leaf, random_state=seed)
+    tree.fit(tree_features, labels)
+    return {
+        "labels": labels,
+        "silhouette": best_score,
+        "candidates": scores,
+        "accuracy": float(tree.score(tree_features, labels)),
+        "feature": tree.tree_.feature.copy(),
+        "threshold": tree.tree_.threshold.copy(),
+        "left": tree.tree_.children_left.copy(),
+        "right": tree.tree_.children_right.copy(),
+        "group": tree.classes_[tree.tree_.value[:, 0, :].argmax(axis=1)].astype(np.int64),
+    }
+
+
+# ===== КРИТЕРИИ ПОДПРОФИЛЕЙ =====
+
+def _tree_features(index: EmployeeIndex, rows: np.ndarray,
+                   criteria: Dict[str, Any]) -> Tuple[List[TreeFeature], np.ndarray]:
+    """Признаки дерева по атрибутам критериев для строк профиля"""
+    features = [TreeFeature("experience_years"), TreeFeature("position_level")]
+    columns = [np.nan_to_num(index.experience[rows], nan=-1.0), index.position_levels[rows].astype(np.float64)]
+
+    candidates = [(key, index.present_values(key, rows)) for key in VALUE_KEYS]
+    # Подразделение с вложенными нельзя исключить критериями, поэтому только если профиль его не задает
+    if not criteria.get("org_units_type"):
+        units = index.org_unit_of[rows]
+        codes, counts = np.unique(units[units >= 0], return_counts=True)
+        types = sorted({index.org_units[code].unit_type for code in codes.tolist()})
+        names = [index.org_units[code].name for code in codes[np.argsort(-counts, kind="stable")].tolist()]
+        candidates.append(("org_units_type", types + [name for name in names if name not in types]))
+
+    for key, values in candidates:
+        masks = []
+        for value in values:
+            mask = np.zeros(index.count, dtype=bool)
+            mask[index.rows(index.value_bitset(key, value))] = True
+            masks.append((value, mask[rows]))
+        # Частые значения; значения, которые есть у всех или ни у кого, не разделяют
+        masks = [(value, mask) for value, mask in masks if 0 < mask.sum() < len(rows)]
+        masks.sort(key=lambda item: -item[1].sum())
+        for value, mask in masks[:MAX_FEATURE_VALUES]:
+            features.append(TreeFeature(key, value))
+            columns.append(mask.astype(np.float64))
+    return features, np.column_stack(columns).astype(np.float32)
+
+
+def _leaves(tree: Dict[str, Any], node: int = 0,
+            path: Tuple[Condition, ...] = ()) -> List[Tuple[Tuple[Condition, ...], int]]:
+    """Листья дерева: условия (признак, порог, больше порога) и группа; листья одной группы сливаются"""
+    left, right = int(tree["left"][node]), int(tree["right"][node])
+    if left < 0:
+        return [(path, int(tree["group"][node]))]
+    feature, threshold = int(tree["feature"][node]), float(tree["threshold"][node])
+    low = _leaves(tree, left, path + ((feature, threshold, False),))
+    high = _leaves(tree, right, path + ((feature, threshold, True),))
+    if len(low) == len(high) == 1 and low[0][1] == high[0][1]:
+        return [(path, low[0][1])]
+    return low + high
+
+
+def _years(value: int) -> str:
+    if value % 10 == 1 and value % 100 != 11:
+        return "года"
+    return "лет"
+
+
+def _leaf_criteria(index: EmployeeIndex, rows: np.ndarray, criteria: Dict[str, Any],
+                   features: List[TreeFeature],
+                   path: Tuple[Condition, ...]) -> Tuple[Dict[str, Any], List[str], bool]:
+    """Критерии подпрофиля по условиям листа, описание условий и признак полноты перевода"""
+    include: Dict[str, str] = {}
+    exclude: Dict[str, List[str]] = {}
+    bounds: Dict[str, List[Optional[int]]] = {"experience_years": [None, None], "position_level": [None, None]}
+    for feature_position, threshold, above in path:
+        feature = features[feature_position]
+        if feature.value is None:
+            # Атрибуты целые: "<= 4.5" - до 4 включительно, "> 4.5" - от 5
+            cut = int(np.floor(threshold))
+            low, high = bounds[feature.key]
+            if above:
+                bounds[feature.key][0] = cut + 1 if low is None else max(low, cut + 1)
+            else:
+                bounds[feature.key][1] = cut if high is None else min(high, cut)
+        elif above:
+            include[feature.key] = feature.value
+        else:
+            exclude.setdefault(feature.key, []).append(feature.value)
+
+    result = {key: value for key, value in criteria.items() if key != "all_employees"}
+    description: List[str] = []
+    complete = True
+    for key in (*VALUE_KEYS, "org_units_type"):
+        if key in include:
+            result[key] = [include[key]]
+            description.append(f"{KEY_LABELS[key]} {include[key]}")
+        elif key in exclude:
+            if key == "org_units_type":
+                complete = False
+                continue
+            result[key] = [value for value in index.present_values(key, rows) if value not in exclude[key]]
+            description.append(f"{KEY_LABELS[key]} не {', '.join(exclude[key])}")
+
+    low, high = bounds["position_level"]
+    if low is not None or high is not None:
+        positions = result.get("positions") or index.present_values("positions", rows)
+        result["positions"] = [
+            title for title in positions
+            if (low is None or index.hierarchy_levels.get(title, -1) >= low)
+            and (high is None or index.hierarchy_levels.get(title, -1) <= high)
+        ]
+        description.append(" ".join(
+            ["уровень должности"] + ([f"от {low}"] if low is not None else []) + ([f"до {high}"] if high is not None else [])
+        ))
+
+    low, high = bounds["experience_years"]
+    if low is not None or high is not None:
+        current = criteria.get("experience_years") or {}
+        if current.get("min") is not None:
+            low = max(low, current["min"]) if low is not None else current["min"]
+        if current.get("max") is not None:
+            high = min(high, current["max"]) if high is not None else current["max"]
+        result["experience_years"] = {"min": low, "max": high}
+        if low is not None and low > 0 and high is not None:
+            description.append(f"опыт {low}-{high} {_years(high)}")
+        elif low is not None and low > 0:
+            description.append(f"опыт от {low} {_years(low)}")
+        elif high == 0:
+            description.append("без опыта")
+        elif high is not None:
+            description.append(f"опыт до {high} {_years(high)}")
+
+    if result == {key: value for key, value in criteria.items() if key != "all_employees"}:
+        # Условия листа не выразились в критериях: подпрофиль совпадает с профилем
+        return dict(criteria), description, False
+    return result, description, complete
+
+
+def _access_entry(access_id: int, names: Dict[int, Any], share: float) -> Dict[str, Any]:
+    row = names.get(access_id)
+    return {
+        "access_id": access_id,
+        "system": row.system if row else None,
+        "role_name": row.role_name if row else None,
+        "share": round(share, 3),
+    }
+
+
+async def split_role_profile(profile_id: int, db: AsyncSession,
+                             parameters: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Подпрофили профиля с критериями, составом и отличиями доступов (None - профиля нет)"""
+    parameters = parameters or {}
+    max_parts = max(2, int(parameters.get("max_parts", MAX_PARTS)))
+    tree_depth = max(1, int(parameters.get("tree_depth", TREE_DEPTH)))
+    core_share = float(parameters.get("core_access_share", CORE_ACCESS_SHARE))
+
+    profile = (await db.execute(
+        select(RoleProfile.name, RoleProfile.criteria).where(RoleProfile.id == profile_id)
+    )).one_or_none()
+    if profile is None:
+        return None
+    criteria = profile.criteria or {}
+    profile_access_ids = (await db.execute(
+        select(ProfileAccess.access_id).where(ProfileAccess.role_profile_id == profile_id)
+    )).scalars().all()
+
+    index = await employee_index.get()
+    members = index.members(criteria) & index.active_bitset()
+    rows = index.rows(members)
+    summary = {"id": profile_id, "name": profile.name, "criteria": criteria, "employees_count": len(rows)}
+    if len(rows) < MIN_SPLIT_EMPLOYEES:
+        return {
+            "profile": summary,
+            "split_suggestions": [],
+            "split_reason": f"В профиле {len(rows)} активных сотрудников - слишком мало для разделения",
+            "metrics": {},
+        }
+
+    features, tree_matrix = _tree_features(index, rows, criteria)
+    indptr, indices = index.access_submatrix(rows)
+    result = await compute_pool.run(
+        split_employees, indptr, indices, len(index.access_ids), index.experience[rows],
+        index.position_levels[rows].astype(np.float64), tree_matrix, max_parts, tree_depth,
+        max(5, int(MIN_LEAF_SHARE * len(rows))),
+    )
+    metrics = {
+        "parts": int(result["labels"].max()) + 1,
+        "silhouette": round(result["silhouette"], 4),
+        "candidates": result["candidates"],
+        "tree_accuracy": round(result["accuracy"], 4),
+        "tree_depth": tree_depth,
+    }
+    if result["silhouette"] < LOW_SILHOUETTE:
+        return {
+            "profile": summary,
+            "split_suggestions": [],
+            "split_reason": (
+                f"Явных групп по доступам нет (silhouette {result['silhouette']:.2f}): "
+                "профиль однороден, разделение не требуется"
+            ),
+            "metrics": metrics,
+        }
+
+    group_bitsets = []
+    for group in range(metrics["parts"]):
+        mask = np.zeros(index.count, dtype=bool)
+        mask[rows[result["labels"] == group]] = True
+        group_bitsets.append(index.bitset(mask))
+
+    profile_columns = np.searchsorted(index.access_ids, profile_access_ids)
+    held = (profile_columns < len(index.access_ids)) & (
+        index.access_ids[np.minimum(profile_columns, len(index.access_ids) - 1)] == profile_access_ids
+    ) if len(profile_access_ids) else np.zeros(0, dtype=bool)
+    in_profile = np.zeros(len(index.access_ids), dtype=bool)
+    in_profile[profile_columns[held]] = True
+
+    parts = []
+    for path, group in _leaves(result):
+        part_criteria, description, complete = _leaf_criteria(index, rows, criteria, features, path)
+        part = index.members(part_criteria) & index.active_bitset()
+        part_rows = index.rows(part)
+        size = len(part_rows)
+        group_size = group_bitsets[group].bit_count()
+        matched = (part & group_bitsets[group]).bit_count()
+
+        shares = index.access_counts(part_rows) / max(size, 1)
+        rest_rows = index.rows(members & ~part)
+        rest_shares = index.access_counts(rest_rows) / max(len(rest_rows), 1)
+        core = shares >= core_share
+        add = np.flatnonzero(core & ~in_profile)
+        distinctive = np.flatnonzero(core & (rest_shares < core_share))
+        parts.append({
+            "description": description,
+            "criteria": part_criteria,
+            "criteria_complete": complete,
+            "group": group,
+            "employees_count": size,
+            "group_employees": group_size,
+            "precision": round(matched / size, 3) if size else 0.0,
+            "recall": round(matched / group_size, 3) if group_size else 0.0,
+            "outside_profile": (part & ~members).bit_count(),
+            "avg_experience_years": (
+                round(float(np.nanmean(index.experience[part_rows])), 1)
+                if size and np.isfinite(index.experience[part_rows]).any() else None
+            ),
+            "core_accesses": int(core.sum()),
+            "_add": add[np.argsort(-shares[add], kind="stable")][:ACCESS_LIST_LIMIT],
+            "_distinctive": distinctive[np.argsort(-(shares - rest_shares)[distinctive], kind="stable")][
+                :ACCESS_LIST_LIMIT],
+            "_shares": shares,
+            "_rest_shares": rest_shares,
+        })
+
+    profile_set = set(profile_access_ids)
+    names_needed = profile_set | {
+        int(index.access_ids[column]) for part in parts for column in np.concatenate([part["_add"], part["_distinctive"]])
+    }
+    names = {}
+    if names_needed:
+        names = {
+            row.id: row for row in await db.execute(
+                select(Access.id, Access.role_name, ApplicationSystem.name.label("system"))
+                .join(ApplicationSystem, ApplicationSystem.id == Access.system_id)
+                .where(Access.id.in_(names_needed))
+            )
+        }
+
+    suggestions = []
+    for part in parts:
+        description = part.pop("description")
+        shares = part.pop("_shares")
+        rest_shares = part.pop("_rest_shares")
+        add = part.pop("_add")
+        distinctive = part.pop("_distinctive")
+        share_of = dict(zip(index.access_ids.tolist(), shares.tolist()))
+        unused = sorted(
+            (access_id for access_id in profile_set if share_of.get(access_id, 0.0) < core_share),
+            key=lambda access_id: share_of.get(access_id, 0.0),
+        )
+        suggestions.append({
+            "name": f"{profile.name}: {', '.join(description) or 'остальные сотрудники'}",
+            **part,
+            "accesses_to_add": [
+                _access_entry(int(index.access_ids[column]), names, shares[column])
+                for column in add.tolist()
+            ],
+            "accesses_to_remove": [
+                _access_entry(access_id, names, share_of.get(access_id, 0.0))
+                for access_id in unused[:ACCESS_LIST_LIMIT]
+            ],
+            "unused_profile_accesses": len(unused),
+            "distinctive_accesses": [
+                {**_access_entry(int(index.access_ids[column]), names, shares[column]),
+                 "others_share": round(float(rest_shares[column]), 3)}
+                for column in distinctive.tolist()
+            ],
+        })
+    suggestions.sort(key=lambda suggestion: (suggestion["group"], -suggestion["employees_count"]))
+
+    return {
+        "profile": summary,
+        "split_suggestions": suggestions,
+        "split_reason": (
+            f"Сотрудники профиля делятся по наборам доступов на групп: {metrics['parts']} "
+            f"(silhouette {result['silhouette']:.2f}); критерии дерева решений глубины {tree_depth} "
+            f"объясняют {result['accuracy']:.0%} сотрудников"
+        ),
+        "metrics": metrics,
+    }
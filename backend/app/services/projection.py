@@ -0,0 +1,181 @@
+"""
+Двумерная проекция сотрудников для scatter-графика кластеров
+
+Матрица доступов активных сотрудников (TF-IDF, как в стратегии
+access_history) сжимается TruncatedSVD, затем раскладывается на плоскость:
+UMAP, если установлен umap-learn, иначе PCA. Расчет идет в пуле процессов.
+
+Проекция зависит только от снимка сотрудников и доступов (snapshot_version),
+поэтому считается один раз на версию: результат хранится в ml_models
+(model_type="projection") и в памяти процесса. Браузеру отдается компактный
+бинарный ответ - id сотрудников int32[n], затем координаты float32[n, 2]
+(little-endian) - или прореженный JSON; ETag равен версии снимка, так что
+повторный показ графика получает 304 без данных.
+"""
+import asyncio
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import delete, select
+
+from app.core.compute import compute_pool
+from app.core.database import session_scope
+from app.models import Employee, EmployeeAccess, MLModel
+from app.services.ai_cache import snapshot_version
+from app.services.clustering import SVD_COMPONENTS, access_matrix, csr_pairs
+from app.utils.logger import logger
+
+MODEL_TYPE = "projection"
+MODEL_NAME = "access_projection"
+
+UMAP_NEIGHBORS = 15
+UMAP_MIN_DIST = 0.1
+# Точек в прореженном JSON по умолчанию
+JSON_POINTS = 5000
+
+
+@dataclass
+class Projection:
+    """Координаты активных сотрудников на плоскости для одной версии снимка"""
+    version: str
+    method: str
+    employee_ids: np.ndarray  # (сотрудники,) int32, по возрастанию
+    coordinates: np.ndarray  # (сотрудники, 2) float32
+
+    def payload(self) -> bytes:
+        """Бинарное представление: int32[n] id, затем float32[n, 2] координаты"""
+        return self.employee_ids.astype("<i4").tobytes() + self.coordinates.astype("<f4").tobytes()
+
+    @classmethod
+    def from_payload(cls, version: str, method: str, payload: bytes) -> "Projection":
+        count = len(payload) // 12
+        return cls(
+            version=version,
+            method=method,
+            employee_ids=np.frombuffer(payload, dtype="<i4", count=count).astype(np.int32),
+            coordinates=np.frombuffer(payload, dtype="<f4", offset=4 * count).reshape(count, 2).astype(np.float32),
+        )
+
+    def sample(self, max_points: int) -> np.ndarray:
+        """Индексы равномерной детерминированной выборки не больше max_points точек"""
+        count = len(self.employee_ids)
+        if count <= max_points:
+            return np.arange(count)
+        return np.random.default_rng(0).choice(count, max_points, replace=False)
+
+    def positions(self, employee_ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Строки проекции для сотрудников и маска тех, кто в ней есть"""
+        if not len(self.employee_ids):
+            return np.zeros(len(employee_ids), dtype=np.int64), np.zeros(len(employee_ids), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.employee_ids, employee_ids), len(self.employee_ids) - 1)
+        return positions, self.employee_ids[positions] == employee_ids
+
+    def to_json(self, max_points: int = JSON_POINTS) -> Dict[str, Any]:
+        rows = np.sort(self.sample(max_points))
+        return {
+            "version": self.version,
+            "method": self.method,
+            "total": len(self.employee_ids),
+            "employee_ids": self.employee_ids[rows].tolist(),
+            "x": np.round(self.coordinates[rows, 0], 3).tolist(),
+            "y": np.round(self.coordinates[rows, 1], 3).tolist(),
+        }
+
+
+def project_accesses(indptr: np.ndarray, indices: np.ndarray, access_count: int,
+                     seed: int = 0) -> Tuple[np.ndarray, str]:
+    """
+    Координаты (n, 2) по матрице доступов и название метода
+
+    Выполняется в пуле процессов.
+    """
+    from sklearn.decomposition import PCA, TruncatedSVD
+
+    matrix = access_matrix(indptr, indices, access_count)
+    count = matrix.shape[0]
+    if matrix.shape[1] > SVD_COMPONENTS and count > SVD_COMPONENTS:
+        reduced = TruncatedSVD(SVD_COMPONENTS, random_state=seed).fit_transform(matrix)
+    else:
+        reduced = matrix.toarray()
+    if count < 3 or reduced.shape[1] < 2:
+        coordinates = np.zeros((count, 2), dtype=np.float32)
+        coordinates[:, :reduced.shape[1]] = reduced[:, :2]
+        return coordinates, "TruncatedSVD"
+
+    try:
+        import umap
+    except ImportError:
+        return PCA(2, random_state=seed).fit_transform(reduced).astype(np.float32), "TruncatedSVD + PCA"
+    model = umap.UMAP(
+        n_components=2, n_neighbors=min(UMAP_NEIGHBORS, count - 1), min_dist=UMAP_MIN_DIST,
+        random_state=seed, low_memory=True,
+    )
+    return model.fit_transform(reduced).astype(np.float32), "TruncatedSVD + UMAP"
+
+
+class ProjectionStore:
+    """Проекция последней версии снимка: память процесса, затем ml_models, затем расчет"""
+
+    def __init__(self):
+        self._latest: Optional[Projection] = None
+        self._lock = asyncio.Lock()
+
+    async def get(self, version: Optional[str] = None) -> Projection:
+        """Проекция для версии снимка (по умолчанию - текущей)"""
+        version = version or await snapshot_version()
+        if self._latest is not None and self._latest.version == version:
+            return self._latest
+        # Одновременные запросы новой версии считают проекцию один раз
+        async with self._lock:
+            if self._latest is None or self._latest.version != version:
+                self._latest = await self._load(version) or await self._compute(version)
+        return self._latest
+
+    async def _load(self, version: str) -> Optional[Projection]:
+        async with session_scope() as session:
+            row = (await session.execute(
+                select(MLModel.model_metadata, MLModel.model_data)
+                .where(MLModel.model_type == MODEL_TYPE, MLModel.model_name == MODEL_NAME)
+            )).first()
+        if row is None or not row.model_metadata or row.model_metadata.get("snapshot_version") != version:
+            return None
+        return Projection.from_payload(version, row.model_metadata["method"], row.model_data)
+
+    async def _compute(self, version: str) -> Projection:
+        active = select(Employee.id).where(Employee.status == "active")
+        async with session_scope() as session:
+            employee_ids = np.array((await session.execute(active.order_by(Employee.id))).scalars().all(),
+                                    dtype=np.int64)
+            pairs = (await session.execute(
+                select(EmployeeAccess.employee_id, EmployeeAccess.access_id)
+                .where(EmployeeAccess.employee_id.in_(active))
+            )).all()
+        flat = np.fromiter((value for pair in pairs for value in pair), dtype=np.int64, count=2 * len(pairs))
+        indptr, indices, access_count = csr_pairs(
+            np.searchsorted(employee_ids, flat[0::2]), flat[1::2], len(employee_ids)
+        )
+
+        coordinates, method = await compute_pool.run(project_accesses, indptr, indices, access_count)
+        projection = Projection(version, method, employee_ids.astype(np.int32), coordinates)
+
+        async with session_scope() as session:
+            await session.execute(delete(MLModel).where(
+                MLModel.model_type == MODEL_TYPE, MLModel.model_name == MODEL_NAME
+            ))
+            session.add(MLModel(
+                model_type=MODEL_TYPE,
+                model_name=MODEL_NAME,
+                model_data=projection.payload(),
+                model_metadata={
+                    "snapshot_version": version,
+                    "method": method,
+                    "points": len(employee_ids),
+                    "svd_components": SVD_COMPONENTS,
+                },
+            ))
+        logger.info(f"Проекция сотрудников пересчитана: {len(employee_ids)} точек, {method}")
+        return projection
+
+
+projection_store = ProjectionStore()
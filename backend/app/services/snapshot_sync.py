@@ -0,0 +1,340 @@
+"""
+Синхронизация с полным снимком HR/IAM
+
+Источники отдают только текущее состояние без истории изменений. Вместо
+полной перезаливки снимок загружается во временные staging-таблицы, а дельта
+(вставки, изменения, удаления) вычисляется и применяется set-based SQL
+запросами. Стоимость синхронизации пропорциональна объему изменений,
+id и временные метки неизмененных записей сохраняются.
+"""
+import time
+from datetime import date, datetime
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.schemas.sync import SnapshotSyncResult, TableChanges
+from app.utils.logger import logger
+
+BATCH_SIZE = 5000
+
+# Атрибуты сотрудника, которые приходят из HR-снимка (ключ - employee_number)
+EMPLOYEE_FIELDS = [
+    "full_name", "org_unit_id", "position_id", "profile_id", "employee_type_id",
+    "agile_team_id", "team_role_id", "experience_years", "company_tenure_months",
+    "email", "phone", "status", "hire_date", "termination_date",
+]
+
+# Обязательные атрибуты сотрудника (NOT NULL в employees): строки снимка без них пропускаются
+REQUIRED_EMPLOYEE_FIELDS = ["full_name", "org_unit_id", "position_id", "profile_id", "employee_type_id"]
+# Пустой статус: новый сотрудник - active, существующий сохраняет текущий
+DEFAULT_STATUS = "active"
+
+# Атрибуты назначения доступа из IAM-снимка (ключ - employee_number + access_id)
+ACCESS_FIELDS = ["assignment_type", "role_profile_id", "last_used"]
+
+_INT_FIELDS = {
+    "org_unit_id", "position_id", "profile_id", "employee_type_id", "agile_team_id",
+    "team_role_id", "experience_years", "company_tenure_months", "access_id", "role_profile_id",
+}
+_DATE_FIELDS = {"hire_date", "termination_date"}
+_DATETIME_FIELDS = {"last_used"}
+
+_PREPARE_DDL = [
+    # Индекс есть в модели, но create_all не добавляет его в уже существующую таблицу
+    "CREATE INDEX IF NOT EXISTS ix_employee_accesses_employee_access "
+    "ON employee_accesses (employee_id, access_id)",
+    """
+    CREATE TEMP TABLE IF NOT EXISTS staging_employees (
+        employee_number VARCHAR(50) PRIMARY KEY,
+        full_name VARCHAR(300),
+        org_unit_id INTEGER,
+        position_id INTEGER,
+        profile_id INTEGER,
+        employee_type_id INTEGER,
+        agile_team_id INTEGER,
+        team_role_id INTEGER,
+        experience_years INTEGER,
+        company_tenure_months INTEGER,
+        email VARCHAR(255),
+        phone VARCHAR(50),
+        status VARCHAR(20),
+        hire_date DATE,
+        termination_date DATE
+    )
+    """,
+    """
+    CREATE TEMP TABLE IF NOT EXISTS staging_employee_accesses (
+        employee_number VARCHAR(50) NOT NULL,
+        access_id INTEGER NOT NULL,
+        assignment_type VARCHAR(20),
+        role_profile_id INTEGER,
+        last_used TIMESTAMP,
+        PRIMARY KEY (employee_number, access_id)
+    )
+    """,
+]
+
+
+async def sync_snapshot(
+    db: AsyncSession,
+    employees: Optional[Iterable[Dict[str, Any]]] = None,
+    accesses: Optional[Iterable[Dict[str, Any]]] = None,
+    dry_run: bool = False,
+) -> SnapshotSyncResult:
+    """
+    Применить дельту полного снимка к живым таблицам
+
+    employees - снимок HR (строки с employee_number и EMPLOYEE_FIELDS),
+    accesses - снимок IAM (строки с employee_number, access_id и ACCESS_FIELDS).
+    Сотрудники, отсутствующие в снимке, не удаляются, а переводятся в статус
+    terminated. Строки сотрудников без обязательных полей
+    (REQUIRED_EMPLOYEE_FIELDS) не применяются и попадают в skipped_rows, но
+    сотрудник из такой строки считается присутствующим в снимке и не
+    увольняется. Строки без ключа (employee_number, access_id) пропускаются.
+    Назначения доступов, отсутствующие в снимке, удаляются.
+    Транзакцией управляет вызывающий код: при dry_run=True изменения нужно
+    откатить (это делает scripts/sync_snapshot.py).
+    """
+    started = time.perf_counter()
+    sql = _SyncSQL(db.get_bind().dialect.name)
+    result = SnapshotSyncResult(dry_run=dry_run)
+
+    for ddl in _PREPARE_DDL:
+        await db.execute(text(ddl))
+    await db.execute(text("DELETE FROM staging_employees"))
+    await db.execute(text("DELETE FROM staging_employee_accesses"))
+
+    try:
+        if employees is not None:
+            staged, duplicates, missing_key = await _load_staging(
+                db, "staging_employees", ["employee_number", *EMPLOYEE_FIELDS], ["employee_number"], employees, sql
+            )
+            if duplicates:
+                result.skipped_rows["employees_duplicate"] = duplicates
+            if missing_key:
+                result.skipped_rows["employees_missing_key"] = missing_key
+            result.employees, skipped = await _apply_employees(db, sql, staged)
+            result.skipped_rows.update(skipped)
+
+        if accesses is not None:
+            staged, duplicates, missing_key = await _load_staging(
+                db, "staging_employee_accesses", ["employee_number", "access_id", *ACCESS_FIELDS],
+                ["employee_number", "access_id"], accesses, sql,
+            )
+            if duplicates:
+                result.skipped_rows["accesses_duplicate"] = duplicates
+            if missing_key:
+                result.skipped_rows["accesses_missing_key"] = missing_key
+            result.employee_accesses, skipped = await _apply_accesses(db, sql, staged)
+            result.skipped_rows.update(skipped)
+    finally:
+        await db.execute(text("DROP TABLE IF EXISTS staging_employees"))
+        await db.execute(text("DROP TABLE IF EXISTS staging_employee_accesses"))
+
+    result.duration_seconds = round(time.perf_counter() - started, 3)
+    return result
+
+
+async def _apply_employees(
+    db: AsyncSession, sql: "_SyncSQL", staged: int
+) -> Tuple[TableChanges, Dict[str, int]]:
+    """Дельта по сотрудникам: UPDATE FROM, INSERT ... SELECT, деактивация"""
+    complete = " AND ".join(f"s.{f} IS NOT NULL" for f in REQUIRED_EMPLOYEE_FIELDS)
+    incomplete = (await db.execute(text(
+        f"SELECT COUNT(*) FROM staging_employees s WHERE NOT ({complete})"
+    ))).scalar()
+
+    values = {f: f"s.{f}" for f in EMPLOYEE_FIELDS}
+    values["status"] = "COALESCE(s.status, employees.status)"
+    changed = " OR ".join(sql.distinct(f"employees.{f}", values[f]) for f in EMPLOYEE_FIELDS)
+    assignments = ", ".join(f"{f} = {values[f]}" for f in EMPLOYEE_FIELDS)
+    updated = await db.execute(text(f"""
+        UPDATE employees
+        SET {assignments}, updated_at = CURRENT_TIMESTAMP
+        FROM staging_employees s
+        WHERE employees.employee_number = s.employee_number AND {complete} AND ({changed})
+    """))
+
+    columns = ", ".join(EMPLOYEE_FIELDS)
+    values["status"] = f"COALESCE(s.status, '{DEFAULT_STATUS}')"
+    inserted = await db.execute(text(f"""
+        INSERT INTO employees (employee_number, {columns}, created_at, updated_at)
+        SELECT s.employee_number, {", ".join(values[f] for f in EMPLOYEE_FIELDS)},
+               CURRENT_TIMESTAMP, CURRENT_TIMESTAMP
+        FROM staging_employees s
+        WHERE {complete}
+          AND NOT EXISTS (
+            SELECT 1 FROM employees e WHERE e.employee_number = s.employee_number
+          )
+    """))
+
+    # Удаление сотрудника из HR-снимка = увольнение: строка нужна для истории доступов
+    deactivated = await db.execute(text("""
+        UPDATE employees
+        SET status = 'terminated',
+            termination_date = COALESCE(termination_date, CURRENT_DATE),
+            updated_at = CURRENT_TIMESTAMP
+        WHERE employee_number IS NOT NULL
+          AND (status IS NULL OR status != 'terminated')
+          AND NOT EXISTS (
+              SELECT 1 FROM staging_employees s WHERE s.employee_number = employees.employee_number
+          )
+    """))
+
+    changes = TableChanges(
+        inserted=inserted.rowcount,
+        updated=updated.rowcount,
+        deleted=deactivated.rowcount,
+    )
+    changes.unchanged = staged - incomplete - changes.inserted - changes.updated
+    return changes, ({"employees_missing_required": incomplete} if incomplete else {})
+
+
+async def _apply_accesses(
+    db: AsyncSession, sql: "_SyncSQL", staged: int
+) -> Tuple[TableChanges, Dict[str, int]]:
+    """Дельта по назначениям доступов: DELETE, UPDATE FROM, INSERT ... SELECT"""
+    # Строка без сотрудника и без доступа считается в обеих причинах, но несопоставленной - один раз
+    unknown_employee, unknown_access, unmatched = (await db.execute(text("""
+        SELECT COALESCE(SUM(u.no_employee), 0), COALESCE(SUM(u.no_access), 0),
+               COALESCE(SUM(CASE WHEN u.no_employee = 1 OR u.no_access = 1 THEN 1 ELSE 0 END), 0)
+        FROM (
+            SELECT
+                CASE WHEN NOT EXISTS (
+                    SELECT 1 FROM employees e WHERE e.employee_number = s.employee_number
+                ) THEN 1 ELSE 0 END AS no_employee,
+                CASE WHEN NOT EXISTS (
+                    SELECT 1 FROM accesses a WHERE a.id = s.access_id
+                ) THEN 1 ELSE 0 END AS no_access
+            FROM staging_employee_accesses s
+        ) u
+    """))).one()
+
+    deleted = await db.execute(text("""
+        DELETE FROM employee_accesses
+        WHERE NOT EXISTS (
+            SELECT 1
+            FROM staging_employee_accesses s
+            JOIN employees e ON e.employee_number = s.employee_number
+            WHERE e.id = employee_accesses.employee_id
+              AND s.access_id = employee_accesses.access_id
+        )
+    """))
+
+    # Поля, которых нет в снимке (NULL), не перезаписывают текущие значения
+    changed = " OR ".join(
+        f"(s.{f} IS NOT NULL AND {sql.distinct(f'employee_accesses.{f}', f's.{f}')})"
+        for f in ACCESS_FIELDS
+    )
+    assignments = ", ".join(f"{f} = COALESCE(s.{f}, employee_accesses.{f})" for f in ACCESS_FIELDS)
+    updated = await db.execute(text(f"""
+        UPDATE employee_accesses
+        SET {assignments}, updated_at = CURRENT_TIMESTAMP
+        FROM staging_employee_accesses s
+        JOIN employees e ON e.employee_number = s.employee_number
+        WHERE employee_accesses.employee_id = e.id
+          AND employee_accesses.access_id = s.access_id
+          AND ({changed})
+    """))
+
+    inserted = await db.execute(text("""
+        INSERT INTO employee_accesses (employee_id, access_id, assignment_type, role_profile_id, last_used, updated_at)
+        SELECT e.id, s.access_id, COALESCE(s.assignment_type, 'manual_request'), s.role_profile_id, s.last_used,
+               CURRENT_TIMESTAMP
+        FROM staging_employee_accesses s
+        JOIN employees e ON e.employee_number = s.employee_number
+        JOIN accesses a ON a.id = s.access_id
+        WHERE NOT EXISTS (
+            SELECT 1 FROM employee_accesses ea
+            WHERE ea.employee_id = e.id AND ea.access_id = s.access_id
+        )
+    """))
+
+    skipped = {}
+    if unknown_employee:
+        skipped["accesses_unknown_employee"] = unknown_employee
+    if unknown_access:
+        skipped["accesses_unknown_access"] = unknown_access
+
+    changes = TableChanges(
+        inserted=inserted.rowcount,
+        updated=updated.rowcount,
+        deleted=deleted.rowcount,
+    )
+    # Строки с неизвестным сотрудником/доступом не попадают ни в одну категорию
+    changes.unchanged = staged - unmatched - changes.inserted - changes.updated
+    return changes, skipped
+
+
+async def _load_staging(
+    db: AsyncSession,
+    table: str,
+    columns: List[str],
+    keys: List[str],
+    rows: Iterable[Dict[str, Any]],
+    sql: "_SyncSQL",
+) -> Tuple[int, int, int]:
+    """
+    Загрузить строки снимка в staging-таблицу пакетами через executemany
+
+    Повторы ключа в снимке отбрасываются (побеждает первая строка), строки
+    с пустым ключом (keys) - тоже. Возвращает (число уникальных строк,
+    число отброшенных дублей, число строк без ключа).
+    """
+    statement = text(
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join(':' + c for c in columns)}) "
+        "ON CONFLICT DO NOTHING"
+    )
+    total = 0
+    missing_key = 0
+    for batch in _batched((sql.coerce_row(row, columns) for row in rows), BATCH_SIZE):
+        keyed = [row for row in batch if all(row[key] is not None for key in keys)]
+        missing_key += len(batch) - len(keyed)
+        if keyed:
+            await db.execute(statement, keyed)
+        total += len(keyed)
+        logger.info(f"Загружено в {table}: {total}")
+    staged = (await db.execute(text(f"SELECT COUNT(*) FROM {table}"))).scalar()
+    return staged, total - staged, missing_key
+
+
+def _batched(rows: Iterable[Dict[str, Any]], size: int) -> Iterator[List[Dict[str, Any]]]:
+    iterator = iter(rows)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class _SyncSQL:
+    """Диалектные различия SQLite/PostgreSQL для запросов синхронизации"""
+
+    def __init__(self, dialect: str):
+        self.dialect = dialect
+
+    def distinct(self, left: str, right: str) -> str:
+        """NULL-безопасное сравнение значений"""
+        if self.dialect == "sqlite":
+            return f"{left} IS NOT {right}"
+        return f"{left} IS DISTINCT FROM {right}"
+
+    def coerce_row(self, row: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
+        """Привести строку снимка (например, из CSV) к типам колонок"""
+        return {column: self._coerce(column, row.get(column)) for column in columns}
+
+    def _coerce(self, column: str, value: Any) -> Any:
+        if value is None or value == "":
+            return None
+        if column in _INT_FIELDS:
+            return int(value)
+        if column in _DATE_FIELDS:
+            if isinstance(value, str):
+                value = date.fromisoformat(value)
+            return value.isoformat() if self.dialect == "sqlite" else value
+        if column in _DATETIME_FIELDS:
+            if isinstance(value, str):
+                value = datetime.fromisoformat(value)
+            # Формат совпадает с тем, как SQLAlchemy хранит DateTime в SQLite
+            return value.strftime("%Y-%m-%d %H:%M:%S.%f") if self.dialect == "sqlite" else value
+        return value
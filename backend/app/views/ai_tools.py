@@ -1,14 +1,37 @@
 """
 Views для ИИ-инструментов
-TODO: Заменить заглушки на реальную интеграцию с ИИ
+
+Инструменты выполняются фоновыми задачами (app.services.ai_jobs): POST
+инструмента возвращает id задачи, а состояние и результат читаются через
+/jobs/{job_id} или поток событий /jobs/{job_id}/events.
 """
-from fastapi import APIRouter, Depends, Request, HTTPException
-from fastapi.responses import JSONResponse
+import json
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import Dict, Any
+from typing import Dict, Any, List, Optional
 
 from app.api.deps import get_db
+from app.core.database import session_scope
+from app.core.page_cache import not_modified, page_cache
+from app.models import RoleModel, RoleProfile
+from app.schemas.ml import ClusteringRequest
+from app.services.ai_cache import cached_completion, snapshot_version
+from app.services.access_rules import suggest_profile_accesses
+from app.services.ai_jobs import JobProgress, JobQueueFullError, job_queue
+from app.services.clustering import (
+    ALGORITHMS, FEATURES, STRATEGIES, cluster_role_model, load_clustering_data
+)
+from app.services.coverage_gaps import analyze_coverage_gaps, load_coverage_data
+from app.services.criteria_optimizer import optimize_criteria
+from app.services.llm_client import LLMError, build_tool_messages
+from app.services.profile_merge import evaluate_profile_merge
+from app.services.profile_overlap import analyze_profile_overlaps, load_profile_memberships
+from app.services.profile_split import split_role_profile
+from app.services.projection import JSON_POINTS, projection_store
 from app.utils.logger import logger
 
 router = APIRouter()
@@ -26,309 +49,457 @@ class AIToolResponse(BaseModel):
     data: Dict[str, Any] = {}
 
 
-@router.post("/role-model/{role_model_id}/optimize", response_model=AIToolResponse)
+class AIJobStatus(BaseModel):
+    id: str
+    tool: str
+    params: Dict[str, Any]
+    status: str  # queued/running/done/failed
+    progress: float
+    progress_message: Optional[str] = None
+    result: Optional[AIToolResponse] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+
+async def _require_role_model(role_model_id: int, db: AsyncSession):
+    """404, если ролевой модели нет (проверка до постановки задачи)"""
+    result = await db.execute(select(RoleModel.id).where(RoleModel.id == role_model_id))
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="Ролевая модель не найдена")
+
+
+async def _require_profile(profile_id: int, db: AsyncSession):
+    """404, если профиля нет (проверка до постановки задачи)"""
+    result = await db.execute(select(RoleProfile.id).where(RoleProfile.id == profile_id))
+    if result.scalar() is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+
+
+async def _profiles_role_model_id(profile_ids: List[int]) -> Optional[int]:
+    """Ролевая модель профилей (для версии данных в кэше ответов LLM)"""
+    if not profile_ids:
+        return None
+    async with session_scope() as session:
+        result = await session.execute(
+            select(RoleProfile.role_model_id).where(RoleProfile.id.in_(profile_ids))
+        )
+        return result.scalars().first()
+
+
+async def _add_commentary(data: Dict[str, Any], task: str, role_model_id: Optional[int]):
+    """
+    Комментарий LLM к результатам инструмента (data["commentary"])
+
+    Ответ кэшируется по промпту и версии данных ролевой модели. Если LLM
+    недоступен или перегружен, инструмент возвращает результаты без комментария.
+    """
+    try:
+        commentary, cached = await cached_completion(build_tool_messages(task, data), role_model_id)
+    except LLMError as e:
+        logger.warning(f"Комментарий LLM недоступен: {e}")
+        return
+    data["commentary"] = commentary
+    data["commentary_cached"] = cached
+
+
+# ===== ЗАДАЧИ =====
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+
+async def _submit(tool: str, params: Dict[str, Any]) -> AIToolResponse:
+    """Поставить инструмент в очередь фоновых задач"""
+    try:
+        job, deduplicated = await job_queue.submit(tool, params)
+    except JobQueueFullError as e:
+        logger.warning(f"Очередь ИИ-инструментов заполнена: {e}")
+        raise HTTPException(status_code=503, detail="Очередь ИИ-инструментов заполнена, повторите позже",
+                            headers={"Retry-After": "30"})
+    return AIToolResponse(
+        success=True,
+        message="Такая задача уже выполняется." if deduplicated else "Задача поставлена в очередь.",
+        data={"job_id": job["id"], "status": job["status"], "deduplicated": deduplicated},
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=AIJobStatus)
+async def get_job(job_id: str):
+    """Состояние задачи ИИ-инструмента, после завершения - результат или ошибка"""
+    job = await job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return AIJobStatus(**job)
+
+
+@router.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Поток состояния задачи (Server-Sent Events)
+
+    Событие progress при каждом изменении, в конце - done или failed
+    с полным состоянием задачи.
+    """
+    if await job_queue.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+
+    async def events():
+        async for job in job_queue.watch(job_id):
+            event = job["status"] if job["status"] in ("done", "failed") else "progress"
+            yield _sse(event, AIJobStatus(**job).model_dump(mode="json"))
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/projection")
+async def employee_projection(
+    request: Request,
+    format: str = Query("binary", description="binary (int32 id[n] + float32 xy[n, 2]) или json"),
+    max_points: int = Query(JSON_POINTS, ge=1, description="Точек в JSON (прореживание)")
+):
+    """Проекция сотрудников на плоскость для scatter-графика кластеров (ETag - версия снимка)"""
+    if format not in ("binary", "json"):
+        raise HTTPException(status_code=400, detail="Формат должен быть binary или json")
+    version = await snapshot_version()
+    etag = page_cache.etag("projection", version, format, max_points if format == "json" else None)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if not_modified(request, etag, None):
+        return Response(status_code=304, headers=headers)
+
+    projection = await projection_store.get(version)
+    if format == "json":
+        return JSONResponse(projection.to_json(max_points), headers=headers)
+    return Response(
+        projection.payload(),
+        media_type="application/octet-stream",
+        headers={
+            **headers,
+            "X-Projection-Points": str(len(projection.employee_ids)),
+            "X-Projection-Method": projection.method,
+        },
+    )
+
+
+# ===== ИНСТРУМЕНТЫ =====
+
+@router.post("/role-model/{role_model_id}/optimize", response_model=AIToolResponse, status_code=202)
 async def optimize_role_model(
     role_model_id: int,
     request: AIToolRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    """
-    Оптимизация ролевой модели
-    TODO: Интеграция с реальным ИИ
-    """
-    try:
-        logger.info(f"Запрос оптимизации ролевой модели {role_model_id}")
-        
-        # TODO: Реальная логика оптимизации
-        # 1. Анализ текущих профилей
-        # 2. Поиск пересечений и пробелов
-        # 3. Предложения по улучшению
-        
-        response_data = {
-            "suggestions": [
-                "Объединить похожие профили Java Backend и Frontend",
-                "Добавить критерий по опыту работы для Senior разработчиков",
-                "Уточнить критерии попадания для уменьшения пересечений"
-            ],
-            "metrics": {
-                "current_profiles": 2,
-                "suggested_profiles": 3,
-                "overlap_percentage": 15
-            }
-        }
-        
-        return AIToolResponse(
-            success=True,
-            message="Анализ завершен. Найдены возможности для оптимизации.",
-            data=response_data
-        )
-        
-    except Exception as e:
-        logger.error(f"Ошибка оптимизации ролевой модели {role_model_id}: {e}")
-        return AIToolResponse(
-            success=False,
-            message=f"Ошибка оптимизации: {str(e)}"
-        )
+    """Оптимизация ролевой модели (фоновая задача)"""
+    await _require_role_model(role_model_id, db)
+    return await _submit("optimize_role_model", {**request.parameters, "role_model_id": role_model_id})
 
 
-@router.post("/role-model/{role_model_id}/analyze-gaps", response_model=AIToolResponse)
+@router.post("/role-model/{role_model_id}/analyze-gaps", response_model=AIToolResponse, status_code=202)
 async def analyze_gaps(
     role_model_id: int,
     request: AIToolRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    """
-    Анализ пробелов в ролевой модели
-    TODO: Интеграция с реальным ИИ
-    """
-    try:
-        logger.info(f"Запрос анализа пробелов для ролевой модели {role_model_id}")
-        
-        # TODO: Реальная логика анализа пробелов
-        # 1. Анализ сотрудников без профилей
-        # 2. Поиск недостающих ролей
-        # 3. Предложения новых профилей
-        
-        response_data = {
-            "gaps": [
-                {
-                    "type": "missing_profile",
-                    "description": "Отсутствует профиль для DevOps инженеров",
-                    "affected_employees": 8,
-                    "suggestion": "Создать профиль DevOps Engineer"
-                },
-                {
-                    "type": "broad_criteria",
-                    "description": "Слишком широкие критерии в Java Backend",
-                    "affected_employees": 45,
-                    "suggestion": "Разделить на Junior и Senior профили"
-                }
-            ],
-            "uncovered_employees": 12
-        }
-        
-        return AIToolResponse(
-            success=True,
-            message="Анализ пробелов завершен.",
-            data=response_data
-        )
-        
-    except Exception as e:
-        logger.error(f"Ошибка анализа пробелов для ролевой модели {role_model_id}: {e}")
-        return AIToolResponse(
-            success=False,
-            message=f"Ошибка анализа: {str(e)}"
-        )
+    """Анализ пробелов в ролевой модели (фоновая задача)"""
+    await _require_role_model(role_model_id, db)
+    return await _submit("analyze_gaps", {**request.parameters, "role_model_id": role_model_id})
 
 
-@router.post("/profile/{profile_id}/optimize-criteria", response_model=AIToolResponse)
+@router.post("/role-model/{role_model_id}/cluster", response_model=AIToolResponse, status_code=202)
+async def cluster_employees(
+    role_model_id: int,
+    request: ClusteringRequest,
+    db: AsyncSession = Depends(get_db)
+):
+    """Кластеризация сотрудников для ролевой модели (фоновая задача)"""
+    await _require_role_model(role_model_id, db)
+    if request.strategy not in STRATEGIES:
+        raise HTTPException(status_code=400, detail=f"Стратегия должна быть одной из: {', '.join(STRATEGIES)}")
+    if request.algorithm not in ALGORITHMS:
+        raise HTTPException(status_code=400, detail=f"Алгоритм должен быть одним из: {', '.join(ALGORITHMS)}")
+    unknown = set(request.features or []) - set(FEATURES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Неизвестные признаки: {', '.join(sorted(unknown))}")
+    return await _submit("cluster_employees", {**request.model_dump(), "role_model_id": role_model_id})
+
+
+@router.post("/profile/{profile_id}/optimize-criteria", response_model=AIToolResponse, status_code=202)
 async def optimize_profile_criteria(
     profile_id: int,
     request: AIToolRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    """
-    Оптимизация критериев профиля
-    TODO: Интеграция с реальным ИИ
-    """
-    try:
-        logger.info(f"Запрос оптимизации критериев профиля {profile_id}")
-        
-        # TODO: Реальная логика оптимизации критериев
-        # 1. Анализ текущих критериев
-        # 2. Поиск слишком широких/узких критериев
-        # 3. Предложения по уточнению
-        
-        response_data = {
-            "current_criteria": {
-                "employee_profiles": ["Java Developer"],
-                "positions": ["Backend Developer"],
-                "org_units_type": ["IT-блок"],
-                "employee_types": ["Штатный"],
-                "all_employees": False
-            },
-            "suggested_criteria": {
-                "employee_profiles": ["Java Developer", "Spring Developer"],
-                "positions": ["Backend Developer", "Senior Backend Developer"],
-                "org_units_type": ["IT-блок"],
-                "employee_types": ["Штатный"],
-                "experience_years": {"min": 2, "max": None},
-                "all_employees": False
-            },
-            "impact": {
-                "current_employees": 25,
-                "suggested_employees": 18,
-                "improvement": "Более точное попадание в профиль"
-            }
-        }
-        
-        return AIToolResponse(
-            success=True,
-            message="Критерии профиля оптимизированы.",
-            data=response_data
-        )
-        
-    except Exception as e:
-        logger.error(f"Ошибка оптимизации критериев профиля {profile_id}: {e}")
-        return AIToolResponse(
-            success=False,
-            message=f"Ошибка оптимизации: {str(e)}"
-        )
+    """Оптимизация критериев профиля (фоновая задача)"""
+    await _require_profile(profile_id, db)
+    return await _submit("optimize_profile_criteria", {**request.parameters, "profile_id": profile_id})
 
 
-@router.post("/profile/{profile_id}/suggest-accesses", response_model=AIToolResponse)
+@router.post("/profile/{profile_id}/suggest-accesses", response_model=AIToolResponse, status_code=202)
 async def suggest_accesses(
     profile_id: int,
     request: AIToolRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    """
-    Предложение доступов для профиля
-    TODO: Интеграция с реальным ИИ
-    """
-    try:
-        logger.info(f"Запрос предложения доступов для профиля {profile_id}")
-        
-        # TODO: Реальная логика предложения доступов
-        # 1. Анализ роли и обязанностей
-        # 2. Поиск недостающих доступов
-        # 3. Предложения новых доступов
-        
-        response_data = {
-            "current_accesses": [
-                "Git Repository",
-                "CI/CD Pipeline",
-                "Development Environment"
-            ],
-            "suggested_accesses": [
-                {
-                    "name": "SonarQube",
-                    "description": "Анализ качества кода",
-                    "reason": "Необходимо для Java разработчиков",
-                    "priority": "high"
-                },
-                {
-                    "name": "Monitoring Dashboard",
-                    "description": "Мониторинг приложений",
-                    "reason": "Для отслеживания производительности",
-                    "priority": "medium"
-                }
-            ]
-        }
-        
-        return AIToolResponse(
-            success=True,
-            message="Предложения по доступам готовы.",
-            data=response_data
-        )
-        
-    except Exception as e:
-        logger.error(f"Ошибка предложения доступов для профиля {profile_id}: {e}")
-        return AIToolResponse(
-            success=False,
-            message=f"Ошибка предложения: {str(e)}"
-        )
+    """Предложение доступов для профиля (фоновая задача)"""
+    await _require_profile(profile_id, db)
+    return await _submit("suggest_accesses", {**request.parameters, "profile_id": profile_id})
 
 
-@router.post("/profiles/merge", response_model=AIToolResponse)
+@router.post("/profiles/merge", response_model=AIToolResponse, status_code=202)
 async def merge_profiles(
     request: AIToolRequest,
     db: AsyncSession = Depends(get_db)
 ):
-    """
-    Объединение профилей
-    TODO: Интеграция с реальным ИИ
-    """
-    try:
-        profile_ids = request.parameters.get("profile_ids", [])
-        logger.info(f"Запрос объединения профилей: {profile_ids}")
-        
-        # TODO: Реальная логика объединения профилей
-        # 1. Анализ совместимости профилей
-        # 2. Создание объединенных критериев
-        # 3. Предложение нового профиля
-        
-        response_data = {
-            "compatible": True,
-            "merged_criteria": {
-                "employee_profiles": ["Java Developer", "Frontend Developer"],
-                "positions": ["Full-Stack Developer"],
-                "org_units_type": ["IT-блок"],
-                "employee_types": ["Штатный"],
-                "all_employees": False
-            },
-            "suggested_name": "Full-Stack Developer",
-            "impact": {
-                "total_employees": 35,
-                "overlap_employees": 12
-            }
-        }
-        
-        return AIToolResponse(
-            success=True,
-            message="Профили могут быть объединены.",
-            data=response_data
-        )
-        
-    except Exception as e:
-        logger.error(f"Ошибка объединения профилей: {e}")
-        return AIToolResponse(
-            success=False,
-            message=f"Ошибка объединения: {str(e)}"
-        )
+    """Объединение профилей (фоновая задача)"""
+    profile_ids = request.parameters.get("profile_ids")
+    if (not isinstance(profile_ids, list) or not all(isinstance(profile_id, int) for profile_id in profile_ids)
+            or len(set(profile_ids)) < 2):
+        raise HTTPException(status_code=400, detail="Нужно указать минимум два профиля (profile_ids)")
+    for profile_id in set(profile_ids):
+        await _require_profile(profile_id, db)
+    return await _submit("merge_profiles", request.parameters)
 
 
-@router.post("/profile/{profile_id}/split", response_model=AIToolResponse)
+@router.post("/profile/{profile_id}/split", response_model=AIToolResponse, status_code=202)
 async def split_profile(
     profile_id: int,
     request: AIToolRequest,
     db: AsyncSession = Depends(get_db)
 ):
+    """Разделение профиля (фоновая задача)"""
+    await _require_profile(profile_id, db)
+    return await _submit("split_profile", {**request.parameters, "profile_id": profile_id})
+
+
+# ===== ОБРАБОТЧИКИ ЗАДАЧ =====
+
+@job_queue.tool("optimize_role_model")
+async def run_optimize_role_model(params: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
     """
-    Разделение профиля
-    TODO: Интеграция с реальным ИИ
+    Оптимизация ролевой модели: пересечения профилей по сотрудникам и доступам
     """
-    try:
-        logger.info(f"Запрос разделения профиля {profile_id}")
-        
-        # TODO: Реальная логика разделения профиля
-        # 1. Анализ разнородности сотрудников
-        # 2. Поиск естественных групп
-        # 3. Предложения по разделению
-        
-        response_data = {
-            "split_suggestions": [
-                {
-                    "name": "Junior Java Developer",
-                    "criteria": {
-                        "employee_profiles": ["Java Developer"],
-                        "experience_years": {"min": 1, "max": 3},
-                        "positions": ["Junior Backend Developer"]
-                    },
-                    "employees_count": 15
-                },
-                {
-                    "name": "Senior Java Developer", 
-                    "criteria": {
-                        "employee_profiles": ["Java Developer"],
-                        "experience_years": {"min": 3, "max": None},
-                        "positions": ["Senior Backend Developer", "Lead Developer"]
-                    },
-                    "employees_count": 10
-                }
-            ],
-            "split_reason": "Обнаружены две четкие группы по опыту работы"
-        }
-        
-        return AIToolResponse(
-            success=True,
-            message="Профиль может быть разделен на две группы.",
-            data=response_data
-        )
+    role_model_id = params["role_model_id"]
+    logger.info(f"Запрос оптимизации ролевой модели {role_model_id}")
+    
+    await progress(0.1, "Загрузка состава профилей")
+    async with session_scope() as session:
+        memberships = await load_profile_memberships(role_model_id, session)
+    if memberships is None:
+        raise ValueError("Ролевая модель не найдена")
+    
+    await progress(0.4, "Пересечения профилей")
+    response_data = await analyze_profile_overlaps(memberships, params)
+    
+    await progress(0.7, "Комментарий LLM")
+    await _add_commentary(
+        response_data, "Предложи, как оптимизировать ролевую модель: какие профили объединить, разделить или уточнить.",
+        role_model_id
+    )
+    
+    return AIToolResponse(
+        success=True,
+        message=(
+            "Анализ завершен. Найдены возможности для оптимизации."
+            if response_data["suggestions"] else "Анализ завершен. Пересечений профилей не найдено."
+        ),
+        data=response_data
+    ).model_dump()
+
+
+@job_queue.tool("analyze_gaps")
+async def run_analyze_gaps(params: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    """
+    Анализ пробелов в ролевой модели: активные сотрудники вне профилей и кандидатные профили
+    """
+    role_model_id = params["role_model_id"]
+    logger.info(f"Запрос анализа пробелов для ролевой модели {role_model_id}")
+    
+    await progress(0.1, "Загрузка сотрудников и покрытия профилями")
+    async with session_scope() as session:
+        coverage = await load_coverage_data(role_model_id, session)
+        if coverage is None:
+            raise ValueError("Ролевая модель не найдена")
         
-    except Exception as e:
-        logger.error(f"Ошибка разделения профиля {profile_id}: {e}")
-        return AIToolResponse(
-            success=False,
-            message=f"Ошибка разделения: {str(e)}"
-        )
+        await progress(0.4, "Группировка непокрытых сотрудников")
+        response_data = await analyze_coverage_gaps(coverage, session, params)
+    
+    await progress(0.7, "Комментарий LLM")
+    await _add_commentary(
+        response_data, "Объясни найденные пробелы ролевой модели и какие профили стоит добавить.",
+        role_model_id
+    )
+    
+    return AIToolResponse(
+        success=True,
+        message=(
+            f"Анализ пробелов завершен. Вне профилей {response_data['uncovered_employees']} активных сотрудников."
+            if response_data["gaps"] else "Анализ пробелов завершен. Все активные сотрудники покрыты профилями."
+        ),
+        data=response_data
+    ).model_dump()
+
+
+@job_queue.tool("cluster_employees")
+async def run_cluster_employees(params: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    """
+    Кластеризация сотрудников: стратегия и алгоритм из ClusteringRequest, кластеры сохраняются
+    """
+    role_model_id = params.pop("role_model_id")
+    request = ClusteringRequest(**params)
+    logger.info(f"Запрос кластеризации сотрудников ({request.strategy}) для ролевой модели {role_model_id}")
+    
+    await progress(0.1, "Загрузка признаков сотрудников")
+    async with session_scope() as session:
+        data = await load_clustering_data(request, session)
+    
+    await progress(0.2, "Проекция сотрудников для визуализации")
+    projection = await projection_store.get()
+    
+    await progress(0.4, "Кластеризация")
+    async with session_scope() as session:
+        response_data = await cluster_role_model(role_model_id, request, data, session, projection)
+    
+    await progress(0.8, "Комментарий LLM")
+    await _add_commentary(
+        response_data, "Опиши найденные кластеры сотрудников и какие профили ролевой модели из них получатся.",
+        role_model_id
+    )
+    
+    return AIToolResponse(
+        success=True,
+        message=f"Кластеризация завершена: {len(response_data['clusters'])} кластеров.",
+        data=response_data
+    ).model_dump()
+
+
+@job_queue.tool("optimize_profile_criteria")
+async def run_optimize_profile_criteria(params: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    """
+    Оптимизация критериев профиля: поиск изменений по precision/recall относительно держателей доступов
+    """
+    profile_id = params["profile_id"]
+    logger.info(f"Запрос оптимизации критериев профиля {profile_id}")
+    
+    await progress(0.1, "Поиск критериев")
+    async with session_scope() as session:
+        response_data = await optimize_criteria(profile_id, session, params)
+    if response_data is None:
+        raise ValueError("Профиль не найден")
+    
+    await progress(0.7, "Комментарий LLM")
+    await _add_commentary(
+        response_data, "Объясни, как изменятся критерии попадания в профиль и почему.",
+        await _profiles_role_model_id([profile_id])
+    )
+    
+    return AIToolResponse(
+        success=True,
+        message=(
+            f"Критерии профиля оптимизированы: изменений - {len(response_data['changes'])}."
+            if response_data["changes"] else
+            "Анализ завершен. Текущие критерии профиля оптимальны."
+            if response_data["target"]["target_employees"] else
+            f"Анализ завершен. {response_data['impact']['improvement']}."
+        ),
+        data=response_data
+    ).model_dump()
+
+
+@job_queue.tool("suggest_accesses")
+async def run_suggest_accesses(params: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    """
+    Предложение доступов для профиля: ассоциативные правила (FP-Growth) по доступам его сотрудников
+    """
+    profile_id = params["profile_id"]
+    logger.info(f"Запрос предложения доступов для профиля {profile_id}")
+    
+    await progress(0.1, "Поиск частых наборов доступов")
+    async with session_scope() as session:
+        response_data = await suggest_profile_accesses(profile_id, session, params)
+    if response_data is None:
+        raise ValueError("Профиль не найден")
+    
+    await progress(0.7, "Комментарий LLM")
+    await _add_commentary(
+        response_data, "Объясни, зачем профилю предложенные доступы и в каком порядке их добавлять.",
+        await _profiles_role_model_id([profile_id])
+    )
+    
+    suggested = sum(
+        len(response_data[bucket]) for bucket in ("high_confidence", "medium_confidence", "low_confidence")
+    )
+    return AIToolResponse(
+        success=True,
+        message=(
+            f"Предложения по доступам готовы: {suggested}." if suggested
+            else "Анализ завершен. Новых доступов для профиля не найдено."
+        ),
+        data=response_data
+    ).model_dump()
+
+
+@job_queue.tool("merge_profiles")
+async def run_merge_profiles(params: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    """
+    Объединение профилей: объединенные критерии, точный состав, доступы и расширение привилегий
+    """
+    profile_ids = params.get("profile_ids", [])
+    logger.info(f"Запрос объединения профилей: {profile_ids}")
+    
+    await progress(0.1, "Оценка объединения профилей")
+    async with session_scope() as session:
+        response_data = await evaluate_profile_merge(profile_ids, session, params)
+    if response_data is None:
+        raise ValueError("Профиль не найден")
+    
+    await progress(0.7, "Комментарий LLM")
+    await _add_commentary(
+        response_data, "Оцени, стоит ли объединять профили и чем рискует объединенный профиль.",
+        await _profiles_role_model_id(profile_ids)
+    )
+    
+    expansion = response_data["privilege_expansion"]
+    return AIToolResponse(
+        success=True,
+        message=(
+            "Профили могут быть объединены." if response_data["compatible"]
+            else "Объединение профилей не рекомендуется."
+        ) + f" Новых доступов получат {expansion['employees_affected']} сотрудников.",
+        data=response_data
+    ).model_dump()
+
+
+@job_queue.tool("split_profile")
+async def run_split_profile(params: Dict[str, Any], progress: JobProgress) -> Dict[str, Any]:
+    """
+    Разделение профиля: группы сотрудников по доступам и опыту, критерии групп по дереву решений
+    """
+    profile_id = params["profile_id"]
+    logger.info(f"Запрос разделения профиля {profile_id}")
+    
+    await progress(0.1, "Группировка сотрудников профиля")
+    async with session_scope() as session:
+        response_data = await split_role_profile(profile_id, session, params)
+    if response_data is None:
+        raise ValueError("Профиль не найден")
+    
+    await progress(0.7, "Комментарий LLM")
+    await _add_commentary(
+        response_data, "Объясни предложенное разделение профиля на группы.",
+        await _profiles_role_model_id([profile_id])
+    )
+    
+    suggestions = response_data["split_suggestions"]
+    return AIToolResponse(
+        success=True,
+        message=(
+            f"Профиль может быть разделен: предложено подпрофилей - {len(suggestions)}."
+            if suggestions else "Анализ завершен. Разделять профиль не требуется."
+        ),
+        data=response_data
+    ).model_dump()
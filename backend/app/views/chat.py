@@ -1,15 +1,26 @@
 """
 Views для чата с ИИ-ассистентом
-TODO: Заменить заглушки на реальную интеграцию с ИИ
+
+Ответы генерирует LLM-сервер llama.cpp; если он недоступен, ассистент
+отвечает заготовками generate_ai_response.
 """
-from fastapi import APIRouter, Depends, Request, HTTPException
-from fastapi.responses import JSONResponse
+import asyncio
+import json
+
+from fastapi import APIRouter, Depends, Request, HTTPException, Query
+from fastapi.responses import JSONResponse, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import AsyncIterator, List, Dict, Any, Optional
 from datetime import datetime
+from uuid import uuid4
 
 from app.api.deps import get_db
+from app.core.config import settings
+from app.services.conversation_store import conversation_store
+from app.services.llm_client import (
+    LLMOverloadedError, LLMUnavailableError, build_chat_messages, stream_chat
+)
 from app.utils.logger import logger
 
 router = APIRouter()
@@ -35,8 +46,34 @@ class ChatResponse(BaseModel):
     timestamp: datetime
 
 
-# TODO: Заменить на реальное хранилище (Redis, база данных)
-conversation_storage: Dict[str, List[ChatMessage]] = {}
+class ChatHistory(BaseModel):
+    messages: List[ChatMessage]
+    total: int  # обменов (пар сообщений) в диалоге
+    offset: int
+    limit: int
+
+
+async def assistant_tokens(conversation_id: str, request: ChatRequest) -> AsyncIterator[str]:
+    """Токены ответа ассистента: из LLM, а если он недоступен - заготовка целиком"""
+    history = []
+    if request.conversation_id:
+        history = await conversation_store.recent(conversation_id, settings.LLM_HISTORY_EXCHANGES)
+    messages = build_chat_messages(request.message, request.context, history)
+
+    started = False
+    try:
+        async for token in stream_chat(messages):
+            started = True
+            yield token
+    except LLMUnavailableError as e:
+        if started:
+            raise
+        logger.warning(f"{e}, используется заготовленный ответ")
+        yield generate_ai_response(request.message, request.context)
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
 
 
 @router.post("/send", response_model=ChatResponse)
@@ -45,71 +82,89 @@ async def send_message(
     db: AsyncSession = Depends(get_db)
 ):
     """
-    Отправка сообщения в чат
-    TODO: Интеграция с реальным ИИ
+    Отправка сообщения в чат с ответом одним блоком (потоковый вариант - /stream)
     """
     try:
-        conversation_id = request.conversation_id or f"conv_{datetime.now().timestamp()}"
-        
-        # Сохраняем сообщение пользователя
-        user_message = ChatMessage(
-            role="user",
-            content=request.message,
-            timestamp=datetime.now(),
-            context=request.context
-        )
-        
-        if conversation_id not in conversation_storage:
-            conversation_storage[conversation_id] = []
-        
-        conversation_storage[conversation_id].append(user_message)
+        conversation_id = request.conversation_id or f"conv_{uuid4().hex}"
         
         logger.info(f"Получено сообщение в чате: {request.message[:50]}...")
         
-        # TODO: Реальная интеграция с ИИ
-        # 1. Анализ контекста
-        # 2. Понимание намерения пользователя
-        # 3. Генерация ответа
-        
-        # Заглушка ответа
-        ai_response = generate_ai_response(request.message, request.context)
+        ai_response = "".join([token async for token in assistant_tokens(conversation_id, request)])
         
-        # Сохраняем ответ ИИ
-        ai_message = ChatMessage(
-            role="assistant",
-            content=ai_response,
-            timestamp=datetime.now(),
-            context=request.context
+        # Сохраняем обмен: в БД он попадет со следующим пакетом записи
+        exchange = conversation_store.append(
+            conversation_id, request.message, ai_response, request.context
         )
         
-        conversation_storage[conversation_id].append(ai_message)
-        
         return ChatResponse(
             message=ai_response,
             context=request.context,
             conversation_id=conversation_id,
-            timestamp=datetime.now()
+            timestamp=exchange["timestamp"]
         )
         
+    except LLMOverloadedError as e:
+        logger.warning(str(e))
+        raise HTTPException(status_code=503, detail="ИИ-ассистент перегружен, повторите запрос позже",
+                            headers={"Retry-After": "10"})
     except Exception as e:
         logger.error(f"Ошибка обработки сообщения чата: {e}")
         raise HTTPException(status_code=500, detail="Ошибка обработки сообщения")
 
 
-@router.get("/history/{conversation_id}")
+@router.post("/stream")
+async def stream_message(request: ChatRequest):
+    """
+    Отправка сообщения в чат с потоковым ответом (Server-Sent Events)
+
+    События: start (conversation_id), token (очередной фрагмент ответа),
+    done (полный ответ) или error. При отключении клиента генерация
+    прерывается, а уже полученная часть ответа сохраняется в историю.
+    """
+    conversation_id = request.conversation_id or f"conv_{uuid4().hex}"
+    logger.info(f"Получено сообщение в чате (stream): {request.message[:50]}...")
+
+    async def events():
+        parts: List[str] = []
+        yield _sse("start", {"conversation_id": conversation_id})
+        try:
+            async for token in assistant_tokens(conversation_id, request):
+                parts.append(token)
+                yield _sse("token", {"content": token})
+            yield _sse("done", {"message": "".join(parts), "timestamp": datetime.now()})
+        except asyncio.CancelledError:
+            logger.info(f"Клиент отключился, генерация ответа в {conversation_id} прервана")
+            raise
+        except LLMOverloadedError as e:
+            logger.warning(str(e))
+            yield _sse("error", {"detail": "ИИ-ассистент перегружен, повторите запрос позже"})
+        except Exception as e:
+            logger.error(f"Ошибка генерации ответа чата: {e}")
+            yield _sse("error", {"detail": "Ошибка генерации ответа"})
+        finally:
+            if parts:
+                conversation_store.append(conversation_id, request.message, "".join(parts), request.context)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        # X-Accel-Buffering: nginx не должен буферизовать поток
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/history/{conversation_id}", response_model=ChatHistory)
 async def get_conversation_history(
     conversation_id: str,
-    db: AsyncSession = Depends(get_db)
+    offset: int = Query(0, ge=0, description="Сколько последних обменов пропустить"),
+    limit: int = Query(20, ge=1, le=100, description="Количество обменов"),
 ):
     """
-    Получение истории чата
+    Получение истории чата постранично, от последних обменов к первым
     """
     try:
-        if conversation_id not in conversation_storage:
-            return {"messages": []}
-        
-        messages = conversation_storage[conversation_id]
-        return {"messages": [msg.dict() for msg in messages]}
+        messages, total = await conversation_store.history(conversation_id, offset, limit)
+        return ChatHistory(messages=messages, total=total, offset=offset, limit=limit)
         
     except Exception as e:
         logger.error(f"Ошибка получения истории чата {conversation_id}: {e}")
@@ -1,71 +1,192 @@
 """
 Views для ролевых моделей
 """
-from fastapi import APIRouter, Depends, Request, HTTPException
+from fastapi import APIRouter, Depends, Request, HTTPException, Query
 from fastapi.templating import Jinja2Templates
 from fastapi.responses import HTMLResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
+from sqlalchemy import select, func
+from typing import List, Optional
 
 from app.api.deps import get_db
-from app.models.role_model import RoleModel, RoleProfile
+from app.core.page_cache import ALL_MODELS, cached_page, page_cache
+from app.models.access import Access, ApplicationSystem
+from app.models.role_model import RoleModel, RoleProfile, ProfileAccess
+from app.services.profile_matching import matching_employees_query
 from app.utils.logger import logger
 
 router = APIRouter()
 templates = Jinja2Templates(directory="templates")
 
 
+# Разделитель названий систем в агрегате (в названиях АС не встречается)
+SYSTEMS_SEPARATOR = "\x1f"
+
+
+def role_models_overview_query(page: int, size: int):
+    """
+    Один запрос на страницу списка: модель, число профилей, список АС и общее число моделей
+
+    Профили и АС агрегируются в отдельных подзапросах, чтобы соединение
+    профиль x доступ не размножало строки при подсчете профилей.
+    """
+    profiles_agg = (
+        select(RoleProfile.role_model_id, func.count().label("profiles_count"))
+        .group_by(RoleProfile.role_model_id)
+        .subquery()
+    )
+    model_systems = (
+        select(RoleProfile.role_model_id, ApplicationSystem.name)
+        .join(ProfileAccess, ProfileAccess.role_profile_id == RoleProfile.id)
+        .join(Access, Access.id == ProfileAccess.access_id)
+        .join(ApplicationSystem, ApplicationSystem.id == Access.system_id)
+        .distinct()
+        .subquery()
+    )
+    systems_agg = (
+        select(
+            model_systems.c.role_model_id,
+            func.aggregate_strings(model_systems.c.name, SYSTEMS_SEPARATOR).label("systems"),
+        )
+        .group_by(model_systems.c.role_model_id)
+        .subquery()
+    )
+    return (
+        select(
+            RoleModel.id,
+            RoleModel.name,
+            RoleModel.description,
+            RoleModel.created_at,
+            RoleModel.updated_at,
+            func.coalesce(profiles_agg.c.profiles_count, 0).label("profiles_count"),
+            systems_agg.c.systems,
+            func.count().over().label("total"),
+        )
+        .outerjoin(profiles_agg, profiles_agg.c.role_model_id == RoleModel.id)
+        .outerjoin(systems_agg, systems_agg.c.role_model_id == RoleModel.id)
+        .order_by(RoleModel.id)
+        .offset((page - 1) * size)
+        .limit(size)
+    )
+
+
+async def _role_models_version(db: AsyncSession):
+    """
+    Отпечаток данных списка: количества и последние изменения моделей, профилей,
+    их доступов, а также систем и доступов (названия систем выводятся в карточках)
+    """
+    row = (await db.execute(select(
+        select(func.count(RoleModel.id)).scalar_subquery(),
+        select(func.max(RoleModel.updated_at)).scalar_subquery(),
+        select(func.count(RoleProfile.id)).scalar_subquery(),
+        select(func.max(RoleProfile.updated_at)).scalar_subquery(),
+        select(func.count(ProfileAccess.id)).scalar_subquery(),
+        select(func.max(ProfileAccess.updated_at)).scalar_subquery(),
+        select(func.count(ApplicationSystem.id)).scalar_subquery(),
+        select(func.max(ApplicationSystem.updated_at)).scalar_subquery(),
+        select(func.count(Access.id)).scalar_subquery(),
+        select(func.max(Access.updated_at)).scalar_subquery(),
+    ))).one()
+    last_modified = max((value for value in row[1::2] if value is not None), default=None)
+    return tuple(row), last_modified
+
+
 @router.get("/", response_class=HTMLResponse)
-async def list_role_models(request: Request, db: AsyncSession = Depends(get_db)):
+async def list_role_models(
+    request: Request,
+    page: int = Query(1, ge=1, description="Номер страницы"),
+    size: int = Query(24, ge=1, le=100, description="Размер страницы"),
+    db: AsyncSession = Depends(get_db)
+):
     """
     Главная страница - список ролевых моделей
     """
-    try:
-        # Получаем все ролевые модели с профилями
-        from sqlalchemy.orm import selectinload
-        result = await db.execute(select(RoleModel).options(selectinload(RoleModel.profiles)))
-        role_models = result.scalars().all()
-        
-        # Конвертируем в обычные объекты для Jinja2
-        role_models_data = []
-        for rm in role_models:
-            # Подсчитываем количество профилей
-            profiles_count = len(rm.profiles) if rm.profiles else 0
-            
-            # Подсчитываем количество уникальных систем доступа
-            access_systems = set()
-            try:
-                for profile in rm.profiles:
-                    if hasattr(profile, 'profile_accesses') and profile.profile_accesses:
-                        for access in profile.profile_accesses:
-                            if hasattr(access, 'system_name') and access.system_name:
-                                access_systems.add(access.system_name)
-            except Exception as e:
-                logger.warning(f"Ошибка при подсчете систем доступа для модели {rm.id}: {e}")
-                access_systems = set()
-            
-            role_models_data.append({
-                "id": rm.id,
-                "name": rm.name,
-                "description": rm.description,
-                "created_at": rm.created_at,
-                "updated_at": rm.updated_at,
-                "profiles": rm.profiles,
-                "access_systems": list(access_systems)
-            })
-        
-        logger.success(f"Загружено {len(role_models_data)} ролевых моделей")
-        
-        return templates.TemplateResponse("role_models/list.html", {
-            "request": request,
+    version, last_modified = await _role_models_version(db)
+
+    async def render():
+        try:
+            rows = (await db.execute(role_models_overview_query(page, size))).all()
+        except Exception as e:
+            logger.error(f"Ошибка загрузки ролевых моделей: {e}")
+            raise HTTPException(status_code=500, detail="Ошибка загрузки данных")
+
+        role_models_data = [
+            {
+                "id": row.id,
+                "name": row.name,
+                "description": row.description,
+                "created_at": row.created_at,
+                "updated_at": row.updated_at,
+                "profiles_count": row.profiles_count,
+                "access_systems": sorted(row.systems.split(SYSTEMS_SEPARATOR)) if row.systems else [],
+            }
+            for row in rows
+        ]
+        total = rows[0].total if rows else 0
+
+        logger.info(f"Загружено {len(role_models_data)} ролевых моделей (страница {page})")
+
+        return templates.TemplateResponse(request, "role_models/list.html", {
             "role_models": role_models_data,
+            "page": page,
+            "size": size,
+            "total": total,
+            "pages": (total + size - 1) // size,
             "page_title": "Ролевые модели"
         })
-        
-    except Exception as e:
-        logger.error(f"Ошибка загрузки ролевых моделей: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка загрузки данных")
+
+    key = ("role_models/list", page, size, version, page_cache.generation(ALL_MODELS))
+    return await cached_page(request, key, last_modified, render)
+
+
+async def _role_model_version(role_model_id: int, db: AsyncSession):
+    """Отпечаток данных страниц модели: ее updated_at, число и последнее изменение профилей"""
+    row = (await db.execute(
+        select(
+            RoleModel.updated_at,
+            select(func.count(RoleProfile.id))
+            .where(RoleProfile.role_model_id == role_model_id).scalar_subquery(),
+            select(func.max(RoleProfile.updated_at))
+            .where(RoleProfile.role_model_id == role_model_id).scalar_subquery(),
+        ).where(RoleModel.id == role_model_id)
+    )).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Ролевая модель не найдена")
+    last_modified = max(value for value in (row[0], row[2]) if value is not None)
+    return tuple(row), last_modified
+
+
+async def _load_role_model_page_data(role_model_id: int, db: AsyncSession):
+    """Ролевая модель и ее профили в виде словарей для Jinja2"""
+    result = await db.execute(select(RoleModel).where(RoleModel.id == role_model_id))
+    role_model = result.scalar_one_or_none()
+
+    if not role_model:
+        raise HTTPException(status_code=404, detail="Ролевая модель не найдена")
+
+    result = await db.execute(select(RoleProfile).where(RoleProfile.role_model_id == role_model_id))
+    profiles = result.scalars().all()
+
+    role_model_data = {
+        "id": role_model.id,
+        "name": role_model.name,
+        "description": role_model.description,
+        "created_at": role_model.created_at,
+        "updated_at": role_model.updated_at
+    }
+
+    profiles_data = [
+        {
+            "id": profile.id,
+            "name": profile.name,
+            "description": profile.description,
+            "criteria": profile.criteria,
+            "created_at": profile.created_at,
+            "updated_at": profile.updated_at
+        }
+        for profile in profiles
+    ]
+    return role_model_data, profiles_data
 
 
 @router.get("/{role_model_id}", response_class=HTMLResponse)
@@ -77,55 +198,30 @@ async def view_role_model(
     """
     Детальный просмотр ролевой модели
     """
-    try:
-        # Получаем ролевую модель с профилями
-        result = await db.execute(select(RoleModel).where(RoleModel.id == role_model_id))
-        role_model = result.scalar_one_or_none()
-        
-        if not role_model:
-            raise HTTPException(status_code=404, detail="Ролевая модель не найдена")
-        
-        # Получаем профили для этой модели
-        result = await db.execute(select(RoleProfile).where(RoleProfile.role_model_id == role_model_id))
-        profiles = result.scalars().all()
-        
-        # Конвертируем в обычные объекты для Jinja2
-        role_model_data = {
-            "id": role_model.id,
-            "name": role_model.name,
-            "description": role_model.description,
-            "created_at": role_model.created_at,
-            "updated_at": role_model.updated_at
-        }
-        
-        profiles_data = []
-        for profile in profiles:
-            profiles_data.append({
-                "id": profile.id,
-                "name": profile.name,
-                "description": profile.description,
-                "criteria": profile.criteria,
-                "created_at": profile.created_at,
-                "updated_at": profile.updated_at
-            })
-        
+    version, last_modified = await _role_model_version(role_model_id, db)
+
+    async def render():
+        try:
+            role_model_data, profiles_data = await _load_role_model_page_data(role_model_id, db)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка загрузки ролевой модели {role_model_id}: {e}")
+            raise HTTPException(status_code=500, detail="Ошибка загрузки данных")
+
         # TODO: Добавить подсчет сотрудников для каждого профиля
         # TODO: Добавить статистику по доступам
-        
-        logger.success(f"Загружена ролевая модель: {role_model.name}")
-        
-        return templates.TemplateResponse("role_models/detail.html", {
-            "request": request,
+
+        logger.success(f"Загружена ролевая модель: {role_model_data['name']}")
+
+        return templates.TemplateResponse(request, "role_models/detail.html", {
             "role_model": role_model_data,
             "profiles": profiles_data,
-            "page_title": f"Ролевая модель: {role_model.name}"
+            "page_title": f"Ролевая модель: {role_model_data['name']}"
         })
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Ошибка загрузки ролевой модели {role_model_id}: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка загрузки данных")
+
+    key = ("role_models/detail", role_model_id, version, page_cache.generation(role_model_id))
+    return await cached_page(request, key, last_modified, render)
 
 
 @router.get("/{role_model_id}/edit", response_class=HTMLResponse)
@@ -137,52 +233,40 @@ async def edit_role_model(
     """
     Редактирование ролевой модели
     """
-    try:
-        # Получаем ролевую модель с профилями
-        result = await db.execute(select(RoleModel).where(RoleModel.id == role_model_id))
-        role_model = result.scalar_one_or_none()
-        
-        if not role_model:
-            raise HTTPException(status_code=404, detail="Ролевая модель не найдена")
-        
-        # Получаем профили для этой модели
-        result = await db.execute(select(RoleProfile).where(RoleProfile.role_model_id == role_model_id))
-        profiles = result.scalars().all()
-        
-        # Конвертируем в обычные объекты для Jinja2
-        role_model_data = {
-            "id": role_model.id,
-            "name": role_model.name,
-            "description": role_model.description,
-            "created_at": role_model.created_at,
-            "updated_at": role_model.updated_at
-        }
-        
-        profiles_data = []
-        for profile in profiles:
-            profiles_data.append({
-                "id": profile.id,
-                "name": profile.name,
-                "description": profile.description,
-                "criteria": profile.criteria,
-                "created_at": profile.created_at,
-                "updated_at": profile.updated_at
-            })
-        
-        logger.success(f"Открыто редактирование ролевой модели: {role_model.name}")
-        
-        return templates.TemplateResponse("role_models/edit.html", {
-            "request": request,
+    version, last_modified = await _role_model_version(role_model_id, db)
+
+    async def render():
+        try:
+            role_model_data, profiles_data = await _load_role_model_page_data(role_model_id, db)
+        except HTTPException:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка загрузки ролевой модели для редактирования {role_model_id}: {e}")
+            raise HTTPException(status_code=500, detail="Ошибка загрузки данных")
+
+        logger.success(f"Открыто редактирование ролевой модели: {role_model_data['name']}")
+
+        return templates.TemplateResponse(request, "role_models/edit.html", {
             "role_model": role_model_data,
             "profiles": profiles_data,
-            "page_title": f"Редактирование: {role_model.name}"
+            "page_title": f"Редактирование: {role_model_data['name']}"
         })
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Ошибка загрузки ролевой модели для редактирования {role_model_id}: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка загрузки данных")
+
+    key = ("role_models/edit", role_model_id, version, page_cache.generation(role_model_id))
+    return await cached_page(request, key, last_modified, render)
+
+
+async def _get_model_profile(role_model_id: int, profile_id: int, db: AsyncSession):
+    """Ролевая модель и ее профиль одним запросом (404, если не найдены)"""
+    result = await db.execute(
+        select(RoleModel, RoleProfile)
+        .join(RoleProfile, RoleProfile.role_model_id == RoleModel.id)
+        .where(RoleModel.id == role_model_id, RoleProfile.id == profile_id)
+    )
+    row = result.first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Профиль не найден")
+    return row
 
 
 @router.get("/{role_model_id}/profiles/{profile_id}/employees", response_class=HTMLResponse)
@@ -194,59 +278,63 @@ async def view_profile_employees(
 ):
     """
     Просмотр сотрудников, соответствующих профилю
+
+    Страница отдается сразу, без выборки сотрудников: строки догружаются
+    постранично через employees/rows, общее число - через API подсчета.
     """
-    try:
-        # Получаем ролевую модель
-        result = await db.execute(select(RoleModel).where(RoleModel.id == role_model_id))
-        role_model = result.scalar_one_or_none()
-        
-        if not role_model:
-            raise HTTPException(status_code=404, detail="Ролевая модель не найдена")
-        
-        # Получаем профиль
-        result = await db.execute(select(RoleProfile).where(
-            RoleProfile.id == profile_id,
-            RoleProfile.role_model_id == role_model_id
-        ))
-        profile = result.scalar_one_or_none()
-        
-        if not profile:
-            raise HTTPException(status_code=404, detail="Профиль не найден")
-        
-        # Конвертируем в обычные объекты для Jinja2
-        role_model_data = {
-            "id": role_model.id,
-            "name": role_model.name,
-            "description": role_model.description,
-            "created_at": role_model.created_at,
-            "updated_at": role_model.updated_at
-        }
-        
-        profile_data = {
-            "id": profile.id,
-            "name": profile.name,
-            "description": profile.description,
-            "criteria": profile.criteria,
-            "created_at": profile.created_at,
-            "updated_at": profile.updated_at
-        }
-        
-        # TODO: Получить список сотрудников, соответствующих критериям профиля
-        # TODO: Реализовать фильтрацию по критериям
-        employees = []  # Заглушка
-        
-        logger.success(f"Загружены сотрудники для профиля: {profile.name}")
-        
-        return templates.TemplateResponse("profiles/employees.html", {
-            "request": request,
-            "role_model": role_model_data,
-            "profile": profile_data,
-            "employees": employees,
-            "page_title": f"Сотрудники профиля: {profile.name}"
-        })
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Ошибка загрузки сотрудников профиля {profile_id}: {e}")
-        raise HTTPException(status_code=500, detail="Ошибка загрузки данных")
\ No newline at end of file
+    role_model, profile = await _get_model_profile(role_model_id, profile_id, db)
+
+    role_model_data = {
+        "id": role_model.id,
+        "name": role_model.name,
+        "description": role_model.description,
+        "created_at": role_model.created_at,
+        "updated_at": role_model.updated_at
+    }
+
+    profile_data = {
+        "id": profile.id,
+        "name": profile.name,
+        "description": profile.description,
+        "criteria": profile.criteria,
+        "created_at": profile.created_at,
+        "updated_at": profile.updated_at
+    }
+
+    return templates.TemplateResponse(request, "profiles/employees.html", {
+        "role_model": role_model_data,
+        "profile": profile_data,
+        "page_title": f"Сотрудники профиля: {profile.name}"
+    })
+
+
+@router.get("/{role_model_id}/profiles/{profile_id}/employees/rows", response_class=HTMLResponse)
+async def view_profile_employee_rows(
+    role_model_id: int,
+    profile_id: int,
+    request: Request,
+    page: int = Query(1, ge=1, description="Номер страницы"),
+    size: int = Query(50, ge=1, le=100, description="Размер страницы"),
+    search: Optional[str] = Query(None, description="Поиск по ФИО, email или табельному номеру"),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Фрагмент со страницей сотрудников профиля
+
+    Выбирается на одну строку больше страницы - так известно, есть ли
+    следующая, без подсчета всех подходящих сотрудников.
+    """
+    _, profile = await _get_model_profile(role_model_id, profile_id, db)
+
+    employees = []
+    query = matching_employees_query(profile.criteria, search)
+    if query is not None:
+        result = await db.execute(query.offset((page - 1) * size).limit(size + 1))
+        employees = [dict(row._mapping) for row in result]
+
+    return templates.TemplateResponse(request, "profiles/employee_rows.html", {
+        "employees": employees[:size],
+        "has_more": len(employees) > size,
+        "page": page,
+        "search": search,
+    })
@@ -0,0 +1,356 @@
+"""
+Бенчмарк горячих путей API
+==========================
+
+Заполняет отдельную БД синтетическими данными заданного масштаба
+(scripts/generate_synthetic.py), поднимает приложение в том же процессе и
+гоняет запросы через ASGI-клиент httpx - без сети и uvicorn, так что замеры
+отражают только код приложения и БД.
+
+По каждому сценарию считаются p50/p95 времени ответа, время в БД и число
+SQL-запросов (из заголовка Server-Timing, см. app/core/metrics.py).
+
+Примеры (из папки backend):
+    # Замер и сохранение результата
+    python scripts/benchmark.py run --employees 20000 --output benchmarks/current.json
+
+    # Повторный замер на уже заполненной БД
+    python scripts/benchmark.py run --reuse-db --output benchmarks/current.json
+
+    # Сравнение с сохраненным эталоном (код возврата 1 при регрессии)
+    python scripts/benchmark.py compare benchmarks/current.json benchmarks/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+# Добавляем путь к модулям приложения
+sys.path.append(str(BACKEND_DIR))
+
+DEFAULT_DB_PATH = BACKEND_DIR / "data" / "benchmark.db"
+
+# Регрессия - p95 вырос больше чем на threshold и больше чем на шум в мс
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+NOISE_FLOOR_MS = 2.0
+
+_SERVER_TIMING_DB = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries"')
+
+
+@dataclass
+class Scenario:
+    """Сценарий бенчмарка: запрос строится по номеру итерации"""
+    name: str
+    build: Callable[[int], Tuple[str, str, Optional[Dict[str, Any]]]]
+
+
+@dataclass
+class Fixtures:
+    """ID из тестовой БД, на которые ссылаются сценарии"""
+    role_model_id: int
+    profile_ids: List[int]
+    employee_profile_ids: List[int]
+    bulk_batches: List[Tuple[List[int], List[int]]]
+
+
+# ===== ПОДГОТОВКА БД =====
+
+async def prepare_database(args) -> Dict[str, int]:
+    """Создать и заполнить БД бенчмарка (или переиспользовать существующую)"""
+    from app.utils import logger
+    from scripts.generate_synthetic import generate_synthetic_dataset
+
+    if args.reuse_db and args.db.exists():
+        logger.info(f"Используем существующую БД {args.db}")
+        return {}
+
+    if args.db.exists():
+        args.db.unlink()
+    args.db.parent.mkdir(parents=True, exist_ok=True)
+
+    started = time.perf_counter()
+    stats = await generate_synthetic_dataset(
+        employees=args.employees, systems=args.systems, density=args.density, seed=args.seed
+    )
+    logger.success(f"БД бенчмарка заполнена за {time.perf_counter() - started:.1f} с")
+    return stats
+
+
+async def load_fixtures(iterations: int, bulk_employees: int, bulk_accesses: int) -> Fixtures:
+    """Выбрать сущности для сценариев; для массовых операций - пары, которых еще нет в БД"""
+    from sqlalchemy import text
+    from app.core.database import engine
+
+    async with engine.connect() as conn:
+        role_model_id = (await conn.execute(text("SELECT MIN(id) FROM role_models"))).scalar()
+        profile_ids = (await conn.execute(
+            text("SELECT id FROM role_profiles WHERE role_model_id = :rm ORDER BY id"), {"rm": role_model_id}
+        )).scalars().all()
+        employee_profile_ids = (await conn.execute(text("SELECT id FROM employee_profiles ORDER BY id"))).scalars().all()
+        employee_ids = (await conn.execute(
+            text("SELECT id FROM employees ORDER BY id LIMIT :n"), {"n": iterations * bulk_employees}
+        )).scalars().all()
+
+        bulk_batches = []
+        for i in range(iterations):
+            batch = employee_ids[i * bulk_employees:(i + 1) * bulk_employees]
+            if not batch:
+                break
+            placeholders = ", ".join(str(int(emp_id)) for emp_id in batch)
+            access_ids = (await conn.execute(text(
+                f"SELECT id FROM accesses WHERE id NOT IN ("
+                f"SELECT access_id FROM employee_accesses WHERE employee_id IN ({placeholders})"
+                f") ORDER BY id LIMIT :n"
+            ), {"n": bulk_accesses})).scalars().all()
+            bulk_batches.append((list(batch), list(access_ids)))
+
+    if role_model_id is None or not profile_ids:
+        raise RuntimeError("В БД нет ролевых моделей с профилями - заполните её заново без --reuse-db")
+
+    return Fixtures(
+        role_model_id=role_model_id,
+        profile_ids=list(profile_ids),
+        employee_profile_ids=list(employee_profile_ids),
+        bulk_batches=bulk_batches,
+    )
+
+
+# ===== СЦЕНАРИИ =====
+
+def build_scenarios(fx: Fixtures) -> List[Scenario]:
+    """Горячие пути API и HTML-представлений"""
+
+    def pick(items: List[int], i: int) -> int:
+        return items[i % len(items)]
+
+    def bulk_payload(i: int) -> Dict[str, Any]:
+        employee_ids, access_ids = fx.bulk_batches[i % len(fx.bulk_batches)]
+        return {"employee_ids": employee_ids, "access_ids": access_ids}
+
+    return [
+        Scenario("employees_list", lambda i: ("GET", f"/api/v1/employees/?page={1 + i % 10}&size=50", None)),
+        Scenario("employees_search", lambda i: ("GET", "/api/v1/employees/?search=ов&size=50", None)),
+        Scenario("employees_filter", lambda i: ("POST", "/api/v1/employees/filter?size=50", {
+            "profile_ids": [pick(fx.employee_profile_ids, i + k) for k in range(3)],
+            "experience_years_min": 2,
+        })),
+        Scenario("profile_match_count", lambda i: (
+            "GET", f"/api/v1/role-models/profiles/{pick(fx.profile_ids, i)}/employees/count", None
+        )),
+        Scenario("role_model_stats", lambda i: ("GET", f"/api/v1/role-models/{fx.role_model_id}/stats", None)),
+        Scenario("assignments_export", lambda i: ("GET", f"/api/v1/access/assignments/?page={1 + i}&size=100", None)),
+        # Назначение и отзыв идут парами по одним и тем же (новым) парам сотрудник-доступ,
+        # поэтому после прогона данные в БД не меняются
+        Scenario("bulk_assign", lambda i: ("POST", "/api/v1/access/assignments/bulk", {
+            **bulk_payload(i), "assignment_type": "manual_request",
+        })),
+        Scenario("bulk_revoke", lambda i: ("POST", "/api/v1/access/assignments/bulk-revoke", {
+            **bulk_payload(i), "reason": "benchmark",
+        })),
+        Scenario("role_models_html", lambda i: ("GET", "/role-models/", None)),
+    ]
+
+
+def _percentile(values: List[float], q: float) -> Optional[float]:
+    return round(float(np.percentile(values, q)), 2) if values else None
+
+
+async def run_scenarios(scenarios: List[Scenario], iterations: int, warmup: int) -> Dict[str, Dict[str, Any]]:
+    """Прогнать сценарии и собрать статистику по каждому"""
+    import httpx
+    from app.main import app
+    from app.utils import logger
+
+    results: Dict[str, Dict[str, Any]] = {}
+    # Исключения обработчиков считаем ответом 500, а не падением бенчмарка
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        # Пары назначение/отзыв выполняются по очереди в каждой итерации
+        paired = {"bulk_assign": "bulk_revoke"}
+        ordered = [s for s in scenarios if s.name not in paired.values()]
+        by_name = {s.name: s for s in scenarios}
+
+        for scenario in ordered:
+            group = [scenario] + ([by_name[paired[scenario.name]]] if scenario.name in paired else [])
+            samples = {s.name: {"latency": [], "db": [], "queries": [], "statuses": {}} for s in group}
+
+            for i in range(-warmup, iterations):
+                for s in group:
+                    method, url, body = s.build(max(i, 0))
+                    started = time.perf_counter()
+                    response = await client.request(method, url, json=body)
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    if i < 0:
+                        continue
+
+                    sample = samples[s.name]
+                    sample["latency"].append(elapsed_ms)
+                    sample["statuses"][str(response.status_code)] = sample["statuses"].get(str(response.status_code), 0) + 1
+                    match = _SERVER_TIMING_DB.search(response.headers.get("server-timing", ""))
+                    if match:
+                        sample["db"].append(float(match.group(1)))
+                        sample["queries"].append(int(match.group(2)))
+
+            for s in group:
+                sample = samples[s.name]
+                method, url, _ = s.build(0)
+                errors = sum(count for status, count in sample["statuses"].items() if int(status) >= 400)
+                results[s.name] = {
+                    "method": method,
+                    "path": url.split("?")[0],
+                    "iterations": len(sample["latency"]),
+                    "errors": errors,
+                    "status_codes": sample["statuses"],
+                    "p50_ms": _percentile(sample["latency"], 50),
+                    "p95_ms": _percentile(sample["latency"], 95),
+                    "mean_ms": round(float(np.mean(sample["latency"])), 2),
+                    "db_p50_ms": _percentile(sample["db"], 50),
+                    "queries": int(np.median(sample["queries"])) if sample["queries"] else None,
+                }
+                status = "❌" if errors else "✅"
+                logger.info(
+                    f"{status} {s.name}: p50={results[s.name]['p50_ms']} мс, p95={results[s.name]['p95_ms']} мс, "
+                    f"SQL={results[s.name]['queries']}, ошибок={errors}"
+                )
+    return results
+
+
+async def run_benchmark(args) -> Dict[str, Any]:
+    """Подготовить БД, прогнать сценарии, вернуть отчет"""
+    from app.utils import logger
+
+    logger.section(f"БЕНЧМАРК API ({args.db})")
+    dataset = await prepare_database(args)
+
+    fixtures = await load_fixtures(args.iterations + args.warmup, args.bulk_employees, args.bulk_accesses)
+    scenarios = build_scenarios(fixtures)
+    if args.only:
+        scenarios = [s for s in scenarios if s.name in args.only]
+
+    results = await run_scenarios(scenarios, args.iterations, args.warmup)
+
+    from app.core.database import engine
+    await engine.dispose()
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "warmup": args.warmup,
+            "dataset": {
+                "employees": args.employees, "systems": args.systems,
+                "density": args.density, "seed": args.seed, "reused": not dataset,
+            },
+        },
+        "results": results,
+    }
+
+
+# ===== СРАВНЕНИЕ С ЭТАЛОНОМ =====
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Сравнить два отчета, вернуть список регрессий"""
+    regressions = []
+    rows = []
+    for name, base in baseline["results"].items():
+        cur = current["results"].get(name)
+        if cur is None:
+            rows.append(f"{name:<22} {'-':>10} {'-':>10} {'':>8}  нет в текущем прогоне")
+            continue
+
+        notes = []
+        base_p95, cur_p95 = base.get("p95_ms"), cur.get("p95_ms")
+        change = (cur_p95 - base_p95) / base_p95 if base_p95 else 0.0
+        if base_p95 and change > threshold and cur_p95 - base_p95 > NOISE_FLOOR_MS:
+            notes.append(f"p95 +{change:.0%}")
+        if base.get("queries") is not None and cur.get("queries") is not None and cur["queries"] > base["queries"]:
+            notes.append(f"SQL {base['queries']} → {cur['queries']}")
+        if cur.get("errors", 0) > base.get("errors", 0):
+            notes.append(f"ошибок {base.get('errors', 0)} → {cur['errors']}")
+
+        if notes:
+            regressions.append(f"{name}: {', '.join(notes)}")
+        rows.append(
+            f"{name:<22} {base_p95!s:>10} {cur_p95!s:>10} {change:>+8.0%}  "
+            f"{'❌ ' + ', '.join(notes) if notes else '✅'}"
+        )
+
+    print(f"{'Сценарий':<22} {'p95 эталон':>10} {'p95 сейчас':>10} {'Δ':>8}")
+    print("\n".join(rows))
+    return regressions
+
+
+def _load_report(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Бенчмарк горячих путей API")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Выполнить замеры")
+    run_parser.add_argument("--db", type=Path, default=DEFAULT_DB_PATH, help="Файл SQLite для бенчмарка")
+    run_parser.add_argument("--reuse-db", action="store_true", help="Не пересоздавать БД, если файл уже есть")
+    run_parser.add_argument("--employees", type=int, default=5_000, help="Количество сотрудников")
+    run_parser.add_argument("--systems", type=int, default=100, help="Количество систем")
+    run_parser.add_argument("--density", type=float, default=0.04, help="Средняя доля доступов на сотрудника")
+    run_parser.add_argument("--seed", type=int, default=42, help="Seed генератора данных")
+    run_parser.add_argument("--iterations", type=int, default=20, help="Замеров на сценарий")
+    run_parser.add_argument("--warmup", type=int, default=2, help="Прогревочных запросов на сценарий")
+    run_parser.add_argument("--bulk-employees", type=int, default=20, help="Сотрудников в массовой операции")
+    run_parser.add_argument("--bulk-accesses", type=int, default=5, help="Доступов в массовой операции")
+    run_parser.add_argument("--only", nargs="+", metavar="SCENARIO", help="Выполнить только указанные сценарии")
+    run_parser.add_argument("--output", help="Файл для JSON-отчета (по умолчанию - stdout)")
+    run_parser.add_argument("--verbose", action="store_true", help="Подробный вывод")
+
+    compare_parser = subparsers.add_parser("compare", help="Сравнить отчет с эталоном")
+    compare_parser.add_argument("current", help="Текущий отчет")
+    compare_parser.add_argument("baseline", help="Эталонный отчет")
+    compare_parser.add_argument(
+        "--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+        help="Допустимый рост p95 (0.2 = 20%%)"
+    )
+
+    args = parser.parse_args()
+
+    if args.command == "compare":
+        found = compare_reports(_load_report(args.current), _load_report(args.baseline), args.threshold)
+        if found:
+            print("\nРегрессии:\n  " + "\n  ".join(found))
+            sys.exit(1)
+        print("\nРегрессий нет")
+        sys.exit(0)
+
+    # Настройки приложения читаются при импорте - задаем их до импорта app.*
+    args.db = args.db.resolve()
+    os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{args.db}"
+    os.environ["METRICS_ENABLED"] = "true"
+    os.environ["METRICS_QUERY_WARNING_THRESHOLD"] = "0"
+    os.chdir(BACKEND_DIR)  # шаблоны и статика подключаются по относительным путям
+
+    from app.utils import set_verbose
+    set_verbose(args.verbose)
+
+    report = asyncio.run(run_benchmark(args))
+    payload = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        Path(args.output).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.output).write_text(payload + "\n", encoding="utf-8")
+        print(f"Отчет сохранен: {args.output}")
+    else:
+        print(payload)
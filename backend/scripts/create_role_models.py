@@ -2,12 +2,15 @@
 Создание базовых ролевых моделей для начального обучения
 """
 import asyncio
+from typing import Optional
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.utils import logger
-from app.core.database import AsyncSessionLocal
-from app.models import RoleModel, RoleProfile, ProfileAccess
+from app.core.database import bulk_insert, session_scope
+from app.models import RoleModel, RoleProfile, ProfileAccess, Access, ApplicationSystem
 
 
-async def create_base_role_models():
+async def create_base_role_models(session: Optional[AsyncSession] = None):
     """Создание базовых ролевых моделей"""
     logger.info("🎯 Создаём базовые ролевые модели...")
     
@@ -139,100 +142,98 @@ async def create_base_role_models():
         }
     ]
     
-    async with AsyncSessionLocal() as session:
+    async with session_scope(session) as session:
         role_model_id = 1
         profile_id = 1
         profile_access_id = 1
+        role_model_rows = []
+        profile_rows = []
+        profile_access_rows = []
         
         for rm_data in role_models_data:
             # Создаем ролевую модель
-            role_model = RoleModel(
-                id=role_model_id,
-                name=rm_data["name"],
-                description=rm_data["description"],
-                author=rm_data["author"],
-                version="1.0",
-                is_active=True
-            )
-            session.add(role_model)
+            role_model_rows.append({
+                "id": role_model_id,
+                "name": rm_data["name"],
+                "description": rm_data["description"],
+                "author": rm_data["author"],
+                "version": "1.0",
+                "is_active": True,
+            })
             
-            logger.info("📋 Создана ролевая модель: {rm_data['name']}")
+            logger.info(f"📋 Создана ролевая модель: {rm_data['name']}")
             
             # Создаем профили для модели
             for profile_data in rm_data["profiles"]:
-                role_profile = RoleProfile(
-                    id=profile_id,
-                    role_model_id=role_model_id,
-                    name=profile_data["name"],
-                    criteria=profile_data["criteria"],
-                    description=f"Профиль для {profile_data['name']}"
-                )
-                session.add(role_profile)
+                profile_rows.append({
+                    "id": profile_id,
+                    "role_model_id": role_model_id,
+                    "name": profile_data["name"],
+                    "criteria": profile_data["criteria"],
+                    "description": f"Профиль для {profile_data['name']}",
+                })
                 
-                logger.info("  👤 Профиль: {profile_data['name']} ({len(profile_data['accesses'])} доступов)")
+                logger.info(f"  👤 Профиль: {profile_data['name']} ({len(profile_data['accesses'])} доступов)")
                 
                 # Создаем доступы для профиля
                 for access_data in profile_data["accesses"]:
                     for role_name in access_data["roles"]:
                         # Найдем access_id по системе и роли
                         # Пока создадим заглушки, потом обновим правильными ID
-                        profile_access = ProfileAccess(
-                            id=profile_access_id,
-                            role_profile_id=profile_id,
-                            access_id=1,  # Заглушка, обновим позже
-                            system_name=access_data["system_name"],
-                            role_name=role_name
-                        )
-                        session.add(profile_access)
+                        profile_access_rows.append({
+                            "id": profile_access_id,
+                            "role_profile_id": profile_id,
+                            "access_id": 1,  # Заглушка, обновим позже
+                            "system_name": access_data["system_name"],
+                            "role_name": role_name,
+                        })
                         profile_access_id += 1
                 
                 profile_id += 1
             
             role_model_id += 1
         
-        await session.commit()
+        await bulk_insert(session, RoleModel, role_model_rows)
+        await bulk_insert(session, RoleProfile, profile_rows)
+        await bulk_insert(session, ProfileAccess, profile_access_rows)
         
-        logger.info("\n🎉 Создано {len(role_models_data)} ролевых моделей!")
-        logger.info("📊 Всего профилей: {profile_id - 1}")
-        logger.info("🔑 Всего связей доступов: {profile_access_id - 1}")
+        logger.info(f"\n🎉 Создано {len(role_models_data)} ролевых моделей!")
+        logger.info(f"📊 Всего профилей: {profile_id - 1}")
+        logger.info(f"🔑 Всего связей доступов: {profile_access_id - 1}")
 
 
-async def update_profile_access_ids():
+async def update_profile_access_ids(session: Optional[AsyncSession] = None):
     """Обновляем правильные access_id в ProfileAccess"""
     logger.info("🔄 Обновляем ID доступов в профилях...")
     
-    async with AsyncSessionLocal() as session:
-        # Получаем все ProfileAccess с заглушками
-        from sqlalchemy import select, update
-        from app.models import Access, ApplicationSystem
-        
-        # Получаем все ProfileAccess
-        profile_accesses_result = await session.execute(
-            select(ProfileAccess).where(ProfileAccess.access_id == 1)
+    async with session_scope(session) as session:
+        # Доступ по имени системы и роли - коррелированный подзапрос,
+        # чтобы обновить все заглушки одним UPDATE вместо запроса на строку
+        access_match = (
+            select(Access.id)
+            .join(ApplicationSystem)
+            .where(
+                ApplicationSystem.name == ProfileAccess.system_name,
+                Access.role_name == ProfileAccess.role_name
+            )
+            .limit(1)
+            .scalar_subquery()
         )
-        profile_accesses = profile_accesses_result.scalars().all()
         
-        updated_count = 0
-        for pa in profile_accesses:
-            # Найдем правильный access_id
-            access_result = await session.execute(
-                select(Access.id)
-                .join(ApplicationSystem)
-                .where(
-                    ApplicationSystem.name == pa.system_name,
-                    Access.role_name == pa.role_name
-                )
-            )
-            access_id = access_result.scalar_one_or_none()
-            
-            if access_id:
-                pa.access_id = access_id
-                updated_count += 1
-            else:
-                logger.info("⚠️  Не найден доступ: {pa.system_name} - {pa.role_name}")
+        missing_result = await session.execute(
+            select(ProfileAccess.system_name, ProfileAccess.role_name)
+            .where(ProfileAccess.access_id == 1, access_match.is_(None))
+        )
+        for system_name, role_name in missing_result.all():
+            logger.info(f"⚠️  Не найден доступ: {system_name} - {role_name}")
         
-        await session.commit()
-        logger.info("✅ Обновлено {updated_count} связей доступов")
+        result = await session.execute(
+            update(ProfileAccess)
+            .where(ProfileAccess.access_id == 1, access_match.is_not(None))
+            .values(access_id=access_match)
+            .execution_options(synchronize_session=False)
+        )
+        logger.info(f"✅ Обновлено {result.rowcount} связей доступов")
 
 
 async def main():
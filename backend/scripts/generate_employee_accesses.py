@@ -3,17 +3,19 @@
 """
 import asyncio
 import random
+from typing import Optional
 from sqlalchemy import text
-from app.core.database import AsyncSessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.database import AsyncSessionLocal, bulk_insert, session_scope
 from app.models import Employee, Access, EmployeeAccess, RoleProfile, ProfileAccess
 from app.utils import logger
 
 
-async def generate_employee_accesses():
+async def generate_employee_accesses(session: Optional[AsyncSession] = None):
     """Генерация доступов для всех сотрудников"""
     logger.step("Генерация доступов", "Начинаем генерацию доступов сотрудников...")
     
-    async with AsyncSessionLocal() as session:
+    async with session_scope(session) as session:
         # Получаем всех сотрудников
         result = await session.execute(
             text("SELECT id, profile_id, org_unit_id, position_id, employee_type_id FROM employees")
@@ -50,9 +52,11 @@ async def generate_employee_accesses():
         
         # Базовые доступы для всех (универсальный профиль)
         universal_accesses = []
+        universal_profile_id = None
         for profile_id, profile_data in role_profiles_map.items():
             if 'all_employees' in profile_data['criteria']:
                 universal_accesses = profile_data['accesses']
+                universal_profile_id = profile_id
                 break
         
         logger.info(f"Базовых доступов для всех: {len(universal_accesses)}")
@@ -70,14 +74,14 @@ async def generate_employee_accesses():
                     'employee_id': emp_id,
                     'access_id': access_id,
                     'assignment_type': 'auto_role',
-                    'role_profile_id': 6  # ID универсального профиля
+                    'role_profile_id': universal_profile_id
                 })
                 employee_access_ids.add(access_id)
                 access_id_counter += 1
             
             # 2. ЛОГИЧНЫЕ ДОСТУПЫ ПО ПРОФИЛЮ СОТРУДНИКА
             for role_profile_id, profile_data in role_profiles_map.items():
-                if role_profile_id == 6:  # Пропускаем универсальный профиль
+                if role_profile_id == universal_profile_id:  # Пропускаем универсальный профиль
                     continue
                 
                 criteria = profile_data['criteria']
@@ -147,24 +151,11 @@ async def generate_employee_accesses():
         
         logger.info(f"Сгенерировано {len(employee_accesses)} доступов")
         
-        # Сохраняем пакетами по 1000
-        batch_size = 1000
+        # Сохраняем пакетами по 5000 (executemany с параметрами)
+        batch_size = 5000
         for i in range(0, len(employee_accesses), batch_size):
             batch = employee_accesses[i:i + batch_size]
-            
-            # Формируем SQL запрос для массовой вставки
-            values = []
-            for ea in batch:
-                role_profile_part = f", {ea['role_profile_id']}" if ea['role_profile_id'] else ", NULL"
-                values.append(f"({ea['id']}, {ea['employee_id']}, {ea['access_id']}, '{ea['assignment_type']}'{role_profile_part})")
-            
-            sql = f"""
-                INSERT INTO employee_accesses (id, employee_id, access_id, assignment_type, role_profile_id)
-                VALUES {', '.join(values)}
-            """
-            
-            await session.execute(text(sql))
-            await session.commit()
+            await bulk_insert(session, EmployeeAccess, batch)
             logger.progress(i + len(batch), len(employee_accesses), "Сохранено доступов")
     
     logger.success("Генерация доступов завершена!")
@@ -4,10 +4,11 @@
 import asyncio
 import random
 from datetime import date, timedelta
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.utils import logger
-from app.core.database import AsyncSessionLocal
+from app.core.database import bulk_insert, session_scope
 from app.models import (
     Employee, OrganizationalUnit, Position, EmployeeProfile, EmployeeType, 
     TeamRole, AgileTeam, Product
@@ -81,9 +82,9 @@ PROFILE_TO_TEAM_ROLES = {
 }
 
 
-async def get_reference_data():
+async def get_reference_data(session: Optional[AsyncSession] = None):
     """Получение справочных данных"""
-    async with AsyncSessionLocal() as session:
+    async with session_scope(session) as session:
         # Получаем все справочники
         org_units = await session.execute(select(OrganizationalUnit))
         positions = await session.execute(select(Position))
@@ -191,18 +192,18 @@ def get_experience_years(hire_date):
     return max(0, years)
 
 
-async def generate_employees():
+async def generate_employees(session: Optional[AsyncSession] = None):
     """Генерация сотрудников"""
     logger.info("🚀 Начинаем генерацию сотрудников...")
     
     # Получаем справочные данные
-    ref_data = await get_reference_data()
+    ref_data = await get_reference_data(session)
     
     # Получаем только управления (level=3) для размещения сотрудников
     directorates = {unit_id: unit for unit_id, unit in ref_data['org_units'].items() 
                    if unit.level == 3}
     
-    logger.info("📊 Найдено {len(directorates)} управлений для размещения сотрудников")
+    logger.info(f"📊 Найдено {len(directorates)} управлений для размещения сотрудников")
     
     employees_data = []
     total_employees = 2000
@@ -229,13 +230,13 @@ async def generate_employees():
             if employees_per_directorate[unit_id] > 20:  # Минимум 20 человек в управлении
                 employees_per_directorate[unit_id] -= 1
     
-    logger.info("📈 Планируем создать {sum(employees_per_directorate.values())} сотрудников")
+    logger.info(f"📈 Планируем создать {sum(employees_per_directorate.values())} сотрудников")
     
     employee_id = 1
     
     for unit_id, employee_count in employees_per_directorate.items():
         unit = directorates[unit_id]
-        logger.info("👥 Создаем {employee_count} сотрудников для '{unit.name}'")
+        logger.info(f"👥 Создаем {employee_count} сотрудников для '{unit.name}'")
         
         # Получаем департамент (родительский для управления)
         department = ref_data['org_units'][unit.parent_id]
@@ -306,19 +307,13 @@ async def generate_employees():
             employee_id += 1
     
     # Массовая вставка сотрудников
-    logger.info("💾 Сохраняем {len(employees_data)} сотрудников в базу данных...")
+    logger.info(f"💾 Сохраняем {len(employees_data)} сотрудников в базу данных...")
     
-    async with AsyncSessionLocal() as session:
-        batch_size = 100
+    async with session_scope(session) as session:
+        batch_size = 1000
         for i in range(0, len(employees_data), batch_size):
-            batch = employees_data[i:i + batch_size]
-            
-            for emp_data in batch:
-                employee = Employee(**emp_data)
-                session.add(employee)
-            
-            await session.commit()
-            logger.info("✅ Сохранено {min(i + batch_size, len(employees_data))}/{len(employees_data)} сотрудников")
+            await bulk_insert(session, Employee, employees_data[i:i + batch_size])
+            logger.info(f"✅ Сохранено {min(i + batch_size, len(employees_data))}/{len(employees_data)} сотрудников")
     
     logger.info("🎉 Генерация сотрудников завершена!")
     
@@ -327,10 +322,10 @@ async def generate_employees():
     non_agile_count = len(employees_data) - agile_count
     
     logger.info("📊 Статистика:")
-    logger.info("   - Всего сотрудников: {len(employees_data)}")
-    logger.info("   - В agile командах: {agile_count} ({agile_count/len(employees_data)*100:.1f}%)")
-    logger.info("   - Не в agile: {non_agile_count} ({non_agile_count/len(employees_data)*100:.1f}%)")
-    logger.info("   - Управлений с сотрудниками: {len(employees_per_directorate)}")
+    logger.info(f"   - Всего сотрудников: {len(employees_data)}")
+    logger.info(f"   - В agile командах: {agile_count} ({agile_count/len(employees_data)*100:.1f}%)")
+    logger.info(f"   - Не в agile: {non_agile_count} ({non_agile_count/len(employees_data)*100:.1f}%)")
+    logger.info(f"   - Управлений с сотрудниками: {len(employees_per_directorate)}")
 
 
 async def main():
@@ -0,0 +1,625 @@
+"""
+Быстрый детерминированный генератор синтетических данных для нагрузочных тестов
+=================================================================================
+
+В отличие от generate_employees.py / generate_employee_accesses.py данные
+строятся векторно на NumPy и загружаются пакетами через executemany, поэтому
+генератор масштабируется до 100k сотрудников и ~10M назначений за минуты.
+
+Данные коррелированы как в реальной компании:
+- профиль сотрудника определяет подразделения, роль в команде и "ядро" систем;
+- опыт определяет уровень должности и вероятность привилегированных ролей;
+- поверх ядра - популярные (по Ципфу) доступы и немного шума.
+
+Один и тот же --seed всегда дает одну и ту же БД.
+
+Пример (из папки backend, на пустой БД):
+    DATABASE_URL=sqlite+aiosqlite:///./data/bench.db \\
+        python scripts/generate_synthetic.py --employees 100000 --systems 500 --density 0.04
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import date
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Sequence, Tuple
+
+import numpy as np
+
+# Добавляем путь к модулям приложения
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy import text
+
+from app.core.database import engine, create_tables
+from app.utils import logger, set_verbose
+from scripts.generate_employees import (
+    FIRST_NAMES, LAST_NAMES, MIDDLE_NAMES_MALE, MIDDLE_NAMES_FEMALE,
+    PROFILE_TO_DEPARTMENTS, PROFILE_TO_TEAM_ROLES,
+)
+
+# Фиксированная "сегодняшняя" дата, чтобы результат не зависел от дня запуска
+REFERENCE_DATE = date(2025, 1, 1)
+
+INSERT_BATCH_SIZE = 50_000
+EMPLOYEE_CHUNK_SIZE = 2_000
+
+SYSTEM_NAME_BASES = [
+    "CRM", "ERP", "Портал", "Хранилище данных", "Биллинг", "Документооборот", "Склад",
+    "Казначейство", "GitLab", "Jira", "Мониторинг", "Kubernetes", "BI-отчетность",
+    "Кадровый учет", "Закупки", "Call-центр", "Антифрод", "DWH", "API Gateway", "SIEM",
+]
+
+# Роли упорядочены по возрастанию привилегий
+ROLE_POOL = [
+    ("Viewer", "low"), ("User", "low"), ("Reporter", "low"), ("Editor", "medium"),
+    ("Developer", "medium"), ("Operator", "medium"), ("Maintainer", "high"),
+    ("Auditor", "high"), ("Administrator", "critical"),
+]
+
+SENIORITY_PREFIXES = [
+    (("trainee", "junior"), 0), (("middle",), 1), (("senior",), 2),
+    (("lead", "principal", "главный"), 3),
+]
+
+# Фон (доступы вне ядра профиля): не меньше этой доли назначений и не выше этой вероятности на доступ
+MIN_BACKGROUND_SHARE = 0.02
+MAX_BACKGROUND_PROB = 0.5
+
+# Диапазоны опыта (лет) по уровню сеньорности профиля
+EXPERIENCE_BY_SENIORITY = [(0, 3), (2, 6), (4, 12), (7, 25)]
+
+_MALE_FIRST_NAMES = FIRST_NAMES[:FIRST_NAMES.index("Александра")]
+_FEMALE_FIRST_NAMES = FIRST_NAMES[FIRST_NAMES.index("Александра"):]
+
+
+async def generate_synthetic_dataset(
+    employees: int = 10_000,
+    systems: int = 100,
+    density: float = 0.04,
+    seed: int = 42,
+) -> Dict[str, int]:
+    """
+    Сгенерировать полный синтетический набор данных в текущую БД
+
+    density - средняя доля доступов, выданных одному сотруднику: в среднем
+    density x число доступов назначений на человека (около 4 ролей на
+    систему, 0.04 при 500 системах ~ 80).
+    """
+    rng = np.random.default_rng(seed)
+    stats: Dict[str, int] = {}
+
+    await create_tables()
+    async with engine.connect() as conn:
+        if (await conn.execute(text("SELECT COUNT(*) FROM employees"))).scalar():
+            raise RuntimeError("Таблица employees не пуста - сначала сбросьте БД (python reset.py)")
+
+    await _ensure_reference_data()
+
+    async with engine.begin() as conn:
+        await _prepare_bulk_load(conn)
+        ref = await _load_reference_data(conn)
+
+        started = time.perf_counter()
+        access_meta = await _generate_systems(conn, rng, systems)
+        stats["systems"] = systems
+        stats["accesses"] = len(access_meta["id"])
+        logger.success(f"Системы: {systems}, доступы: {stats['accesses']} ({time.perf_counter() - started:.1f} с)")
+
+        started = time.perf_counter()
+        model = _build_access_model(rng, ref, access_meta, systems, density)
+        role_profile_ids = await _generate_role_model(conn, ref, access_meta, model, seed)
+        logger.success(f"Ролевая модель: {len(role_profile_ids)} профилей ({time.perf_counter() - started:.1f} с)")
+
+        started = time.perf_counter()
+        employee_profiles = await _generate_employees(conn, rng, ref, model, employees)
+        stats["employees"] = employees
+        logger.success(f"Сотрудники: {employees} ({time.perf_counter() - started:.1f} с)")
+
+        started = time.perf_counter()
+        stats["employee_accesses"] = await _generate_employee_accesses(
+            conn, rng, access_meta, model, employee_profiles, role_profile_ids
+        )
+        logger.success(
+            f"Назначения доступов: {stats['employee_accesses']} ({time.perf_counter() - started:.1f} с)"
+        )
+
+        started = time.perf_counter()
+        await conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_employee_accesses_employee_access "
+            "ON employee_accesses (employee_id, access_id)"
+        ))
+        logger.info(f"Индексы перестроены за {time.perf_counter() - started:.1f} с")
+
+    return stats
+
+
+# ===== СПРАВОЧНИКИ =====
+
+async def _ensure_reference_data():
+    """Заполнить справочники и оргструктуру, если БД пустая"""
+    async with engine.connect() as conn:
+        has_positions = (await conn.execute(text("SELECT COUNT(*) FROM positions"))).scalar()
+    if has_positions:
+        return
+
+    from scripts.populate_data import (
+        populate_positions, populate_employee_types, populate_team_roles,
+        populate_employee_profiles, populate_organizational_structure,
+        populate_agile_structure
+    )
+    await populate_positions()
+    await populate_employee_types()
+    await populate_team_roles()
+    await populate_employee_profiles()
+    await populate_organizational_structure()
+    await populate_agile_structure()
+    logger.success("Справочники и оргструктура созданы")
+
+
+async def _load_reference_data(conn) -> Dict[str, Any]:
+    """Прочитать справочники в NumPy-массивы, упорядоченные по id"""
+    async def rows(sql: str) -> List[Tuple]:
+        return (await conn.execute(text(sql))).fetchall()
+
+    profiles = await rows("SELECT id, name FROM employee_profiles ORDER BY id")
+    positions = await rows("SELECT id, hierarchy_level FROM positions ORDER BY id")
+    directorates = await rows("SELECT id, parent_id FROM organizational_units WHERE level = 3 ORDER BY id")
+    team_roles = await rows("SELECT id, name FROM team_roles ORDER BY id")
+    agile_teams = await rows("SELECT id FROM agile_teams ORDER BY id")
+    employee_types = await rows("SELECT id FROM employee_types ORDER BY id")
+
+    return {
+        "profile_ids": np.array([r[0] for r in profiles]),
+        "profile_names": [r[1] for r in profiles],
+        "position_ids": np.array([r[0] for r in positions]),
+        "position_levels": np.array([r[1] for r in positions]),
+        "directorate_ids": np.array([r[0] for r in directorates]),
+        "directorate_parents": np.array([r[1] for r in directorates]),
+        "team_role_ids": {r[1]: r[0] for r in team_roles},
+        "agile_team_ids": np.array([r[0] for r in agile_teams]),
+        "employee_type_ids": np.array([r[0] for r in employee_types]),
+    }
+
+
+# ===== СИСТЕМЫ И ДОСТУПЫ =====
+
+async def _generate_systems(conn, rng: np.random.Generator, n_systems: int) -> Dict[str, np.ndarray]:
+    """Сгенерировать системы и роли в них; вернуть метаданные доступов"""
+    system_rows = []
+    access_rows = []
+    access_system = []
+    access_tier = []
+
+    criticalities = np.array(["low", "medium", "high", "critical"])
+    system_crit = rng.choice(criticalities, size=n_systems, p=[0.3, 0.4, 0.2, 0.1])
+    system_type = np.where(rng.random(n_systems) < 0.55, "it", "business")
+    roles_per_system = rng.integers(2, 8, size=n_systems)
+
+    access_id = 1
+    for i in range(n_systems):
+        system_id = i + 1
+        base = SYSTEM_NAME_BASES[i % len(SYSTEM_NAME_BASES)]
+        system_rows.append((system_id, f"{base} {system_id:03d}", str(system_crit[i]), str(system_type[i])))
+
+        # "User" есть в каждой системе, остальные роли - случайное подмножество пула
+        extra = rng.choice(np.arange(len(ROLE_POOL)), size=roles_per_system[i] - 1, replace=False)
+        tiers = sorted({1, *extra.tolist()})
+        for tier in tiers:
+            role_name, criticality = ROLE_POOL[tier]
+            access_rows.append((access_id, system_id, role_name, criticality))
+            access_system.append(i)
+            access_tier.append(tier)
+            access_id += 1
+
+    await _bulk_insert(conn, "application_systems", ["id", "name", "criticality", "system_type"], system_rows)
+    await _bulk_insert(conn, "accesses", ["id", "system_id", "role_name", "criticality"], access_rows)
+
+    return {
+        "id": np.array([r[0] for r in access_rows]),
+        "system": np.array(access_system),
+        "tier": np.array(access_tier),
+        "system_names": [r[1] for r in system_rows],
+        "role_names": [r[2] for r in access_rows],
+    }
+
+
+def _profile_family(name: str) -> str:
+    """Семейство профиля ('разработчик', 'аналитик', ...) по названию"""
+    lowered = name.lower()
+    for family in PROFILE_TO_DEPARTMENTS:
+        if family in lowered:
+            return family
+    return lowered
+
+
+def _profile_seniority(name: str) -> int:
+    lowered = name.lower()
+    for prefixes, level in SENIORITY_PREFIXES:
+        if lowered.startswith(prefixes):
+            return level
+    return 1
+
+
+def _fill_background(weights: np.ndarray, amount: float) -> np.ndarray:
+    """
+    Вероятности фона, пропорциональные weights, с суммой amount
+
+    Вероятность одного доступа не выше MAX_BACKGROUND_PROB: срезанный избыток
+    перераспределяется по остальным (если места не хватает, сумма меньше amount).
+    """
+    probs = np.zeros(len(weights), dtype=np.float64)
+    capped = np.zeros(len(weights), dtype=bool)
+    while amount > 1e-9:
+        open_weights = np.where(capped, 0.0, weights)
+        total = open_weights.sum()
+        if total <= 0:
+            break
+        probs = np.where(capped, probs, open_weights * (amount / total))
+        over = ~capped & (probs > MAX_BACKGROUND_PROB)
+        if not over.any():
+            break
+        capped |= over
+        probs[capped] = MAX_BACKGROUND_PROB
+        amount -= MAX_BACKGROUND_PROB * over.sum()
+    return probs
+
+
+def _build_access_model(
+    rng: np.random.Generator,
+    ref: Dict[str, Any],
+    access_meta: Dict[str, np.ndarray],
+    n_systems: int,
+    density: float,
+) -> Dict[str, Any]:
+    """
+    Построить матрицу вероятностей (профиль x доступ)
+
+    Ядро семейства - 6-14 систем с высокой вероятностью получения ролей,
+    привилегированные роли вероятнее у сеньорных профилей. Фоновые
+    вероятности распределены по Ципфу. Сумма строки - ожидаемое число
+    назначений сотрудника профиля - равна density x число доступов: фон
+    добирает недостающее, а слишком большое ядро урезается.
+    """
+    n_profiles = len(ref["profile_ids"])
+    n_access = len(access_meta["id"])
+    tiers = access_meta["tier"]
+    max_tier = len(ROLE_POOL) - 1
+
+    families = [_profile_family(n) for n in ref["profile_names"]]
+    seniority = np.array([_profile_seniority(n) for n in ref["profile_names"]])
+
+    family_core: Dict[str, np.ndarray] = {}
+    for family in dict.fromkeys(families):
+        size = min(int(rng.integers(6, 15)), n_systems)
+        family_core[family] = rng.choice(n_systems, size=size, replace=False)
+
+    # Базовые системы для всех сотрудников (почта, портал, AD...)
+    universal_systems = np.arange(min(5, n_systems))
+
+    probs = np.zeros((n_profiles, n_access), dtype=np.float32)
+    core_mask = np.zeros((n_profiles, n_access), dtype=bool)
+    privilege = tiers / max_tier
+    for p, family in enumerate(families):
+        in_core = np.isin(access_meta["system"], family_core[family])
+        core_mask[p] = in_core
+        # Младшим - в основном чтение/пользование, старшим - и администрирование
+        base = rng.uniform(0.55, 0.95, size=n_access)
+        probs[p] = np.where(in_core, base * (1.0 - privilege * (0.9 - 0.2 * seniority[p])), 0.0)
+
+    universal = np.isin(access_meta["system"], universal_systems) & (tiers == 1)
+    probs[:, universal] = 0.97
+    core_mask[:, universal] = True
+
+    # Фон: популярность по Ципфу, масштабированная под целевую плотность
+    popularity = 1.0 / np.arange(1, n_access + 1) ** 0.8
+    popularity = popularity[rng.permutation(n_access)]
+    target = density * n_access
+    for p in range(n_profiles):
+        # Ядро больше цели (мало доступов или низкая плотность): оставляем самые
+        # вероятные роли ядра, остальные уходят в фон
+        trimmable = core_mask[p] & ~universal
+        budget = (1.0 - MIN_BACKGROUND_SHARE) * target - probs[p, universal].sum()
+        order = np.flatnonzero(trimmable)[np.argsort(-probs[p, trimmable], kind="stable")]
+        dropped = order[np.cumsum(probs[p, order]) > max(budget, 0.0)]
+        core_mask[p, dropped] = False
+        probs[p, dropped] = 0.0
+
+        free = ~core_mask[p]
+        probs[p, free] = _fill_background(popularity[free], max(target - probs[p].sum(), 0.0))
+        # Базовые системы одни больше цели - пропорционально уменьшаем всю строку
+        total = probs[p].sum()
+        if total > target:
+            probs[p] *= target / total
+
+    expected = probs.sum(axis=1).mean()
+    if expected < 0.95 * target:
+        logger.warning(
+            f"Плотность {density} недостижима при {n_access} доступах: "
+            f"в среднем {expected:.1f} назначений на сотрудника вместо {target:.1f}"
+        )
+
+    # Доля профиля среди сотрудников и "домашние" управления
+    profile_weights = rng.dirichlet(np.full(n_profiles, 2.0))
+    home_directorates = []
+    for family in families:
+        departments = PROFILE_TO_DEPARTMENTS.get(family, [])
+        home = np.flatnonzero(np.isin(ref["directorate_parents"], departments))
+        if len(home) == 0:
+            home = np.arange(len(ref["directorate_ids"]))
+        home_directorates.append(home)
+
+    return {
+        "probs": probs,
+        "core_mask": core_mask,
+        "families": families,
+        "seniority": seniority,
+        "profile_weights": profile_weights,
+        "home_directorates": home_directorates,
+    }
+
+
+async def _generate_role_model(
+    conn,
+    ref: Dict[str, Any],
+    access_meta: Dict[str, np.ndarray],
+    model: Dict[str, Any],
+    seed: int,
+) -> np.ndarray:
+    """Ролевая модель: по профилю роли на каждый профиль сотрудника"""
+    role_model_id = (await conn.execute(text("SELECT COALESCE(MAX(id), 0) + 1 FROM role_models"))).scalar()
+    first_profile_id = (await conn.execute(text("SELECT COALESCE(MAX(id), 0) + 1 FROM role_profiles"))).scalar()
+
+    await conn.execute(
+        text("""
+            INSERT INTO role_models (id, name, description, author, version, is_active)
+            VALUES (:id, :name, :description, 'Генератор', '1.0', 1)
+        """),
+        {
+            "id": role_model_id,
+            "name": f"Синтетическая ролевая модель (seed={seed})",
+            "description": "Сгенерирована scripts/generate_synthetic.py для нагрузочных тестов",
+        },
+    )
+
+    profile_rows = []
+    profile_access_rows = []
+    role_profile_ids = np.arange(first_profile_id, first_profile_id + len(ref["profile_ids"]))
+    for p, name in enumerate(ref["profile_names"]):
+        role_profile_id = int(role_profile_ids[p])
+        criteria = json.dumps({"employee_profiles": [name]}, ensure_ascii=False)
+        profile_rows.append((role_profile_id, role_model_id, name, f"Профиль для {name}", criteria))
+        for a in np.flatnonzero(model["core_mask"][p] & (model["probs"][p] >= 0.5)):
+            profile_access_rows.append((
+                role_profile_id,
+                int(access_meta["id"][a]),
+                access_meta["system_names"][access_meta["system"][a]],
+                access_meta["role_names"][a],
+            ))
+
+    await _bulk_insert(
+        conn, "role_profiles", ["id", "role_model_id", "name", "description", "criteria"], profile_rows
+    )
+    await _bulk_insert(
+        conn, "profile_accesses", ["role_profile_id", "access_id", "system_name", "role_name"], profile_access_rows
+    )
+    return role_profile_ids
+
+
+# ===== СОТРУДНИКИ =====
+
+async def _generate_employees(
+    conn,
+    rng: np.random.Generator,
+    ref: Dict[str, Any],
+    model: Dict[str, Any],
+    n_employees: int,
+) -> np.ndarray:
+    """Сгенерировать сотрудников; вернуть индекс профиля для каждого"""
+    n_profiles = len(ref["profile_ids"])
+    profile_idx = rng.choice(n_profiles, size=n_employees, p=model["profile_weights"])
+
+    # Подразделение - одно из "домашних" управлений профиля
+    directorate_idx = np.empty(n_employees, dtype=np.int64)
+    for p in range(n_profiles):
+        members = np.flatnonzero(profile_idx == p)
+        home = model["home_directorates"][p]
+        directorate_idx[members] = home[rng.integers(0, len(home), size=len(members))]
+    org_unit_ids = ref["directorate_ids"][directorate_idx]
+
+    # Опыт зависит от сеньорности профиля, должность - от опыта
+    bounds = np.array(EXPERIENCE_BY_SENIORITY)[model["seniority"][profile_idx]]
+    experience = rng.integers(bounds[:, 0], bounds[:, 1] + 1)
+    level = np.select(
+        [experience < 1, experience < 3, experience < 5, experience < 8, experience < 12],
+        [1, 2, 3, 4, rng.integers(4, 6, size=n_employees)],
+        default=rng.integers(5, 9, size=n_employees),
+    )
+    position_ids = np.empty(n_employees, dtype=np.int64)
+    for lvl in np.unique(level):
+        members = np.flatnonzero(level == lvl)
+        candidates = ref["position_ids"][ref["position_levels"] == lvl]
+        if len(candidates) == 0:
+            candidates = ref["position_ids"]
+        position_ids[members] = candidates[rng.integers(0, len(candidates), size=len(members))]
+
+    type_ids = ref["employee_type_ids"]
+    type_weights = np.array([90, 8, 2][:len(type_ids)], dtype=float)
+    employee_type_ids = rng.choice(type_ids, size=n_employees, p=type_weights / type_weights.sum())
+
+    # 93% сотрудников в agile-командах, роль в команде - по семейству профиля
+    in_agile = rng.random(n_employees) < 0.93
+    agile_team_ids = ref["agile_team_ids"][rng.integers(0, len(ref["agile_team_ids"]), size=n_employees)]
+    team_role_options = []
+    default_role = ref["team_role_ids"].get("Developer")
+    for family in model["families"]:
+        options = [ref["team_role_ids"][r] for r in PROFILE_TO_TEAM_ROLES.get(family, []) if r in ref["team_role_ids"]]
+        team_role_options.append(np.array(options or [default_role]))
+    team_role_ids = np.empty(n_employees, dtype=np.int64)
+    for p in range(n_profiles):
+        members = np.flatnonzero(profile_idx == p)
+        options = team_role_options[p]
+        team_role_ids[members] = options[rng.integers(0, len(options), size=len(members))]
+
+    # Даты найма не раньше начала карьеры; 3% уволенных
+    tenure_days = rng.integers(0, (experience + 1) * 365)
+    hire_dates = np.datetime64(REFERENCE_DATE) - tenure_days.astype("timedelta64[D]")
+    terminated = rng.random(n_employees) < 0.03
+
+    full_names = _generate_full_names(rng, n_employees)
+
+    def rows() -> Iterator[Tuple]:
+        hire_strings = hire_dates.astype(str)
+        termination = str(REFERENCE_DATE)
+        for i in range(n_employees):
+            yield (
+                i + 1,
+                f"EMP{i + 1:07d}",
+                full_names[i],
+                int(org_unit_ids[i]),
+                int(position_ids[i]),
+                int(ref["profile_ids"][profile_idx[i]]),
+                int(employee_type_ids[i]),
+                int(agile_team_ids[i]) if in_agile[i] else None,
+                int(team_role_ids[i]) if in_agile[i] else None,
+                int(experience[i]),
+                int(tenure_days[i] // 30),
+                "terminated" if terminated[i] else "active",
+                hire_strings[i],
+                termination if terminated[i] else None,
+            )
+
+    await _bulk_insert(
+        conn,
+        "employees",
+        [
+            "id", "employee_number", "full_name", "org_unit_id", "position_id", "profile_id",
+            "employee_type_id", "agile_team_id", "team_role_id", "experience_years",
+            "company_tenure_months", "status", "hire_date", "termination_date",
+        ],
+        rows(),
+    )
+    return profile_idx
+
+
+def _generate_full_names(rng: np.random.Generator, n: int) -> List[str]:
+    """ФИО с согласованием пола имени, отчества и фамилии"""
+    is_female = rng.random(n) < 0.45
+    male_first = rng.integers(0, len(_MALE_FIRST_NAMES), size=n)
+    female_first = rng.integers(0, len(_FEMALE_FIRST_NAMES), size=n)
+    last = rng.integers(0, len(LAST_NAMES), size=n)
+    male_middle = rng.integers(0, len(MIDDLE_NAMES_MALE), size=n)
+    female_middle = rng.integers(0, len(MIDDLE_NAMES_FEMALE), size=n)
+
+    names = []
+    for i in range(n):
+        last_name = LAST_NAMES[last[i]]
+        if is_female[i]:
+            if last_name.endswith(("ов", "ев", "ин", "ын")):
+                last_name += "а"
+            names.append(
+                f"{last_name} {_FEMALE_FIRST_NAMES[female_first[i]]} {MIDDLE_NAMES_FEMALE[female_middle[i]]}"
+            )
+        else:
+            names.append(
+                f"{last_name} {_MALE_FIRST_NAMES[male_first[i]]} {MIDDLE_NAMES_MALE[male_middle[i]]}"
+            )
+    return names
+
+
+# ===== НАЗНАЧЕНИЯ ДОСТУПОВ =====
+
+async def _generate_employee_accesses(
+    conn,
+    rng: np.random.Generator,
+    access_meta: Dict[str, np.ndarray],
+    model: Dict[str, Any],
+    profile_idx: np.ndarray,
+    role_profile_ids: np.ndarray,
+) -> int:
+    """
+    Семплировать назначения блоками сотрудников: Бернулли по матрице вероятностей
+
+    Доступы из ядра профиля, входящие в ролевую модель, назначаются как
+    auto_role с role_profile_id соответствующего профиля роли, остальные -
+    как manual_request.
+    """
+    probs = model["probs"]
+    in_role_model = model["core_mask"] & (probs >= 0.5)
+    access_ids = access_meta["id"]
+    n_employees = len(profile_idx)
+    total = 0
+
+    def rows() -> Iterator[Tuple]:
+        nonlocal total
+        for start in range(0, n_employees, EMPLOYEE_CHUNK_SIZE):
+            chunk_profiles = profile_idx[start:start + EMPLOYEE_CHUNK_SIZE]
+            chunk_probs = probs[chunk_profiles]
+            granted = rng.random(chunk_probs.shape, dtype=np.float32) < chunk_probs
+            emp_offsets, access_idx = np.nonzero(granted)
+
+            auto = in_role_model[chunk_profiles[emp_offsets], access_idx]
+            employee_ids = (emp_offsets + start + 1).tolist()
+            granted_access_ids = access_ids[access_idx].tolist()
+            role_profiles = role_profile_ids[chunk_profiles[emp_offsets]].tolist()
+            auto_list = auto.tolist()
+            total += len(employee_ids)
+
+            for emp_id, acc_id, rp_id, is_auto in zip(employee_ids, granted_access_ids, role_profiles, auto_list):
+                if is_auto:
+                    yield (emp_id, acc_id, "auto_role", rp_id)
+                else:
+                    yield (emp_id, acc_id, "manual_request", None)
+            logger.progress(min(start + EMPLOYEE_CHUNK_SIZE, n_employees), n_employees, "Назначения по сотрудникам")
+
+    await _bulk_insert(
+        conn, "employee_accesses", ["employee_id", "access_id", "assignment_type", "role_profile_id"], rows()
+    )
+    return total
+
+
+# ===== ЗАГРУЗКА =====
+
+async def _prepare_bulk_load(conn):
+    """Ускорить массовую вставку: без fsync и без индекса на время загрузки"""
+    if conn.dialect.name == "sqlite":
+        await conn.exec_driver_sql("PRAGMA synchronous = OFF")
+        await conn.exec_driver_sql("PRAGMA journal_mode = MEMORY")
+    await conn.execute(text("DROP INDEX IF EXISTS ix_employee_accesses_employee_access"))
+
+
+async def _bulk_insert(conn, table: str, columns: Sequence[str], rows: Iterable[Tuple]) -> int:
+    """executemany пакетами напрямую через драйвер (qmark, как у aiosqlite), без компиляции ORM"""
+    placeholders = ", ".join("?" for _ in columns)
+    statement = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders})"
+    iterator = iter(rows)
+    inserted = 0
+    while True:
+        batch = []
+        for row in iterator:
+            batch.append(row)
+            if len(batch) >= INSERT_BATCH_SIZE:
+                break
+        if not batch:
+            break
+        await conn.exec_driver_sql(statement, batch)
+        inserted += len(batch)
+    return inserted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Детерминированный генератор синтетических данных")
+    parser.add_argument("--employees", type=int, default=10_000, help="Количество сотрудников")
+    parser.add_argument("--systems", type=int, default=100, help="Количество прикладных систем")
+    parser.add_argument("--density", type=float, default=0.04, help="Средняя доля доступов на сотрудника (назначений в среднем density x доступов)")
+    parser.add_argument("--seed", type=int, default=42, help="Seed генератора случайных чисел")
+    parser.add_argument("--verbose", action="store_true", help="Подробный вывод")
+    args = parser.parse_args()
+
+    set_verbose(args.verbose)
+    logger.section("ГЕНЕРАЦИЯ СИНТЕТИЧЕСКИХ ДАННЫХ")
+    started = time.perf_counter()
+    result = asyncio.run(generate_synthetic_dataset(args.employees, args.systems, args.density, args.seed))
+    logger.success(f"Готово за {time.perf_counter() - started:.1f} с: {result}")
@@ -2,12 +2,14 @@
 Генерация Application Systems (АС) и ролей в них
 """
 import asyncio
+from typing import Optional
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.utils import logger
-from app.core.database import AsyncSessionLocal
+from app.core.database import bulk_insert, session_scope
 from app.models import ApplicationSystem, Access
 
 
-async def generate_application_systems():
+async def generate_application_systems(session: Optional[AsyncSession] = None):
     """Создание систем и ролей в них"""
     logger.info("🚀 Создаём корпоративные системы...")
     
@@ -418,57 +420,58 @@ async def generate_application_systems():
         },
     ]
     
-    async with AsyncSessionLocal() as session:
+    async with session_scope(session) as session:
         system_id = 1
         access_id = 1
+        system_rows = []
+        access_rows = []
         
         for system_data in systems_data:
             # Создаем систему
-            app_system = ApplicationSystem(
-                id=system_id,
-                name=system_data["name"],
-                criticality=system_data["criticality"],
-                system_type=system_data["system_type"]
-            )
-            session.add(app_system)
+            system_rows.append({
+                "id": system_id,
+                "name": system_data["name"],
+                "criticality": system_data["criticality"],
+                "system_type": system_data["system_type"],
+            })
             
-            logger.info("📱 Создана система: {system_data['name']} ({len(system_data['roles'])} ролей)")
+            logger.info(f"📱 Создана система: {system_data['name']} ({len(system_data['roles'])} ролей)")
             
             # Создаем роли для системы
             for role_data in system_data["roles"]:
-                access = Access(
-                    id=access_id,
-                    system_id=system_id,
-                    role_name=role_data["role_name"],
-                    criticality=role_data["criticality"]
-                )
-                session.add(access)
+                access_rows.append({
+                    "id": access_id,
+                    "system_id": system_id,
+                    "role_name": role_data["role_name"],
+                    "criticality": role_data["criticality"],
+                })
                 access_id += 1
             
             system_id += 1
         
-        await session.commit()
+        await bulk_insert(session, ApplicationSystem, system_rows)
+        await bulk_insert(session, Access, access_rows)
         
-        logger.info("\n🎉 Создано {len(systems_data)} систем с ролями!")
+        logger.info(f"\n🎉 Создано {len(systems_data)} систем с ролями!")
         logger.info("📊 Статистика:")
-        logger.info("   - Всего систем: {len(systems_data)}")
-        logger.info("   - Всего ролей: {access_id - 1}")
+        logger.info(f"   - Всего систем: {len(systems_data)}")
+        logger.info(f"   - Всего ролей: {access_id - 1}")
         
         # Подсчет по типам
         business_systems = sum(1 for s in systems_data if s["system_type"] == "business")
         it_systems = sum(1 for s in systems_data if s["system_type"] == "it")
         
-        logger.info("   - Бизнес-систем: {business_systems}")
-        logger.info("   - ИТ-систем: {it_systems}")
+        logger.info(f"   - Бизнес-систем: {business_systems}")
+        logger.info(f"   - ИТ-систем: {it_systems}")
         
         # Подсчет по критичности
         high_crit = sum(1 for s in systems_data if s["criticality"] == "high")
         medium_crit = sum(1 for s in systems_data if s["criticality"] == "medium")
         low_crit = sum(1 for s in systems_data if s["criticality"] == "low")
         
-        logger.info("   - Высокой критичности: {high_crit}")
-        logger.info("   - Средней критичности: {medium_crit}")
-        logger.info("   - Низкой критичности: {low_crit}")
+        logger.info(f"   - Высокой критичности: {high_crit}")
+        logger.info(f"   - Средней критичности: {medium_crit}")
+        logger.info(f"   - Низкой критичности: {low_crit}")
 
 
 async def main():
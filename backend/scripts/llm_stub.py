@@ -0,0 +1,102 @@
+"""
+Заглушка LLM-сервера llama.cpp для разработки и нагрузочных тестов
+===================================================================
+
+Отвечает на POST /v1/chat/completions так же, как llama.cpp: при stream=true
+отдает токены SSE-строками "data: {...}" и завершает "data: [DONE]".
+Задержка до первого токена и между токенами настраиваются, поэтому
+заглушка имитирует 8B модель на CPU без самой модели. Как и llama.cpp,
+заглушка генерирует не больше --parallel ответов одновременно (остальные
+ждут слота) и сообщает число слотов в GET /props.
+
+Пример (из папки backend):
+    python scripts/llm_stub.py --port 8080 --ttft 0.8 --token-delay 0.05
+    LLM_API_URL=http://localhost:8080 python -m app.main
+
+Если клиент закрывает соединение, генерация прерывается - в логе видно,
+сколько токенов успели отдать.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+REPLY = (
+    "Проанализировал профиль. Критерии покрывают основную группу сотрудников, "
+    "но часть доступов выдается вручную - стоит добавить их в профиль или "
+    "уточнить критерии по должностям."
+)
+
+
+def create_app(ttft: float, token_delay: float, parallel: int = 1) -> FastAPI:
+    app = FastAPI(title="llama.cpp stub")
+    slots = asyncio.Semaphore(parallel)
+    stats = {"requests": 0, "max_busy": 0}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/props")
+    async def props():
+        return {"total_slots": parallel, **stats}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        payload = await request.json()
+        tokens = [word + " " for word in REPLY.split()][:payload.get("max_tokens", 512)]
+        model = payload.get("model", "stub")
+        stats["requests"] += 1
+
+        if not payload.get("stream"):
+            async with slots:
+                await asyncio.sleep(ttft + token_delay * len(tokens))
+            return JSONResponse({
+                "model": model,
+                "choices": [{"index": 0, "finish_reason": "stop",
+                             "message": {"role": "assistant", "content": "".join(tokens)}}],
+            })
+
+        async def events():
+            sent = 0
+            started = time.perf_counter()
+            try:
+                async with slots:
+                    stats["max_busy"] = max(stats["max_busy"], parallel - slots._value)
+                    await asyncio.sleep(ttft)
+                    for token in tokens:
+                        chunk = {"model": model, "choices": [{"index": 0, "delta": {"content": token}, "finish_reason": None}]}
+                        yield f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n"
+                        sent += 1
+                        await asyncio.sleep(token_delay)
+                final = {"model": model, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]}
+                yield f"data: {json.dumps(final)}\n\n"
+                yield "data: [DONE]\n\n"
+            except asyncio.CancelledError:
+                print(f"⏹️  Клиент отключился: отдано {sent}/{len(tokens)} токенов "
+                      f"за {time.perf_counter() - started:.2f} с")
+                raise
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушка LLM-сервера llama.cpp")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--ttft", type=float, default=0.8, help="Задержка до первого токена, сек")
+    parser.add_argument("--token-delay", type=float, default=0.05, help="Задержка между токенами, сек")
+    parser.add_argument("--parallel", type=int, default=1, help="Число слотов (одновременных генераций)")
+    args = parser.parse_args()
+
+    uvicorn.run(create_app(args.ttft, args.token_delay, args.parallel), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""
+Нагрузочный тест: смесь аналитиков и интеграций против запущенного сервера
+==========================================================================
+
+В отличие от scripts/benchmark.py (запросы по одному, в том же процессе) здесь
+N клиентов работают одновременно по HTTP против uvicorn - видно, как ведет
+себя единственное соединение StaticPool и разные конфигурации воркеров под
+конкуренцией.
+
+Профили клиентов:
+- analyst     - открывает /role-models/, карточку модели, профиль и сотрудников
+                профиля, пишет в чат; между действиями "думает"
+- integration - постранично выгружает назначения доступов и шлет массовые
+                назначения/отзывы без пауз
+
+Примеры (из папки backend):
+    # Против уже запущенного сервера
+    python scripts/load_test.py --analysts 20 --integrations 5 --duration 60
+
+    # Поднять uvicorn с 4 воркерами на копии БД и сравнить с 1 воркером
+    DATABASE_URL=sqlite+aiosqlite:///./data/benchmark.db \\
+        python scripts/load_test.py --start-server --workers 4 --output load_w4.json
+
+Массовые операции меняют данные (назначение и отзыв одних и тех же пар) -
+запускайте на отдельной БД или с --no-writes.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import signal
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+SERVER_START_TIMEOUT = 30
+
+# Числовые сегменты пути заменяем на {id}, чтобы группировать статистику по эндпоинтам
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+
+
+@dataclass
+class Targets:
+    """ID сущностей, по которым ходят клиенты"""
+    role_model_ids: List[int]
+    profile_ids: List[int]
+    employee_ids: List[int]
+    access_ids: List[int]
+
+
+@dataclass
+class EndpointStats:
+    """Статистика по одному эндпоинту"""
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[str, int] = field(default_factory=dict)
+
+
+class LoadStats:
+    """Сбор замеров со всех клиентов"""
+
+    def __init__(self):
+        self.endpoints: Dict[str, EndpointStats] = {}
+        self.started = time.perf_counter()
+        self.finished: Optional[float] = None
+
+    def record(self, name: str, elapsed_ms: float, status: str, error: bool):
+        stats = self.endpoints.setdefault(name, EndpointStats())
+        stats.latencies.append(elapsed_ms)
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        if error:
+            stats.errors += 1
+
+    def report(self) -> Dict[str, Any]:
+        duration = (self.finished or time.perf_counter()) - self.started
+        endpoints = {}
+        for name, stats in sorted(self.endpoints.items()):
+            latencies = np.array(stats.latencies)
+            endpoints[name] = {
+                "requests": len(latencies),
+                "throughput_rps": round(len(latencies) / duration, 2),
+                "error_rate": round(stats.errors / len(latencies), 4),
+                "status_codes": stats.statuses,
+                "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+                "p90_ms": round(float(np.percentile(latencies, 90)), 2),
+                "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+                "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+                "max_ms": round(float(latencies.max()), 2),
+            }
+        total = sum(e["requests"] for e in endpoints.values())
+        errors = sum(s.errors for s in self.endpoints.values())
+        return {
+            "duration_seconds": round(duration, 2),
+            "total_requests": total,
+            "throughput_rps": round(total / duration, 2) if duration else 0.0,
+            "error_rate": round(errors / total, 4) if total else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+class Client:
+    """Обертка над httpx: замер, группировка по эндпоинту, учет ошибок"""
+
+    def __init__(self, http: httpx.AsyncClient, stats: LoadStats):
+        self.http = http
+        self.stats = stats
+
+    async def request(self, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        name = f"{method} {_ID_SEGMENT.sub('/{id}', url.split('?')[0])}"
+        started = time.perf_counter()
+        try:
+            response = await self.http.request(method, url, **kwargs)
+        except httpx.HTTPError as e:
+            self.stats.record(name, (time.perf_counter() - started) * 1000, type(e).__name__, True)
+            return None
+        self.stats.record(name, (time.perf_counter() - started) * 1000, str(response.status_code),
+                          response.status_code >= 400)
+        return response
+
+
+# ===== ПРОФИЛИ НАГРУЗКИ =====
+
+async def analyst_session(client: Client, targets: Targets, rng: random.Random, think_time: float):
+    """Один "проход" аналитика по интерфейсу"""
+    await client.request("GET", "/role-models/")
+    await asyncio.sleep(rng.uniform(0, think_time))
+
+    role_model_id = rng.choice(targets.role_model_ids)
+    await client.request("GET", f"/role-models/{role_model_id}")
+    await asyncio.sleep(rng.uniform(0, think_time))
+
+    profile_id = rng.choice(targets.profile_ids)
+    await client.request("GET", f"/api/v1/role-models/profiles/{profile_id}")
+    await client.request("GET", f"/api/v1/role-models/profiles/{profile_id}/employees?page={rng.randint(1, 3)}")
+    await asyncio.sleep(rng.uniform(0, think_time))
+
+    await client.request("POST", "/api/v1/chat/send", json={
+        "message": "Какие доступы стоит добавить в профиль?",
+        "context": {"role_model_id": role_model_id, "profile_id": profile_id},
+    })
+    await asyncio.sleep(rng.uniform(0, think_time))
+
+
+async def integration_session(client: Client, targets: Targets, rng: random.Random, writes: bool, pages: int):
+    """Выгрузка назначений и массовые изменения"""
+    for page in range(1, pages + 1):
+        response = await client.request("GET", f"/api/v1/access/assignments/?page={page}&size=100")
+        if response is None or response.status_code != 200 or page >= response.json().get("pages", 0):
+            break
+
+    if not writes:
+        return
+    payload = {
+        "employee_ids": rng.sample(targets.employee_ids, min(10, len(targets.employee_ids))),
+        "access_ids": rng.sample(targets.access_ids, min(3, len(targets.access_ids))),
+    }
+    await client.request("POST", "/api/v1/access/assignments/bulk",
+                         json={**payload, "assignment_type": "manual_request"})
+    await client.request("POST", "/api/v1/access/assignments/bulk-revoke", json={**payload, "reason": "load test"})
+
+
+async def run_client(profile: str, index: int, http: httpx.AsyncClient, stats: LoadStats,
+                     targets: Targets, args, deadline: float):
+    """Клиент крутит свой сценарий до истечения времени"""
+    rng = random.Random(args.seed * 1000 + index)
+    # Равномерный разгон, чтобы клиенты не стартовали одновременно
+    await asyncio.sleep(args.ramp_up * index / max(args.analysts + args.integrations, 1))
+    client = Client(http, stats)
+    while time.perf_counter() < deadline:
+        if profile == "analyst":
+            await analyst_session(client, targets, rng, args.think_time)
+        else:
+            await integration_session(client, targets, rng, not args.no_writes, args.pages)
+
+
+async def discover_targets(http: httpx.AsyncClient) -> Targets:
+    """Найти ID ролевых моделей, профилей, сотрудников и доступов через API"""
+    models = (await http.get("/api/v1/role-models/?size=100")).raise_for_status().json()["items"]
+    role_model_ids = [m["id"] for m in models]
+    profile_ids = []
+    for role_model_id in role_model_ids[:10]:
+        profiles = (await http.get(f"/api/v1/role-models/{role_model_id}/profiles?size=100")).raise_for_status().json()
+        profile_ids.extend(p["id"] for p in profiles["items"])
+    employees = (await http.get("/api/v1/employees/?size=100")).raise_for_status().json()["items"]
+    accesses = (await http.get("/api/v1/access/")).raise_for_status().json()
+
+    targets = Targets(
+        role_model_ids=role_model_ids,
+        profile_ids=profile_ids,
+        employee_ids=[e["id"] for e in employees],
+        access_ids=[a["id"] for a in accesses],
+    )
+    if not all((targets.role_model_ids, targets.profile_ids, targets.employee_ids, targets.access_ids)):
+        raise RuntimeError("В БД нет ролевых моделей, профилей, сотрудников или доступов - заполните её")
+    return targets
+
+
+async def run_load_test(args) -> Dict[str, Any]:
+    """Запустить всех клиентов и собрать отчет"""
+    limits = httpx.Limits(max_connections=args.analysts + args.integrations + 5)
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=timeout) as http:
+        targets = await discover_targets(http)
+
+        stats = LoadStats()
+        deadline = time.perf_counter() + args.duration
+        clients = [("analyst", i) for i in range(args.analysts)]
+        clients += [("integration", args.analysts + i) for i in range(args.integrations)]
+        await asyncio.gather(*(
+            run_client(profile, index, http, stats, targets, args, deadline) for profile, index in clients
+        ))
+        stats.finished = time.perf_counter()
+
+    return {
+        "meta": {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "base_url": args.base_url,
+            "analysts": args.analysts,
+            "integrations": args.integrations,
+            "duration": args.duration,
+            "think_time": args.think_time,
+            "writes": not args.no_writes,
+            "workers": args.workers if args.start_server else None,
+        },
+        **stats.report(),
+    }
+
+
+# ===== ЗАПУСК СЕРВЕРА =====
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    """Поднять uvicorn из папки backend и дождаться /health"""
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR,
+        # Каждый воркер поднимает свой пул вычислений: делим ядра между ними
+        env={**os.environ, "SERVER_WORKERS": str(workers)},
+    )
+    deadline = time.time() + SERVER_START_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"uvicorn завершился с кодом {process.returncode}")
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                return process
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.3)
+    process.terminate()
+    raise RuntimeError(f"uvicorn не ответил на /health за {SERVER_START_TIMEOUT} с")
+
+
+def stop_server(process: subprocess.Popen):
+    """Корректно остановить uvicorn"""
+    process.send_signal(signal.SIGINT)
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def print_report(report: Dict[str, Any]):
+    """Таблица по эндпоинтам"""
+    print(f"\nЗапросов: {report['total_requests']} за {report['duration_seconds']} с "
+          f"({report['throughput_rps']} rps), ошибок: {report['error_rate']:.1%}\n")
+    print(f"{'Эндпоинт':<55} {'rps':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'ошибки':>7}")
+    for name, e in report["endpoints"].items():
+        print(f"{name:<55} {e['throughput_rps']:>7} {e['p50_ms']:>8} {e['p95_ms']:>8} "
+              f"{e['p99_ms']:>8} {e['error_rate']:>7.1%}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Нагрузочный тест RM Agent")
+    parser.add_argument("--base-url", default=None, help="Адрес сервера (по умолчанию http://127.0.0.1:PORT)")
+    parser.add_argument("--analysts", type=int, default=10, help="Одновременных аналитиков")
+    parser.add_argument("--integrations", type=int, default=3, help="Одновременных интеграций")
+    parser.add_argument("--duration", type=float, default=30, help="Длительность теста, с")
+    parser.add_argument("--ramp-up", type=float, default=5, help="Время разгона клиентов, с")
+    parser.add_argument("--think-time", type=float, default=1.0, help="Максимальная пауза аналитика, с")
+    parser.add_argument("--pages", type=int, default=5, help="Страниц назначений за проход интеграции")
+    parser.add_argument("--no-writes", action="store_true", help="Без массовых назначений/отзывов")
+    parser.add_argument("--timeout", type=float, default=30, help="Таймаут запроса, с")
+    parser.add_argument("--seed", type=int, default=42, help="Seed для выбора сущностей")
+    parser.add_argument("--start-server", action="store_true", help="Поднять uvicorn на время теста")
+    parser.add_argument("--workers", type=int, default=1, help="Воркеров uvicorn (с --start-server)")
+    parser.add_argument("--port", type=int, default=8000, help="Порт сервера")
+    parser.add_argument("--output", help="Сохранить JSON-отчет в файл")
+    args = parser.parse_args()
+    args.base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+
+    server = start_server(args.port, args.workers) if args.start_server else None
+    try:
+        report = asyncio.run(run_load_test(args))
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, ensure_ascii=False, indent=2) + "\n", encoding="utf-8")
+        print(f"\nОтчет сохранен: {args.output}")
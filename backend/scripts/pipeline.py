@@ -0,0 +1,271 @@
+"""
+Пайплайн заполнения БД: граф этапов с параллельным запуском и чекпоинтами
+
+Каждый этап выполняется в своей сессии и своей транзакции. Отметка о
+завершении пишется в таблицу setup_checkpoints в той же транзакции, что и
+данные этапа, поэтому этап либо применён целиком и отмечен, либо откатан -
+повторный запуск продолжает с первого незавершённого этапа.
+
+Принудительный повтор этапа (force) сначала очищает таблицы этого этапа и
+всех зависящих от него этапов, затем они выполняются заново: этапы вставляют
+данные с явными id и поверх старых строк упали бы на UNIQUE.
+"""
+import asyncio
+import time
+import warnings
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Sequence, Set, Tuple
+
+from sqlalchemy import Column, DateTime, Float, MetaData, String, Table, delete, insert, select
+from sqlalchemy.exc import SAWarning
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.models.base import Base
+from app.utils import logger
+
+# Сколько секунд этап ждёт блокировку записи SQLite, пока пишет соседний этап
+SQLITE_LOCK_TIMEOUT = 300
+
+checkpoint_metadata = MetaData()
+
+setup_checkpoints = Table(
+    "setup_checkpoints",
+    checkpoint_metadata,
+    Column("stage", String(100), primary_key=True),
+    Column("completed_at", DateTime, nullable=False),
+    Column("duration_seconds", Float, nullable=False),
+)
+
+
+@dataclass
+class Stage:
+    """Этап заполнения БД"""
+    name: str
+    run: Callable[[AsyncSession], Awaitable[None]]
+    depends_on: List[str] = field(default_factory=list)
+    description: str = ""
+    # Таблицы, которые заполняет этап (в порядке вставки); очищаются перед повтором этапа
+    tables: List[str] = field(default_factory=list)
+
+
+def create_pipeline_engine(database_url: str = settings.DATABASE_URL) -> AsyncEngine:
+    """
+    Движок пайплайна: отдельное соединение на каждый этап
+
+    StaticPool приложения делит одно соединение между всеми сессиями, а этапам
+    нужны независимые транзакции. Для SQLite задаём ожидание блокировки, чтобы
+    параллельные этапы дожидались друг друга, а не падали с "database is locked".
+    """
+    connect_args = {}
+    if make_url(database_url).get_backend_name() == "sqlite":
+        connect_args = {"timeout": SQLITE_LOCK_TIMEOUT}
+    return create_async_engine(database_url, poolclass=NullPool, connect_args=connect_args)
+
+
+def validate_stages(stages: Sequence[Stage]):
+    """Проверка графа этапов: уникальные имена, известные зависимости, нет циклов"""
+    names = [stage.name for stage in stages]
+    if len(names) != len(set(names)):
+        raise ValueError("Имена этапов должны быть уникальными")
+
+    by_name = {stage.name: stage for stage in stages}
+    for stage in stages:
+        unknown = [dep for dep in stage.depends_on if dep not in by_name]
+        if unknown:
+            raise ValueError(f"Этап {stage.name} зависит от неизвестных этапов: {', '.join(unknown)}")
+
+    visited: Set[str] = set()
+    in_progress: Set[str] = set()
+
+    def visit(name: str):
+        if name in visited:
+            return
+        if name in in_progress:
+            raise ValueError(f"Циклическая зависимость этапов через {name}")
+        in_progress.add(name)
+        for dep in by_name[name].depends_on:
+            visit(dep)
+        in_progress.discard(name)
+        visited.add(name)
+
+    for name in names:
+        visit(name)
+
+
+def dependent_stages(stages: Sequence[Stage], names: Sequence[str]) -> List[Stage]:
+    """Этапы names и все этапы, зависящие от них (транзитивно), в порядке stages"""
+    unknown = sorted(set(names) - {stage.name for stage in stages})
+    if unknown:
+        raise ValueError(f"Неизвестные этапы: {', '.join(unknown)}")
+    selected = set(names)
+    changed = True
+    while changed:
+        changed = False
+        for stage in stages:
+            if stage.name not in selected and selected.intersection(stage.depends_on):
+                selected.add(stage.name)
+                changed = True
+    return [stage for stage in stages if stage.name in selected]
+
+
+def _topological(stages: Sequence[Stage]) -> List[Stage]:
+    """Этапы в порядке зависимостей: зависимости раньше зависящих"""
+    by_name = {stage.name: stage for stage in stages}
+    ordered: List[Stage] = []
+    seen: Set[str] = set()
+
+    def visit(name: str):
+        if name in seen:
+            return
+        seen.add(name)
+        for dep in by_name[name].depends_on:
+            if dep in by_name:
+                visit(dep)
+        ordered.append(by_name[name])
+
+    for stage in stages:
+        visit(stage.name)
+    return ordered
+
+
+async def clear_stages(engine: AsyncEngine, stages: Sequence[Stage]):
+    """
+    Удалить данные и чекпоинты этапов одной транзакцией
+
+    Таблицы очищаются от зависящих этапов к их зависимостям, внутри этапа -
+    в обратном порядке вставки.
+    """
+    async with engine.begin() as conn:
+        for stage in reversed(_topological(stages)):
+            for table_name in reversed(stage.tables):
+                await conn.execute(delete(Base.metadata.tables[table_name]))
+        await conn.execute(
+            delete(setup_checkpoints).where(setup_checkpoints.c.stage.in_([stage.name for stage in stages]))
+        )
+
+
+async def load_checkpoints(engine: AsyncEngine) -> Dict[str, datetime]:
+    """Завершённые этапы из таблицы чекпоинтов"""
+    async with engine.connect() as conn:
+        result = await conn.execute(select(setup_checkpoints.c.stage, setup_checkpoints.c.completed_at))
+        return {stage: completed_at for stage, completed_at in result.all()}
+
+
+async def reset_database(engine: AsyncEngine):
+    """Пересоздание схемы и сброс чекпоинтов (запуск с нуля)"""
+    async with engine.begin() as conn:
+        # employees <-> organizational_units ссылаются друг на друга, порядок DROP для SQLite не важен
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", SAWarning)
+            await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(checkpoint_metadata.drop_all)
+
+
+async def _run_stage(session_factory: async_sessionmaker, stage: Stage) -> float:
+    """Выполнить этап в отдельной транзакции и отметить его завершение"""
+    started = time.perf_counter()
+    async with session_factory() as session:
+        try:
+            await stage.run(session)
+            duration = round(time.perf_counter() - started, 3)
+            await session.execute(
+                insert(setup_checkpoints).values(
+                    stage=stage.name,
+                    completed_at=datetime.now(),
+                    duration_seconds=duration,
+                )
+            )
+            await session.commit()
+        except BaseException:
+            await session.rollback()
+            raise
+    return duration
+
+
+async def run_pipeline(
+    stages: Sequence[Stage],
+    concurrency: int = 4,
+    restart: bool = False,
+    force: Sequence[str] = (),
+    database_url: str = settings.DATABASE_URL,
+) -> Dict[str, float]:
+    """
+    Выполнить граф этапов
+
+    Этап запускается, как только завершены все его зависимости; одновременно
+    работает не больше concurrency этапов. Уже отмеченные этапы пропускаются.
+    Этапы из force и зависящие от них очищаются и выполняются заново. При ошибке новые этапы не запускаются,
+    уже работающие доводятся до конца и отмечаются, затем ошибка пробрасывается.
+
+    Returns:
+        Длительность выполненных в этом запуске этапов, в секундах
+    """
+    validate_stages(stages)
+    if concurrency < 1:
+        raise ValueError("concurrency должно быть >= 1")
+    forced = dependent_stages(stages, force) if force else []
+
+    engine = create_pipeline_engine(database_url)
+    session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    durations: Dict[str, float] = {}
+
+    try:
+        if restart:
+            logger.warning("Полный перезапуск: схема БД и чекпоинты будут пересозданы")
+            await reset_database(engine)
+
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(checkpoint_metadata.create_all)
+
+        if forced:
+            logger.warning(f"Повтор этапов, данные будут удалены: {', '.join(stage.name for stage in forced)}")
+            await clear_stages(engine, forced)
+
+        completed = set(await load_checkpoints(engine))
+        for stage in stages:
+            if stage.name in completed:
+                logger.info(f"⏭️  Этап {stage.name} уже выполнен, пропускаем")
+
+        pending: Dict[str, Stage] = {s.name: s for s in stages if s.name not in completed}
+        running: Dict[asyncio.Task, Stage] = {}
+        failures: List[Tuple[str, BaseException]] = []
+
+        while pending or running:
+            if not failures:
+                ready = [
+                    stage for stage in pending.values()
+                    if all(dep in completed for dep in stage.depends_on)
+                ]
+                for stage in ready[:concurrency - len(running)]:
+                    del pending[stage.name]
+                    logger.step(stage.name, stage.description or "запуск этапа...")
+                    running[asyncio.create_task(_run_stage(session_factory, stage))] = stage
+
+            if not running:
+                break
+
+            finished, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in finished:
+                stage = running.pop(task)
+                try:
+                    durations[stage.name] = task.result()
+                except Exception as e:
+                    logger.error(f"Этап {stage.name} завершился ошибкой: {e}")
+                    failures.append((stage.name, e))
+                    continue
+                completed.add(stage.name)
+                logger.success(f"Этап {stage.name} выполнен за {durations[stage.name]:.2f} с")
+
+        if failures:
+            stage_name, error = failures[0]
+            logger.warning("Повторный запуск продолжит с незавершённых этапов")
+            raise RuntimeError(f"Этап {stage_name} не выполнен") from error
+    finally:
+        await engine.dispose()
+
+    return durations
@@ -2,18 +2,19 @@
 Скрипт для предзаполнения справочников данными
 """
 import asyncio
+from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.utils import logger
-from app.core.database import AsyncSessionLocal, create_tables
+from app.core.database import bulk_insert, create_tables, session_scope
 from app.models import (
     OrganizationalUnit, Position, EmployeeProfile, EmployeeType, TeamRole,
     Tribe, Product, AgileTeam, ApplicationSystem, Access
 )
 
 
-async def populate_positions():
+async def populate_positions(session: Optional[AsyncSession] = None):
     """Заполнение справочника должностей"""
-    async with AsyncSessionLocal() as session:
+    async with session_scope(session) as session:
         positions_data = [
             # Базовые должности
             {"title": "Инженер", "hierarchy_level": 1, "description": "Базовая инженерная должность"},
@@ -34,34 +35,26 @@ async def populate_positions():
             {"title": "Директор", "hierarchy_level": 8, "description": "Директор департамента/блока"},
         ]
         
-        for pos_data in positions_data:
-            position = Position(**pos_data)
-            session.add(position)
-        
-        await session.commit()
+        await bulk_insert(session, Position, positions_data)
         logger.info("✅ Должности созданы")
 
 
-async def populate_employee_types():
+async def populate_employee_types(session: Optional[AsyncSession] = None):
     """Заполнение типов сотрудников"""
-    async with AsyncSessionLocal() as session:
+    async with session_scope(session) as session:
         types_data = [
             {"name": "Внутренний сотрудник"},
             {"name": "Аутстаффер"},
             {"name": "Компания-партнер"},
         ]
         
-        for type_data in types_data:
-            emp_type = EmployeeType(**type_data)
-            session.add(emp_type)
-        
-        await session.commit()
+        await bulk_insert(session, EmployeeType, types_data)
         logger.info("✅ Типы сотрудников созданы")
 
 
-async def populate_team_roles():
+async def populate_team_roles(session: Optional[AsyncSession] = None):
     """Заполнение ролей в командах"""
-    async with AsyncSessionLocal() as session:
+    async with session_scope(session) as session:
         roles_data = [
             {"name": "Developer"},
             {"name": "Tech Lead"},
@@ -81,17 +74,13 @@ async def populate_team_roles():
             {"name": "Project Manager"},
         ]
         
-        for role_data in roles_data:
-            role = TeamRole(**role_data)
-            session.add(role)
-        
-        await session.commit()
+        await bulk_insert(session, TeamRole, roles_data)
         logger.info("✅ Роли в командах созданы")
 
 
-async def populate_employee_profiles():
+async def populate_employee_profiles(session: Optional[AsyncSession] = None):
     """Заполнение профилей сотрудников"""
-    async with AsyncSessionLocal() as session:
+    async with session_scope(session) as session:
         profiles_data = [
             # IT профили
             "Trainee Разработчик", "Junior Разработчик", "Middle Разработчик", 
@@ -122,17 +111,13 @@ async def populate_employee_profiles():
             "Юрист", "Senior Юрист", "Главный юрист",
         ]
         
-        for profile_name in profiles_data:
-            profile = EmployeeProfile(name=profile_name)
-            session.add(profile)
-        
-        await session.commit()
+        await bulk_insert(session, EmployeeProfile, [{"name": name} for name in profiles_data])
         logger.info("✅ Профили сотрудников созданы")
 
 
-async def populate_organizational_structure():
+async def populate_organizational_structure(session: Optional[AsyncSession] = None):
     """Создание организационной структуры"""
-    async with AsyncSessionLocal() as session:
+    async with session_scope(session) as session:
         
         # ===== БЛОКИ (уровень 1) =====
         blocks_data = [
@@ -149,11 +134,9 @@ async def populate_organizational_structure():
         blocks = {}
         for i, block_data in enumerate(blocks_data, 1):
             block_data["id"] = i
-            block = OrganizationalUnit(**block_data)
-            session.add(block)
             blocks[block_data["name"]] = i
         
-        await session.flush()  # Получаем ID блоков
+        await bulk_insert(session, OrganizationalUnit, blocks_data)
         
         # ===== ДЕПАРТАМЕНТЫ (уровень 2) =====
         departments_data = [
@@ -197,13 +180,13 @@ async def populate_organizational_structure():
         ]
         
         departments = {}
+        department_paths = {}
         for i, dept_data in enumerate(departments_data, 6):  # Начинаем с ID 6
             dept_data["id"] = i
-            dept = OrganizationalUnit(**dept_data)
-            session.add(dept)
             departments[dept_data["name"]] = i
+            department_paths[i] = dept_data["path"]
         
-        await session.flush()
+        await bulk_insert(session, OrganizationalUnit, departments_data)
         
         # ===== УПРАВЛЕНИЯ (уровень 3) =====
         directorates_data = [
@@ -310,22 +293,19 @@ async def populate_organizational_structure():
         
         # Генерируем path для управлений
         for i, dir_data in enumerate(directorates_data, 20):  # Начинаем с ID 20
-            parent_unit = await session.get(OrganizationalUnit, dir_data["parent_id"])
-            dir_data["path"] = f"{parent_unit.path}/{i}"
-            
-            directorate = OrganizationalUnit(**dir_data)
-            session.add(directorate)
+            dir_data["id"] = i
+            dir_data["path"] = f"{department_paths[dir_data['parent_id']]}/{i}"
         
-        await session.commit()
+        await bulk_insert(session, OrganizationalUnit, directorates_data)
         logger.info("✅ Организационная структура создана:")
         logger.info("   - 5 блоков")
-        logger.info("   - {len(departments_data)} департаментов") 
-        logger.info("   - {len(directorates_data)} управлений")
+        logger.info(f"   - {len(departments_data)} департаментов") 
+        logger.info(f"   - {len(directorates_data)} управлений")
 
 
-async def populate_agile_structure():
+async def populate_agile_structure(session: Optional[AsyncSession] = None):
     """Создание Agile структуры"""
-    async with AsyncSessionLocal() as session:
+    async with session_scope(session) as session:
         
         # ===== ТРАЙБЫ =====
         tribes_data = [
@@ -337,11 +317,11 @@ async def populate_agile_structure():
         ]
         
         tribes = {}
-        for tribe_data in tribes_data:
-            tribe = Tribe(**tribe_data)
-            session.add(tribe)
-            await session.flush()
-            tribes[tribe_data["name"]] = tribe.id
+        for i, tribe_data in enumerate(tribes_data, 1):
+            tribe_data["id"] = i
+            tribes[tribe_data["name"]] = i
+        
+        await bulk_insert(session, Tribe, tribes_data)
         
         # ===== ПРОДУКТЫ/СЕРВИСЫ =====
         products_data = [
@@ -369,11 +349,11 @@ async def populate_agile_structure():
         ]
         
         products = {}
-        for product_data in products_data:
-            product = Product(**product_data)
-            session.add(product)
-            await session.flush()
-            products[product_data["name"]] = product.id
+        for i, product_data in enumerate(products_data, 1):
+            product_data["id"] = i
+            products[product_data["name"]] = i
+        
+        await bulk_insert(session, Product, products_data)
         
         # ===== AGILE КОМАНДЫ =====
         teams_data = [
@@ -419,15 +399,11 @@ async def populate_agile_structure():
             {"name": "Mobile QA Team", "product_id": products["iOS приложение"], "team_type": "Run"},  # Общая QA для мобильных
         ]
         
-        for team_data in teams_data:
-            team = AgileTeam(**team_data)
-            session.add(team)
-        
-        await session.commit()
+        await bulk_insert(session, AgileTeam, teams_data)
         logger.info("✅ Agile структура создана:")
-        logger.info("   - {len(tribes_data)} трайбов")
-        logger.info("   - {len(products_data)} продуктов/сервисов")
-        logger.info("   - {len(teams_data)} agile команд")
+        logger.info(f"   - {len(tribes_data)} трайбов")
+        logger.info(f"   - {len(products_data)} продуктов/сервисов")
+        logger.info(f"   - {len(teams_data)} agile команд")
 
 
 async def main():
@@ -2,7 +2,8 @@
 🚀 МАСТЕР-СКРИПТ ЗАПОЛНЕНИЯ БАЗЫ ДАННЫХ RM AGENT
 ===================================================
 
-Этот скрипт выполняет полное заполнение базы данных в правильной последовательности:
+Этот скрипт выполняет полное заполнение базы данных как граф этапов
+(см. scripts/pipeline.py):
 1. Создание таблиц
 2. Заполнение справочников и организационной структуры
 3. Создание корпоративных систем и ролей
@@ -10,22 +11,93 @@
 5. Генерация 2000 сотрудников
 6. Генерация доступов сотрудников (24k+ записей)
 
+Независимые этапы (справочники, орг.структура, системы) выполняются
+параллельно, каждый этап атомарен и отмечается в таблице setup_checkpoints.
+Повторный запуск после ошибки продолжает с незавершённого этапа.
+
+Примеры (из папки backend):
+    python scripts/setup_database.py                  # продолжить / выполнить всё
+    python scripts/setup_database.py --restart        # пересоздать БД с нуля
+    python scripts/setup_database.py --force employee_accesses   # очистить и повторить этап
+
 Автор: Ириска 💖
 Дата: Декабрь 2024
 """
 
+import argparse
 import asyncio
 import sys
 from pathlib import Path
+from typing import List, Sequence
 
 # Добавляем путь к модулям приложения
-sys.path.append(str(Path(__file__).parent))
+sys.path.append(str(Path(__file__).parent.parent))
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.utils import logger, set_verbose
+from scripts.pipeline import Stage, run_pipeline
+from scripts.populate_data import (
+    populate_positions, populate_employee_types, populate_team_roles,
+    populate_employee_profiles, populate_organizational_structure,
+    populate_agile_structure
+)
+from scripts.generate_systems import generate_application_systems
+from scripts.create_role_models import create_base_role_models, update_profile_access_ids
+from scripts.generate_employees import generate_employees
+from scripts.generate_employee_accesses import generate_employee_accesses, show_statistics
+
+
+async def build_role_models(session: AsyncSession):
+    """Ролевые модели с проставленными ID доступов"""
+    await create_base_role_models(session)
+    await update_profile_access_ids(session)
 
-from app.core.database import create_tables
-from app.utils import logger
 
+REFERENCE_STAGES = [
+    "positions", "employee_types", "team_roles", "employee_profiles",
+    "org_structure", "agile_structure",
+]
 
-async def setup_complete_database():
+
+def build_stages() -> List[Stage]:
+    """Граф этапов заполнения БД"""
+    return [
+        Stage("positions", populate_positions, description="Справочник должностей", tables=["positions"]),
+        Stage("employee_types", populate_employee_types, description="Типы сотрудников", tables=["employee_types"]),
+        Stage("team_roles", populate_team_roles, description="Роли в командах", tables=["team_roles"]),
+        Stage(
+            "employee_profiles", populate_employee_profiles,
+            description="Профили сотрудников", tables=["employee_profiles"],
+        ),
+        Stage(
+            "org_structure", populate_organizational_structure,
+            description="Организационная структура", tables=["organizational_units"],
+        ),
+        Stage(
+            "agile_structure", populate_agile_structure,
+            description="Agile структура", tables=["tribes", "products", "agile_teams"],
+        ),
+        Stage(
+            "systems", generate_application_systems,
+            description="36 корпоративных систем и 145 ролей", tables=["application_systems", "accesses"],
+        ),
+        Stage(
+            "role_models", build_role_models, ["systems"],
+            description="5 базовых ролевых моделей", tables=["role_models", "role_profiles", "profile_accesses"],
+        ),
+        Stage(
+            "employees", generate_employees, REFERENCE_STAGES,
+            description="2000 реалистичных сотрудников", tables=["employees"],
+        ),
+        Stage(
+            "employee_accesses", generate_employee_accesses, ["employees", "role_models"],
+            description="Доступы с логикой ролевых моделей", tables=["employee_accesses"],
+        ),
+    ]
+
+
+async def setup_complete_database(restart: bool = False, concurrency: int = 4, force: Sequence[str] = ()):
     """
     🎯 ПОЛНОЕ ЗАПОЛНЕНИЕ БАЗЫ ДАННЫХ
     
@@ -35,104 +107,16 @@ async def setup_complete_database():
     logger.section("ПОЛНОЕ ЗАПОЛНЕНИЕ БАЗЫ ДАННЫХ RM AGENT")
     
     try:
-        # ============================================================
-        # ЭТАП 1: СОЗДАНИЕ СТРУКТУРЫ БД
-        # ============================================================
-        logger.step("ЭТАП 1", "Создание структуры базы данных...")
-        
-        await create_tables()
-        logger.success("Таблицы базы данных созданы")
-        
-        # ============================================================
-        # ЭТАП 2: СПРАВОЧНИКИ И ОРГАНИЗАЦИОННАЯ СТРУКТУРА
-        # ============================================================
-        logger.step("ЭТАП 2", "Заполнение справочников и орг.структуры...")
-        
-        # Импортируем и выполняем заполнение справочников
-        from scripts.populate_data import (
-            populate_positions, populate_employee_types, populate_team_roles,
-            populate_employee_profiles, populate_organizational_structure,
-            populate_agile_structure
-        )
-        
-        logger.info("Заполняем справочник должностей...")
-        await populate_positions()
-        
-        logger.info("Заполняем типы сотрудников...")
-        await populate_employee_types()
-        
-        logger.info("Заполняем роли в командах...")
-        await populate_team_roles()
-        
-        logger.info("Заполняем профили сотрудников...")
-        await populate_employee_profiles()
-        
-        logger.info("Создаем организационную структуру...")
-        await populate_organizational_structure()
-        
-        logger.info("Создаем Agile структуру...")
-        await populate_agile_structure()
-        
-        logger.success("Справочники и структуры созданы")
-        
-        # ============================================================
-        # ЭТАП 3: КОРПОРАТИВНЫЕ СИСТЕМЫ И РОЛИ
-        # ============================================================
-        logger.step("ЭТАП 3", "Создание корпоративных систем...")
-        
-        from scripts.generate_systems import generate_application_systems
-        
-        logger.info("Генерируем 36 корпоративных систем и 145 ролей...")
-        await generate_application_systems()
-        
-        logger.success("Корпоративные системы созданы")
-        
-        # ============================================================
-        # ЭТАП 4: БАЗОВЫЕ РОЛЕВЫЕ МОДЕЛИ
-        # ============================================================
-        logger.step("ЭТАП 4", "Создание базовых ролевых моделей...")
-        
-        from scripts.create_role_models import create_base_role_models
-        
-        logger.info("Создаем 5 базовых ролевых моделей для ML...")
-        await create_base_role_models()
-        
-        logger.success("Базовые ролевые модели созданы")
-        
-        # ============================================================
-        # ЭТАП 5: ГЕНЕРАЦИЯ СОТРУДНИКОВ
-        # ============================================================
-        logger.step("ЭТАП 5", "Генерация сотрудников...")
-        
-        from scripts.generate_employees import generate_employees
-        
-        logger.info("Генерируем 2000 реалистичных сотрудников...")
-        await generate_employees()
-        
-        logger.success("Сотрудники созданы")
-        
-        # ============================================================
-        # ЭТАП 6: ГЕНЕРАЦИЯ ДОСТУПОВ
-        # ============================================================
-        logger.step("ЭТАП 6", "Генерация доступов сотрудников...")
-        
-        from scripts.generate_employee_accesses import (
-            generate_employee_accesses, show_statistics
-        )
+        durations = await run_pipeline(build_stages(), concurrency=concurrency, restart=restart, force=force)
         
-        logger.info("Генерируем доступы с логикой ролевых моделей...")
-        logger.info("   • Базовые доступы для всех")
-        logger.info("   • Логичные доступы по профилю/должности") 
-        logger.info("   • Случайные дополнительные доступы")
-        logger.info("   • 5% шума для реалистичности")
-        
-        await generate_employee_accesses()
+        if durations:
+            logger.info("Длительность этапов:")
+            for name, seconds in sorted(durations.items(), key=lambda item: -item[1]):
+                logger.info(f"   • {name}: {seconds:.2f} с")
         
         logger.info("Показываем финальную статистику...")
         await show_statistics()
         
-        logger.success("Доступы сотрудников созданы")
-        
         # ============================================================
         # ФИНАЛ: УСПЕШНОЕ ЗАВЕРШЕНИЕ
         # ============================================================
@@ -157,5 +141,13 @@ async def setup_complete_database():
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Заполнение базы данных RM Agent")
+    parser.add_argument("--restart", action="store_true", help="Пересоздать схему и выполнить все этапы заново")
+    parser.add_argument("--concurrency", type=int, default=4, help="Максимум одновременно выполняемых этапов")
+    parser.add_argument("--force", nargs="+", default=[], metavar="STAGE", help="Очистить и повторить указанные этапы (и зависящие от них)")
+    parser.add_argument("--verbose", action="store_true", help="Подробный вывод")
+    args = parser.parse_args()
+
+    set_verbose(args.verbose)
     logger.step("Запуск", "мастер-скрипта заполнения БД...")
-    asyncio.run(setup_complete_database())
+    asyncio.run(setup_complete_database(restart=args.restart, concurrency=args.concurrency, force=args.force))
@@ -0,0 +1,102 @@
+"""
+Синхронизация БД с полным снимком HR/IAM
+
+Загружает CSV-выгрузки во временные staging-таблицы и применяет только
+дельту (см. app/services/snapshot_sync.py).
+
+Пример (из папки backend):
+    python scripts/sync_snapshot.py --employees hr.csv --accesses iam.csv
+    python scripts/sync_snapshot.py --accesses iam.csv --dry-run
+
+Формат CSV:
+    hr.csv  - employee_number, full_name, org_unit_id, position_id, profile_id,
+              employee_type_id, agile_team_id, team_role_id, experience_years,
+              company_tenure_months, email, phone, status, hire_date, termination_date
+    iam.csv - employee_number, access_id, assignment_type, role_profile_id, last_used
+
+Пустые поля:
+    status пустой - новый сотрудник получает active, у существующего статус не меняется;
+    пустое обязательное поле (full_name, org_unit_id, position_id, profile_id,
+    employee_type_id) - строка не применяется и учитывается в skipped_rows
+    как employees_missing_required, сотрудник при этом не увольняется.
+    Например, строка "EMP000123,,12,5,3,1,,,,,,,,," пропустится, а
+    "EMP000123,Иванов Иван Иванович,12,5,3,1,,,,,,,,," обновит сотрудника, сохранив статус.
+"""
+import argparse
+import asyncio
+import csv
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+# Добавляем путь к модулям приложения
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.core.database import AsyncSessionLocal, create_tables
+from app.services.snapshot_sync import sync_snapshot
+from app.utils import logger, set_verbose
+
+
+def read_csv(path: Optional[str]) -> Optional[Iterator[Dict[str, Any]]]:
+    """Потоковое чтение CSV без загрузки файла в память"""
+    if path is None:
+        return None
+
+    def rows():
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+
+    return rows()
+
+
+async def run_sync(employees_path: Optional[str], accesses_path: Optional[str], dry_run: bool):
+    """Применить снимок и вывести сводку изменений"""
+    logger.section("СИНХРОНИЗАЦИЯ СО СНИМКОМ HR/IAM" + (" (DRY RUN)" if dry_run else ""))
+
+    # Колонки и индексы, добавленные в модели после создания БД (employee_accesses.updated_at)
+    await create_tables()
+
+    async with AsyncSessionLocal() as session:
+        try:
+            result = await sync_snapshot(
+                session,
+                employees=read_csv(employees_path),
+                accesses=read_csv(accesses_path),
+                dry_run=dry_run,
+            )
+            if dry_run:
+                await session.rollback()
+            else:
+                await session.commit()
+        except Exception as e:
+            await session.rollback()
+            logger.error(f"Ошибка синхронизации: {e}")
+            raise
+
+    for table, changes in (("employees", result.employees), ("employee_accesses", result.employee_accesses)):
+        logger.success(
+            f"{table}: +{changes.inserted} ~{changes.updated} -{changes.deleted} "
+            f"(без изменений: {changes.unchanged})"
+        )
+    for reason, count in result.skipped_rows.items():
+        logger.warning(f"Пропущено строк ({reason}): {count}")
+    logger.success(f"Синхронизация заняла {result.duration_seconds} с")
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Синхронизация с полным снимком HR/IAM")
+    parser.add_argument("--employees", help="CSV-снимок сотрудников (HR)")
+    parser.add_argument("--accesses", help="CSV-снимок назначений доступов (IAM)")
+    parser.add_argument("--dry-run", action="store_true", help="Только посчитать изменения")
+    parser.add_argument("--json", action="store_true", help="Вывести сводку в JSON")
+    parser.add_argument("--verbose", action="store_true", help="Подробный вывод")
+    args = parser.parse_args()
+
+    if not args.employees and not args.accesses:
+        parser.error("нужно указать --employees и/или --accesses")
+
+    set_verbose(args.verbose)
+    summary = asyncio.run(run_sync(args.employees, args.accesses, args.dry_run))
+    if args.json:
+        print(summary.model_dump_json(indent=2))